@@ -0,0 +1,380 @@
+import os
+import sys
+import json
+import shutil
+import tempfile
+
+import utills
+import slotstore
+
+# Remembers what we last deployed into the live folders so the next switch
+# can trust (size, mtime) instead of re-hashing every live file.
+LIVE_STATE_NAME = ".live.json"
+MODS_PREFIX = utills.MODS_DIRNAME + "/"
+
+# Link mode: every slot gets a ready-made Mods folder under <appdata>/.bt-slots
+# and the live Mods folder is a symlink/junction that gets swapped.
+MODE_COPY = "copy"
+MODE_LINK = "link"
+MATERIALIZED_DIRNAME = ".bt-slots"
+ORIGINAL_MODS_NAME = ".original-Mods"
+
+
+class ActivationPlan:
+    def __init__(self, slot_name):
+        self.slot_name = slot_name
+        self.copies = []    # (action, rel, src, dest, size) with action "add" or "replace"
+        self.deletes = []   # (rel, dest)
+        self.skipped = []   # rel paths we have nowhere to put
+        self.unchanged = 0
+        self.target = {}    # rel -> (hash, live path) for the slot being activated
+        self.state_path = None
+        self.state_extra = {}
+        self.backends = {}  # copy backend name -> files copied with it, filled by apply_plan
+        self.unpack_bytes = 0  # archived blobs a real run unpacks first, see SlotLibrary.activate
+
+    @property
+    def bytes_to_copy(self):
+        return sum(op[4] for op in self.copies)
+
+    @property
+    def is_noop(self):
+        return not self.copies and not self.deletes
+
+    def summary(self):
+        adds = sum(1 for op in self.copies if op[0] == "add")
+        replaces = len(self.copies) - adds
+        text = (f"{adds} added, {replaces} replaced, {len(self.deletes)} deleted, "
+                f"{self.unchanged} unchanged, {self.bytes_to_copy / (1024 * 1024):.1f} MB to copy")
+        if self.backends:
+            text += " via " + ", ".join(f"{name} x{n}" for name, n in self.backends.items())
+        if self.unpack_bytes:
+            text += f", {self.unpack_bytes / (1024 * 1024):.1f} MB to unpack from the archive"
+        return text
+
+
+def _read_state(path):
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {"slot": None, "files": {}}
+
+def read_live_state(slots_folder):
+    return _read_state(os.path.join(slots_folder, LIVE_STATE_NAME))
+
+def write_live_state(slots_folder, state):
+    utills.write_json_atomic(os.path.join(slots_folder, LIVE_STATE_NAME), state, indent=None)
+
+def live_path(rel, mods_dir, game_dir):
+    # Slot root files sit next to the game exe, Mods/ maps onto the appdata Mods folder
+    if ".." in rel.split("/") or ":" in rel or "\\" in rel:
+        return None  # never write outside the live folders
+    if rel.startswith(MODS_PREFIX):
+        if not mods_dir or rel == MODS_PREFIX + utills.LEGACY_LINK_STATE_NAME:
+            return None
+        return os.path.join(mods_dir, *rel[len(MODS_PREFIX):].split("/"))
+    if "/" in rel or not game_dir:
+        return None
+    return os.path.join(game_dir, rel)
+
+def scan_live_mods(mods_dir):
+    # {rel: os.stat_result} for everything currently in the live Mods folder
+    found = {}
+    if not mods_dir or not os.path.isdir(mods_dir):
+        return found
+    for root, _, names in os.walk(mods_dir):
+        for name in names:
+            full = os.path.join(root, name)
+            rel = os.path.relpath(full, mods_dir).replace(os.sep, "/")
+            found[MODS_PREFIX + rel] = os.stat(full)
+    return found
+
+def _live_hash(store, state_files, rel, path, st):
+    known = state_files.get(rel)
+    if known and known["size"] == st.st_size and known["mtime_ns"] == st.st_mtime_ns:
+        return known["hash"]
+    digest = store.hash_cache.lookup(path, st)
+    if digest is None:
+        digest = slotstore.hash_file(path)
+        store.hash_cache.remember(path, st, digest)
+    return digest
+
+def plan_activation(store, slot_path, slot_name, mods_dir, game_dir, state_path=None):
+    """
+    Compares the slot manifest with the live folders and works out the
+    smallest set of adds, replaces and deletes. Nothing is written.
+    state_path is where the deployed state is tracked (the live state file
+    unless a materialized slot folder is being updated).
+    """
+    plan = ActivationPlan(slot_name)
+    plan.state_path = state_path or os.path.join(store.slots_folder, LIVE_STATE_NAME)
+    state = _read_state(plan.state_path)
+    state_files = state.get("files", {})
+    live_mods = scan_live_mods(mods_dir)
+    target = slotstore.slot_entries(slot_path)
+
+    for rel, entry in target.items():
+        dest = live_path(rel, mods_dir, game_dir)
+        if dest is None:
+            plan.skipped.append(rel)
+            continue
+        src = slotstore.entry_source(store, slot_path, rel, entry)
+        want = entry.get("hash")
+        st = live_mods.get(rel)
+        if st is None and not rel.startswith(MODS_PREFIX) and os.path.isfile(dest):
+            st = os.stat(dest)
+        if st is None:
+            plan.target[rel] = (want, dest)
+            plan.copies.append(("add", rel, src, dest, entry["size"]))
+            continue
+        if st.st_size == entry["size"]:
+            if want is None:
+                # Loose-file slot from before the blob store, hash it here once
+                want = slotstore.hash_file(src)
+            plan.target[rel] = (want, dest)
+            if _live_hash(store, state_files, rel, dest, st) == want:
+                plan.unchanged += 1
+                continue
+        plan.target[rel] = (want, dest)
+        plan.copies.append(("replace", rel, src, dest, entry["size"]))
+
+    for rel in live_mods:
+        if rel not in target:
+            plan.deletes.append((rel, live_path(rel, mods_dir, game_dir)))
+    # Root files (loader dll etc.) are only removed if we put them there,
+    # the game exe itself is never deleted
+    for rel in state_files:
+        if rel.startswith(MODS_PREFIX) or rel in target or rel.lower().endswith(".exe"):
+            continue
+        dest = live_path(rel, mods_dir, game_dir)
+        if dest and os.path.isfile(dest):
+            plan.deletes.append((rel, dest))
+    store.hash_cache.save()
+    return plan
+
+def _copy_into_place(src, dest):
+    folder = os.path.dirname(dest)
+    os.makedirs(folder, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(prefix=".bt-", dir=folder)
+    os.close(fd)
+    try:
+        backend = utills.fast_copy(src, tmp)
+        os.replace(tmp, dest)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    return backend
+
+def _prune_empty_dirs(path, stop):
+    while path and os.path.abspath(path) != os.path.abspath(stop):
+        try:
+            os.rmdir(path)
+        except OSError:
+            return
+        path = os.path.dirname(path)
+
+def apply_plan(store, plan, mods_dir, progress=None):
+    """
+    Carries out an ActivationPlan and records the new live state.
+    progress(done_bytes, total_bytes) is called after every file if given.
+    """
+    total = plan.bytes_to_copy
+    done = 0
+    for rel, dest in plan.deletes:
+        os.remove(dest)
+        if mods_dir and rel.startswith(MODS_PREFIX):
+            _prune_empty_dirs(os.path.dirname(dest), mods_dir)
+    for _, rel, src, dest, size in plan.copies:
+        # Never hardlinked: live files (and materialized ones, through the
+        # Mods link) get edited, which would change the shared blob
+        backend = _copy_into_place(src, dest)
+        plan.backends[backend] = plan.backends.get(backend, 0) + 1
+        done += size
+        if progress:
+            progress(done, total)
+
+    files = {}
+    for rel, (digest, dest) in plan.target.items():
+        st = os.stat(dest)
+        if digest is None:
+            digest = slotstore.hash_file(dest)
+        files[rel] = {"hash": digest, "size": st.st_size, "mtime_ns": st.st_mtime_ns}
+    state = {"slot": plan.slot_name, "mode": MODE_COPY, "files": files}
+    state.update(plan.state_extra)
+    utills.write_json_atomic(plan.state_path, state, indent=None)
+    return done
+
+def activate_slot(store, slot_path, slot_name, mods_dir, game_dir, dry_run=False, progress=None):
+    """
+    Makes the live folders match a slot. With dry_run the plan is only
+    computed, plan.bytes_to_copy tells how much would be written.
+    """
+    if mods_dir and is_link(mods_dir):
+        # Leaving link mode: the real Mods folder that was moved aside comes
+        # back and gets synced, or a fresh one is made
+        original = os.path.join(materialized_root(mods_dir), ORIGINAL_MODS_NAME)
+        if dry_run:
+            if os.path.isdir(original):
+                return plan_activation(store, slot_path, slot_name, original, game_dir)
+            # Everything would be copied into a fresh folder
+            plan = plan_activation(store, slot_path, slot_name, None, game_dir)
+            for rel, entry in slotstore.slot_entries(slot_path).items():
+                if rel.startswith(MODS_PREFIX):
+                    plan.copies.append(("add", rel, None, None, entry["size"]))
+            return plan
+        remove_link(mods_dir)
+        if os.path.isdir(original):
+            os.replace(original, mods_dir)
+        else:
+            os.makedirs(mods_dir)
+    plan = plan_activation(store, slot_path, slot_name, mods_dir, game_dir)
+    if not dry_run:
+        apply_plan(store, plan, mods_dir, progress)
+    return plan
+
+
+# --- link mode -------------------------------------------------------------
+
+class LinkNotSupported(OSError):
+    pass
+
+
+def is_link(path):
+    # True for symlinks and Windows junctions
+    if os.path.islink(path):
+        return True
+    try:
+        os.readlink(path)
+        return True
+    except (OSError, ValueError, NotImplementedError):
+        return False
+
+def remove_link(path):
+    # rmdir removes a Windows junction/dir symlink without touching its target
+    if sys.platform.startswith("win"):
+        os.rmdir(path)
+    else:
+        os.unlink(path)
+
+def make_dir_link(target, link):
+    try:
+        if sys.platform.startswith("win"):
+            import _winapi
+            _winapi.CreateJunction(os.path.abspath(target), link)
+        else:
+            os.symlink(os.path.abspath(target), link, target_is_directory=True)
+    except (OSError, AttributeError, NotImplementedError) as e:
+        raise LinkNotSupported(f"Cannot create folder links here: {e}") from e
+
+def materialized_root(mods_dir):
+    return os.path.join(os.path.dirname(mods_dir), MATERIALIZED_DIRNAME)
+
+def materialized_path(mods_dir, slot_name):
+    return os.path.join(materialized_root(mods_dir), slot_name)
+
+def materialized_state_path(mods_dir, slot_name):
+    # Next to the folder, not in it: the live Mods link points inside
+    return materialized_path(mods_dir, slot_name) + ".json"
+
+def recover_link_switch(mods_dir):
+    """
+    Finishes or rolls back a link swap that was interrupted by a crash so
+    the live Mods folder always exists.
+    """
+    new_link = mods_dir + ".bt-new"
+    old_link = mods_dir + ".bt-old"
+    if os.path.lexists(new_link):
+        remove_link(new_link)
+    if os.path.lexists(old_link):
+        if os.path.lexists(mods_dir):
+            remove_link(old_link)
+        else:
+            os.replace(old_link, mods_dir)
+    original = os.path.join(materialized_root(mods_dir), ORIGINAL_MODS_NAME)
+    if not os.path.lexists(mods_dir) and os.path.isdir(original):
+        os.replace(original, mods_dir)
+
+def _manifest_key(slot_path):
+    try:
+        st = os.stat(os.path.join(slot_path, slotstore.MANIFEST_NAME))
+    except OSError:
+        return None  # loose-file slot, always re-check
+    return [st.st_size, st.st_mtime_ns]
+
+def plan_materialize(store, slot_path, slot_name, mods_dir):
+    """
+    Plan for bringing the slot's own Mods folder under .bt-slots up to date.
+    Returns None when it already matches the slot manifest.
+    """
+    target_dir = materialized_path(mods_dir, slot_name)
+    state_path = materialized_state_path(mods_dir, slot_name)
+    key = _manifest_key(slot_path)
+    if key is not None and os.path.isdir(target_dir) and _read_state(state_path).get("manifest") == key:
+        return None
+    plan = plan_activation(store, slot_path, slot_name, target_dir, None, state_path=state_path)
+    plan.state_extra = {"manifest": key, "mode": MODE_LINK}
+    return plan
+
+def swap_link(mods_dir, target_dir):
+    """
+    Points the live Mods folder at target_dir. A real Mods folder is moved
+    aside once (to .bt-slots/.original-Mods) the first time.
+    """
+    recover_link_switch(mods_dir)
+    new_link = mods_dir + ".bt-new"
+    make_dir_link(target_dir, new_link)
+    if os.path.lexists(mods_dir) and not is_link(mods_dir):
+        original = os.path.join(materialized_root(mods_dir), ORIGINAL_MODS_NAME)
+        if os.path.exists(original):
+            remove_link(new_link)
+            raise LinkNotSupported(f"{original} already exists, move it away first")
+        os.replace(mods_dir, original)
+    if sys.platform.startswith("win") and os.path.lexists(mods_dir):
+        # Windows can't rename over a directory, park the old junction first
+        old_link = mods_dir + ".bt-old"
+        os.replace(mods_dir, old_link)
+        os.replace(new_link, mods_dir)
+        remove_link(old_link)
+    else:
+        os.replace(new_link, mods_dir)
+
+def activate_slot_linked(store, slot_path, slot_name, mods_dir, game_dir, dry_run=False, progress=None):
+    """
+    Link mode activation: update the slot's materialized folder (a no-op if
+    its manifest didn't change), copy root files next to the exe, then swap
+    the Mods link. Raises LinkNotSupported when links can't be made here,
+    callers fall back to activate_slot().
+    Returns the materialize plan (None if nothing had to be copied).
+    """
+    plan = plan_materialize(store, slot_path, slot_name, mods_dir)
+    if dry_run:
+        return plan
+    target_dir = materialized_path(mods_dir, slot_name)
+    os.makedirs(target_dir, exist_ok=True)
+    # Probe before copying anything
+    probe = os.path.join(materialized_root(mods_dir), ".bt-probe")
+    if os.path.lexists(probe):
+        remove_link(probe)
+    make_dir_link(target_dir, probe)
+    remove_link(probe)
+    if plan is not None:
+        apply_plan(store, plan, target_dir, progress)
+    root_plan = plan_activation(store, slot_path, slot_name, None, game_dir)
+    root_plan.state_extra = {"mode": MODE_LINK, "link_target": target_dir}
+    apply_plan(store, root_plan, None)
+    swap_link(mods_dir, target_dir)
+    return plan
+
+def forget_materialized(mods_dir, slot_name):
+    # Drop the materialized copy of a deleted slot, unless it is live right now
+    target_dir = materialized_path(mods_dir, slot_name)
+    if not os.path.isdir(target_dir):
+        return
+    if is_link(mods_dir) and os.path.realpath(mods_dir) == os.path.realpath(target_dir):
+        return
+    shutil.rmtree(target_dir)
+    state_path = materialized_state_path(mods_dir, slot_name)
+    if os.path.exists(state_path):
+        os.remove(state_path)
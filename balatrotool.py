@@ -0,0 +1,453 @@
+"""
+BalatroTool command line.
+
+    python -m balatrotool                 start the GUI
+    python -m balatrotool list
+    python -m balatrotool export-all out/ --workers 4
+
+Every command prints one JSON object per line so the output can be piped
+into other tools. The exit code is 1 if any operation failed.
+"""
+import os
+import sys
+import json
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import utills
+import activation
+import ziptools
+import tracing
+import config
+from slots import SlotLibrary, SlotError, DEFAULT_SLOTS_FOLDER
+
+
+def emit(record):
+    sys.stdout.write(json.dumps(record) + "\n")
+    sys.stdout.flush()
+
+def configured_exe():
+    return config.shared()["balatro_exe_path"]
+
+def slot_record(slot):
+    return {
+        "slot": slot.dir_name,
+        "name": slot.name,
+        "mod_count": slot.mod_count,
+        "tags": slot.tags,
+        "locked": slot.locked,
+        "loaded": slot.loaded,
+        "live_mode": slot.live_mode,
+        "cold": slot.cold,
+        "creation_date": slot.creation_date,
+    }
+
+def zip_threads(workers):
+    # Keep processes x compression threads around the core count
+    return max(1, (os.cpu_count() or 1) // max(1, workers))
+
+
+# --- process pool workers (module level so they can be pickled) ------------
+
+def _export_one(slots_dir, dir_name, out_path, preset, threads):
+    lib = SlotLibrary(slots_dir)
+    slot = lib.get(dir_name)
+    count = lib.export_zip(slot, out_path, preset, workers=threads)
+    return {"files": count, "bytes": os.path.getsize(out_path), "path": out_path}
+
+def _import_one(slots_dir, zip_path, name, overwrite, threads):
+    lib = SlotLibrary(slots_dir)
+    # Other processes write to the same blob store, GC is left to the parent
+    slot, result = lib.import_zip(zip_path, name, overwrite=overwrite,
+                                  workers=threads, gc_on_error=False)
+    return {"slot": slot.dir_name, "mod_count": slot.mod_count, "files": result.file_count,
+            "written_bytes": result.written_bytes, "skipped_bytes": result.skipped_bytes}
+
+def verify_ok(report):
+    return not (report["missing"] or report["modified"] or report["extra"])
+
+
+def run_pool(op, tasks, workers):
+    """
+    tasks: [(slot label, func, args)]. Emits one line per task as they
+    finish and returns True if all of them succeeded.
+    """
+    all_ok = True
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(func, *args): label for label, func, args in tasks}
+        for future in as_completed(futures):
+            label = futures[future]
+            try:
+                record = {"op": op, "slot": label, "ok": True}
+                record.update(future.result())
+            except Exception as e:
+                record = {"op": op, "slot": label, "ok": False, "error": str(e)}
+            all_ok = all_ok and record["ok"]
+            emit(record)
+    return all_ok
+
+
+# --- commands ----------------------------------------------------------------
+
+def cmd_list(lib, args):
+    for slot in lib.list_slots():
+        emit(dict(slot_record(slot), op="list", ok=True))
+    return True
+
+def cmd_save(lib, args):
+    slot, written = lib.save_from_live(args.name, args.exe or configured_exe(), overwrite=args.overwrite)
+    emit(dict(slot_record(slot), op="save", ok=True, written_bytes=written))
+    return True
+
+def cmd_load(lib, args):
+    slot = lib.get(args.name)
+    exe = args.exe or configured_exe()
+    game_dir = os.path.dirname(exe) if exe else None
+    snapshot = config.shared()["snapshot_before_switch"] and not args.no_snapshot
+    plan, mode = lib.activate(slot, utills.find_balatro_mods(), game_dir, args.mode,
+                              dry_run=args.dry_run, snapshot=snapshot)
+    record = {"op": "load", "slot": slot.dir_name, "ok": True, "mode": mode, "dry_run": args.dry_run}
+    if plan is not None:
+        record.update(copies=len(plan.copies), deletes=len(plan.deletes),
+                      unchanged=plan.unchanged, bytes=plan.bytes_to_copy, backends=plan.backends)
+    emit(record)
+    return True
+
+def cmd_import(lib, args):
+    slot, result = lib.import_zip(args.zip, args.name or os.path.splitext(os.path.basename(args.zip))[0],
+                                  overwrite=args.overwrite)
+    lib.store.collect_garbage()
+    lib.remember(slot)
+    emit(dict(slot_record(slot), op="import", ok=True,
+              written_bytes=result.written_bytes, skipped_bytes=result.skipped_bytes))
+    return True
+
+def cmd_export(lib, args):
+    slot = lib.get(args.name)
+    count = lib.export_zip(slot, args.out, args.preset)
+    emit({"op": "export", "slot": slot.dir_name, "ok": True, "files": count,
+          "bytes": os.path.getsize(args.out), "path": args.out})
+    return True
+
+def cmd_export_patch(lib, args):
+    base = lib.get(args.base)
+    slot = lib.get(args.name)
+    changed, deleted = lib.export_patch(base, slot, args.out, args.preset)
+    emit({"op": "export-patch", "slot": slot.dir_name, "base": base.dir_name, "ok": True, "files": changed,
+          "deleted": deleted, "bytes": os.path.getsize(args.out), "path": args.out})
+    return True
+
+def cmd_apply_patch(lib, args):
+    slot = lib.get(args.name)
+    result = lib.apply_patch(slot, args.zip)
+    emit(dict(slot_record(slot), op="apply-patch", ok=True,
+              written_bytes=result.written_bytes, skipped_bytes=result.skipped_bytes))
+    return True
+
+def cmd_mods(lib, args):
+    slot = lib.get(args.name)
+    for mod in slot.mods:
+        emit(dict(mod, op="mods", slot=slot.dir_name, ok=True))
+    return True
+
+def cmd_check(lib, args):
+    import conflicts
+    slot = lib.get(args.name)
+    problems = lib.analyze(slot)
+    for p in problems:
+        emit(dict(p, op="check", slot=slot.dir_name, ok=p["severity"] != conflicts.ERROR))
+    if not problems:
+        emit({"op": "check", "slot": slot.dir_name, "ok": True})
+    return not conflicts.has_errors(problems)
+
+def cmd_delete(lib, args):
+    slot = lib.get(args.name)
+    lib.delete(slot, force=args.force)
+    emit({"op": "delete", "slot": slot.dir_name, "ok": True})
+    return True
+
+def cmd_verify(lib, args):
+    report = lib.verify(lib.get(args.name), deep=args.deep, workers=args.workers)
+    ok = verify_ok(report)
+    emit(dict(report, op="verify", slot=args.name, ok=ok))
+    return ok
+
+def cmd_archive(lib, args):
+    if args.names:
+        slots = lib.freeze([lib.get(name) for name in args.names])
+    else:
+        # A configured 0 means never; --days 0 means everything not loaded
+        days = config.shared()["archive_after_days"] if args.days is None else args.days
+        slots = lib.freeze_idle(days) if days > 0 or args.days is not None else []
+    for slot in slots:
+        emit({"op": "archive", "slot": slot.dir_name, "ok": True, "files": lib.cold.slots[slot.dir_name]["files"]})
+    packs = lib.cold.packs.values()
+    emit({"op": "archive", "ok": True, "slots": len(slots), "archived_slots": len(lib.cold.slots),
+          "raw_bytes": sum(p["raw_bytes"] for p in packs), "packed_bytes": sum(p["packed_bytes"] for p in packs)})
+    return True
+
+def cmd_unarchive(lib, args):
+    slot = lib.get(args.name)
+    written = lib.thaw(slot)
+    emit(dict(slot_record(slot), op="unarchive", ok=True, written_bytes=written))
+    return True
+
+def cmd_snapshot(lib, args):
+    meta = lib.snapshot_appdata(args.reason)
+    emit({"op": "snapshot", "ok": True, "id": meta["id"], "slot": meta["slot"], "files": meta["file_count"],
+          "read_bytes": meta["read_bytes"], "stored_bytes": meta["stored_bytes"]})
+    return True
+
+def cmd_snapshots(lib, args):
+    for meta in lib.snapshots.list(args.slot):
+        emit(dict(meta, op="snapshots", ok=True))
+    return True
+
+def cmd_restore_snapshot(lib, args):
+    written, removed = lib.restore_snapshot(args.id)
+    emit({"op": "restore-snapshot", "id": args.id, "ok": True, "written": written, "removed": removed})
+    return True
+
+def cmd_update_loaders(lib, args):
+    import loaders
+    sources = dict(config.shared()["loader_sources"])
+    for item in args.source or []:
+        name, _, url = item.partition("=")
+        sources[name] = url
+    names = args.loaders or list(loaders.LOADERS)
+    exe = args.exe or configured_exe()
+    game_dir = os.path.dirname(exe) if exe else None
+    mods_dir = utills.find_balatro_mods()
+    cache_root = config.cache_dir("loaders")
+    updates = loaders.update_loaders(names, cache_root, sources)
+    slot = lib.loaded_slot()
+    if slot is None and not mods_dir:
+        raise SlotError("Could not find the Balatro appdata folder.")
+    loaders.retarget(updates, slot.mods if slot is not None else lib.live_mods(mods_dir))
+    skipped = []
+    if slot is not None:
+        for update in updates:
+            lib.install_files(slot, update.files, update.replace_prefix)
+        lib.activate(slot, mods_dir, game_dir, activation.read_live_state(lib.folder).get("mode", activation.MODE_COPY))
+    else:
+        with lib.switching():
+            skipped = loaders.install_live(updates, mods_dir, game_dir)
+    loaders.mark_installed(cache_root, updates)
+    for update in updates:
+        emit({"op": "update-loader", "loader": update.name, "ok": True, "version": update.version,
+              "changed": update.changed, "downloaded": update.downloaded,
+              "slot": slot.dir_name if slot else None,
+              "skipped": [rel for rel in skipped if rel in update.files]})
+    return not skipped
+
+def cmd_launch(lib, args):
+    import conflicts
+    exe = args.exe or configured_exe()
+    if not exe:
+        raise SlotError("No Balatro.exe set, pass --exe")
+    mods_dir = utills.find_balatro_mods()
+    slot, problems, cached = lib.preflight(exe, mods_dir)
+    record = {"op": "launch", "slot": slot.dir_name if slot else None, "preflight_cached": cached,
+              "problems": problems}
+    if conflicts.has_errors(problems) and not args.force:
+        emit(dict(record, ok=False, error="Pre-flight checks failed, --force to launch anyway"))
+        return False
+    if config.shared()["snapshot_before_launch"] and not args.no_snapshot:
+        try:
+            lib.snapshot_appdata("launch")
+        except SlotError as e:
+            record["snapshot_error"] = str(e)
+    run = lib.launch(exe, mods_dir, args.wait)
+    if not args.watch:
+        emit(dict(record, ok=True, pid=run.pid))
+        return True
+    # The monitor thread dies with this process, so only --watch records the exit
+    run.wait()
+    emit(dict(record, **run.to_record(), ok=not run.crashed))
+    return not run.crashed
+
+def cmd_launch_stats(lib, args):
+    for dir_name, stats in sorted(lib.launch_stats().items()):
+        emit(dict(stats, op="launch-stats", slot=dir_name, ok=True))
+    return True
+
+def cmd_export_all(lib, args):
+    os.makedirs(args.out_dir, exist_ok=True)
+    threads = zip_threads(args.workers)
+    tasks = [(slot.dir_name, _export_one,
+              (lib.folder, slot.dir_name, os.path.join(args.out_dir, slot.dir_name + ".zip"), args.preset, threads))
+             for slot in lib.list_slots()]
+    return run_pool("export", tasks, args.workers)
+
+def cmd_import_dir(lib, args):
+    threads = zip_threads(args.workers)
+    tasks = []
+    for fname in sorted(os.listdir(args.dir)):
+        if fname.lower().endswith(".zip"):
+            name = os.path.splitext(fname)[0]
+            tasks.append((name, _import_one, (lib.folder, os.path.join(args.dir, fname), name, args.overwrite, threads)))
+    ok = run_pool("import", tasks, args.workers)
+    # Workers skip GC and the catalog; do both once here
+    lib.store.collect_garbage()
+    lib.list_slots()
+    return ok
+
+def cmd_verify_all(lib, args):
+    # One process: hashing runs on threads and shared blobs are read once
+    reports, stats = lib.verify_many(lib.list_slots(), deep=args.deep, workers=args.workers)
+    all_ok = True
+    for dir_name, report in sorted(reports.items()):
+        ok = verify_ok(report)
+        all_ok = all_ok and ok
+        emit(dict(report, op="verify", slot=dir_name, ok=ok))
+    emit(dict(stats, op="verify-all", ok=all_ok))
+    return all_ok
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="balatrotool", description="BalatroTool slot manager")
+    parser.add_argument("--slots-dir", default=DEFAULT_SLOTS_FOLDER, help="mod_slots folder to work on")
+    parser.add_argument("--trace", action="store_true", help="record operation spans to logs/trace.jsonl")
+    parser.add_argument("--profile", action="store_true", help="with --trace, save a cProfile per operation")
+    sub = parser.add_subparsers(dest="command")
+
+    sub.add_parser("list", help="list slots")
+
+    p = sub.add_parser("save", help="save the current exe + Mods folder as a slot")
+    p.add_argument("name")
+    p.add_argument("--exe", help="path to Balatro.exe (default: from the config)")
+    p.add_argument("--overwrite", action="store_true")
+
+    p = sub.add_parser("load", help="deploy a slot into the game")
+    p.add_argument("name")
+    p.add_argument("--exe", help="path to Balatro.exe (default: from the config)")
+    p.add_argument("--mode", choices=[activation.MODE_COPY, activation.MODE_LINK], default=activation.MODE_COPY)
+    p.add_argument("--dry-run", action="store_true", help="only report what would be copied")
+    p.add_argument("--no-snapshot", action="store_true", help="don't back up the save files first")
+
+    p = sub.add_parser("import", help="import a zip as a slot")
+    p.add_argument("zip")
+    p.add_argument("name", nargs="?", help="slot name (default: zip file name)")
+    p.add_argument("--overwrite", action="store_true")
+
+    p = sub.add_parser("export", help="export a slot as a zip")
+    p.add_argument("name")
+    p.add_argument("out")
+    p.add_argument("--preset", choices=list(ziptools.EXPORT_PRESETS), default=ziptools.DEFAULT_PRESET)
+
+    p = sub.add_parser("export-patch", help="export only what changed between two slots")
+    p.add_argument("base", help="slot the receiver already has")
+    p.add_argument("name", help="slot the patch turns base into")
+    p.add_argument("out")
+    p.add_argument("--preset", choices=list(ziptools.EXPORT_PRESETS), default=ziptools.DEFAULT_PRESET)
+
+    p = sub.add_parser("apply-patch", help="update a slot in place from a patch zip")
+    p.add_argument("name")
+    p.add_argument("zip")
+
+    p = sub.add_parser("mods", help="list the mods found in a slot")
+    p.add_argument("name")
+
+    p = sub.add_parser("check", help="look for conflicts and missing dependencies in a slot")
+    p.add_argument("name")
+
+    p = sub.add_parser("delete", help="delete a slot")
+    p.add_argument("name")
+    p.add_argument("--force", action="store_true", help="delete even if locked")
+
+    p = sub.add_parser("verify", help="check a slot's files against their recorded hashes")
+    p.add_argument("name")
+    p.add_argument("--deep", action="store_true", help="hash every file, even ones whose stat is unchanged")
+    p.add_argument("--workers", type=int, default=None, help="hashing threads")
+
+    p = sub.add_parser("archive", help="pack slots into compressed cold storage")
+    p.add_argument("names", nargs="*", help="slots to archive (default: all unused for --days)")
+    p.add_argument("--days", type=int, default=None, help="idle days (default: from the config)")
+
+    p = sub.add_parser("unarchive", help="unpack an archived slot right away")
+    p.add_argument("name")
+
+    p = sub.add_parser("snapshot", help="back up the appdata save files")
+    p.add_argument("--reason", default="manual")
+
+    p = sub.add_parser("snapshots", help="list save backups")
+    p.add_argument("--slot", help="only backups taken under this slot")
+
+    p = sub.add_parser("restore-snapshot", help="put a save backup back")
+    p.add_argument("id", help="backup id as printed by snapshots")
+
+    p = sub.add_parser("update-loaders", help="download and install Lovely/Steamodded")
+    p.add_argument("loaders", nargs="*", help="lovely, steamodded (default: both)")
+    p.add_argument("--exe", help="path to Balatro.exe (default: from the config)")
+    p.add_argument("--source", action="append", metavar="NAME=URL", help="release URL for a loader")
+
+    p = sub.add_parser("launch", help="check the deployed slot and start the game")
+    p.add_argument("--exe", help="path to Balatro.exe (default: from the config)")
+    p.add_argument("--force", action="store_true", help="launch even if the pre-flight checks fail")
+    p.add_argument("--no-snapshot", action="store_true", help="don't back up the save files first")
+    p.add_argument("--wait", type=float, default=0, help="seconds to wait for a running slot switch")
+    p.add_argument("--watch", action="store_true", help="stay until the game exits and report how it went")
+
+    sub.add_parser("launch-stats", help="launches, crash rate and time to menu per slot")
+
+    workers = os.cpu_count() or 1
+    p = sub.add_parser("export-all", help="export every slot into a folder")
+    p.add_argument("out_dir")
+    p.add_argument("--preset", choices=list(ziptools.EXPORT_PRESETS), default=ziptools.DEFAULT_PRESET)
+    p.add_argument("--workers", type=int, default=workers)
+
+    p = sub.add_parser("import-dir", help="import every zip in a folder")
+    p.add_argument("dir")
+    p.add_argument("--overwrite", action="store_true")
+    p.add_argument("--workers", type=int, default=workers)
+
+    p = sub.add_parser("verify-all", help="check every slot")
+    p.add_argument("--deep", action="store_true", help="hash every file, even ones whose stat is unchanged")
+    p.add_argument("--workers", type=int, default=None, help="hashing threads")
+    return parser
+
+COMMANDS = {
+    "list": cmd_list,
+    "save": cmd_save,
+    "load": cmd_load,
+    "import": cmd_import,
+    "export": cmd_export,
+    "export-patch": cmd_export_patch,
+    "apply-patch": cmd_apply_patch,
+    "mods": cmd_mods,
+    "check": cmd_check,
+    "delete": cmd_delete,
+    "verify": cmd_verify,
+    "archive": cmd_archive,
+    "unarchive": cmd_unarchive,
+    "snapshot": cmd_snapshot,
+    "snapshots": cmd_snapshots,
+    "restore-snapshot": cmd_restore_snapshot,
+    "update-loaders": cmd_update_loaders,
+    "launch": cmd_launch,
+    "launch-stats": cmd_launch_stats,
+    "export-all": cmd_export_all,
+    "import-dir": cmd_import_dir,
+    "verify-all": cmd_verify_all,
+}
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if not args.command:
+        from main import BalatroToolApp
+        app = BalatroToolApp()
+        app.mainloop()
+        return 0
+    tracing.configure(args.trace, args.profile)
+    lib = SlotLibrary(args.slots_dir)
+    lib.snapshot_keep = config.shared()["snapshot_keep"]
+    try:
+        ok = COMMANDS[args.command](lib, args)
+    except (SlotError, OSError, ValueError) as e:
+        emit({"op": args.command, "slot": getattr(args, "name", None), "ok": False, "error": str(e)})
+        ok = False
+    return 0 if ok else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,405 @@
+"""
+Benchmarks for the slot operations on generated mod trees.
+
+    python bench.py --profile medium --out bench-results.json
+    python bench.py --profile medium --baseline bench-baseline.json
+
+Every run of every operation happens in a fresh child process so peak RSS
+and I/O counts belong to that operation alone. Nothing here imports tkinter,
+it runs fine on a headless box. Trees are generated from a seed, so two
+machines benchmarking the same profile work on identical data.
+"""
+import os
+import sys
+import json
+import math
+import time
+import random
+import shutil
+import argparse
+import platform
+import tempfile
+import statistics
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+import utills
+import slotstore
+import activation
+import catalog
+import modindex
+import ziptools
+import launcher
+from slots import SlotLibrary, ModSlot
+
+PROFILES = {
+    # mods in the pool, files per mod, median/max file size, share of
+    # incompressible files (textures, audio), slots, mods per slot
+    "small": {"mods": 20, "files_per_mod": 15, "median_size": 4 * 1024, "max_size": 1024 * 1024,
+              "incompressible": 0.2, "slots": 10, "mods_per_slot": 8},
+    "medium": {"mods": 80, "files_per_mod": 40, "median_size": 8 * 1024, "max_size": 8 * 1024 * 1024,
+               "incompressible": 0.3, "slots": 40, "mods_per_slot": 20},
+    "large": {"mods": 200, "files_per_mod": 80, "median_size": 16 * 1024, "max_size": 32 * 1024 * 1024,
+              "incompressible": 0.4, "slots": 150, "mods_per_slot": 40},
+}
+EXE_SIZE = 4 * 1024 * 1024
+DEFAULT_SEED = 1234
+DEFAULT_THRESHOLD = 1.25
+
+TEXT_EXTS = (".lua", ".json", ".txt", ".toml")
+BINARY_EXTS = (".png", ".ogg", ".ttf")
+LUA_WORDS = ("local", "function", "end", "return", "if", "then", "else", "for", "in", "pairs",
+             "self", "card", "joker", "mult", "chips", "G.GAME", "SMODS", "config", "extra", "nil")
+
+
+# --- tree generation ---------------------------------------------------------
+
+def _text_bytes(rng, size):
+    out = []
+    n = 0
+    while n < size:
+        line = " ".join(rng.choice(LUA_WORDS) for _ in range(rng.randint(3, 12))) + "\n"
+        out.append(line)
+        n += len(line)
+    return "".join(out).encode()[:size]
+
+def _file_size(rng, params):
+    size = int(rng.lognormvariate(math.log(params["median_size"]), 1.2))
+    return max(16, min(size, params["max_size"]))
+
+def generate_workspace(root, params, seed=DEFAULT_SEED):
+    """
+    Writes a pool of mods (the "live" exe + Mods folder) under root/live and
+    saves params["slots"] slots built from random subsets of it into
+    root/mod_slots. Overlapping subsets give the blob store real dedup work.
+    """
+    rng = random.Random(seed)
+    live = os.path.join(root, "live")
+    mods_root = os.path.join(live, utills.MODS_DIRNAME)
+    os.makedirs(mods_root)
+    with open(os.path.join(live, "Balatro.exe"), "wb") as f:
+        f.write(rng.randbytes(EXE_SIZE // 2) + _text_bytes(rng, EXE_SIZE // 2))
+
+    mod_files = []
+    for m in range(params["mods"]):
+        mod_dir = os.path.join(mods_root, f"mod{m:04d}")
+        # Steamodded header, so the mod indexer has something to parse
+        deps = [f"mod{d:04d}" for d in rng.sample(range(m), min(m, rng.randint(0, 2)))]
+        header = (f"--- STEAMODDED HEADER\n--- MOD_NAME: Mod {m}\n--- MOD_ID: mod{m:04d}\n"
+                  f"--- VERSION: 1.{m % 7}.0\n--- DEPENDENCIES: [{', '.join(deps)}]\n")
+        main_path = os.path.join(mod_dir, "main.lua")
+        os.makedirs(mod_dir)
+        with open(main_path, "wb") as f:
+            f.write(header.encode() + _text_bytes(rng, _file_size(rng, params)))
+        files = [(f"{utills.MODS_DIRNAME}/mod{m:04d}/main.lua", main_path)]
+        for n in range(params["files_per_mod"]):
+            binary = rng.random() < params["incompressible"]
+            ext = rng.choice(BINARY_EXTS if binary else TEXT_EXTS)
+            rel = f"assets/f{n:04d}{ext}" if binary else f"src/f{n:04d}{ext}"
+            path = os.path.join(mod_dir, *rel.split("/"))
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            size = _file_size(rng, params)
+            with open(path, "wb") as f:
+                f.write(rng.randbytes(size) if binary else _text_bytes(rng, size))
+            files.append((f"{utills.MODS_DIRNAME}/mod{m:04d}/{rel}", path))
+        mod_files.append(files)
+
+    slots_folder = os.path.join(root, "mod_slots")
+    lib = SlotLibrary(slots_folder)
+    store = lib.store
+    for s in range(params["slots"]):
+        sources = {"Balatro.exe": os.path.join(live, "Balatro.exe")}
+        for m in rng.sample(range(params["mods"]), min(params["mods_per_slot"], params["mods"])):
+            sources.update(mod_files[m])
+        slot_path = os.path.join(slots_folder, f"slot{s:04d}")
+        slotstore.save_slot(store, slot_path, sources)
+        lib.index_mods(ModSlot(f"slot{s:04d}", slot_path))
+
+    # Fixture for the import benchmark
+    ziptools.export_slot_zip(store, os.path.join(slots_folder, "slot0000"), os.path.join(root, "fixture.zip"))
+    return slots_folder
+
+
+# --- operations (run inside the child process) --------------------------------
+# Each takes (workspace, scratch) and returns extra fields for the result.
+
+def _tree_bytes(root):
+    return sum(os.path.getsize(os.path.join(d, f)) for d, _, files in os.walk(root) for f in files)
+
+def op_load_slots_cold(ws, scratch):
+    folder = os.path.join(ws, "mod_slots")
+    for name in (catalog.CATALOG_NAME, modindex.INDEX_CACHE_NAME):
+        try:
+            os.remove(os.path.join(folder, name))
+        except FileNotFoundError:
+            pass
+    return {"slots": len(SlotLibrary(folder).list_slots())}
+
+def op_load_slots_warm(ws, scratch):
+    lib = SlotLibrary(os.path.join(ws, "mod_slots"))
+    return {"slots": len(lib.list_slots())}
+
+def op_index_mods(ws, scratch):
+    # Every slot with an empty parse cache: all metadata files are read
+    folder = os.path.join(ws, "mod_slots")
+    try:
+        os.remove(os.path.join(folder, modindex.INDEX_CACHE_NAME))
+    except FileNotFoundError:
+        pass
+    lib = SlotLibrary(folder)
+    total = 0
+    for name in sorted(os.listdir(folder)):
+        if not name.startswith("."):
+            total += len(lib.index_mods(ModSlot(name, os.path.join(folder, name)), save=False))
+    lib.indexer.save()
+    return {"mods": total}
+
+def op_analyze_slot(ws, scratch):
+    # Cold analysis, then the cached call that runs before every load/launch
+    lib = SlotLibrary(os.path.join(ws, "mod_slots"))
+    slot = lib.get("slot0000")
+    start = time.perf_counter()
+    problems = lib.analyze(slot)
+    cold_ms = (time.perf_counter() - start) * 1000
+    start = time.perf_counter()
+    lib.analyze(slot)
+    warm_ms = (time.perf_counter() - start) * 1000
+    return {"problems": len(problems), "mods": slot.mod_count,
+            "cold_ms": round(cold_ms, 3), "warm_ms": round(warm_ms, 3)}
+
+def op_export_zip(ws, scratch):
+    lib = SlotLibrary(os.path.join(ws, "mod_slots"))
+    out = os.path.join(scratch, "export.zip")
+    count = lib.export_zip(lib.get("slot0000"), out)
+    return {"files": count, "zip_bytes": os.path.getsize(out)}
+
+def op_import_zip(ws, scratch):
+    # Fresh store, so every blob is really written
+    lib = SlotLibrary(os.path.join(scratch, "mod_slots"))
+    _, result = lib.import_zip(os.path.join(ws, "fixture.zip"), "imported")
+    return {"files": result.file_count, "written_bytes": result.written_bytes}
+
+def op_copy_mods_and_exe(ws, scratch):
+    report = {}
+    if not utills.copy_mods_and_exe(os.path.join(ws, "live"), os.path.join(scratch, "copy"), report):
+        raise RuntimeError("copy_mods_and_exe failed")
+    return {"backends": report}
+
+def op_activate_slot(ws, scratch):
+    lib = SlotLibrary(os.path.join(ws, "mod_slots"))
+    game_dir = os.path.join(scratch, "game")
+    os.makedirs(game_dir)
+    plan, _ = lib.activate(lib.get("slot0000"), os.path.join(scratch, utills.MODS_DIRNAME), game_dir)
+    return {"files": len(plan.copies), "backends": plan.backends}
+
+def op_archive_slots(ws, scratch):
+    # Archive every slot but one, list them warm, unpack them again (leaves the workspace as it was)
+    lib = SlotLibrary(os.path.join(ws, "mod_slots"))
+    slots = [s for s in lib.list_slots() if s.dir_name != "slot0000"]
+    before = _tree_bytes(lib.store.root)
+    start = time.perf_counter()
+    lib.freeze(slots)
+    freeze_ms = (time.perf_counter() - start) * 1000
+    after = _tree_bytes(lib.store.root) + _tree_bytes(lib.cold.root)
+    start = time.perf_counter()
+    cold = sum(s.cold for s in lib.list_slots())
+    list_ms = (time.perf_counter() - start) * 1000
+    start = time.perf_counter()
+    for slot in slots:
+        lib.thaw(slot)
+    thaw_ms = (time.perf_counter() - start) * 1000
+    return {"slots": cold, "store_bytes_before": before, "store_bytes_after": after,
+            "freeze_ms": round(freeze_ms, 1), "list_ms": round(list_ms, 1), "thaw_ms": round(thaw_ms, 1)}
+
+def op_launch_preflight(ws, scratch):
+    # Pre-flight for a freshly deployed slot, then again with nothing changed
+    lib = SlotLibrary(os.path.join(ws, "mod_slots"))
+    game_dir = os.path.join(scratch, "game")
+    mods_dir = os.path.join(scratch, utills.MODS_DIRNAME)
+    os.makedirs(game_dir)
+    lib.activate(lib.get("slot0000"), mods_dir, game_dir)
+    exes = [n for n in os.listdir(game_dir) if n.lower().endswith(".exe")]
+    exe_path = os.path.join(game_dir, exes[0] if exes else "Balatro.exe")
+    start = time.perf_counter()
+    _, problems, _ = lib.preflight(exe_path, mods_dir)
+    check_ms = (time.perf_counter() - start) * 1000
+    start = time.perf_counter()
+    _, _, cached = lib.preflight(exe_path, mods_dir)
+    cached_ms = (time.perf_counter() - start) * 1000
+    return {"problems": len(problems), "cached": cached,
+            "check_ms": round(check_ms, 2), "cached_ms": round(cached_ms, 3)}
+
+OPERATIONS = {
+    "load_slots_cold": op_load_slots_cold,
+    "load_slots_warm": op_load_slots_warm,
+    "index_mods": op_index_mods,
+    "analyze_slot": op_analyze_slot,
+    "export_zip": op_export_zip,
+    "import_zip": op_import_zip,
+    "copy_mods_and_exe": op_copy_mods_and_exe,
+    "activate_slot": op_activate_slot,
+    "archive_slots": op_archive_slots,
+    "launch_preflight": op_launch_preflight,
+}
+
+
+def _proc_io():
+    # rchar/wchar count every read()/write(), page cache hits included
+    try:
+        with open("/proc/self/io") as f:
+            fields = dict(line.split(": ") for line in f.read().splitlines())
+        return int(fields["rchar"]), int(fields["wchar"])
+    except (OSError, KeyError, ValueError):
+        return None, None
+
+def _peak_rss_kb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # bytes on macOS, KiB elsewhere
+    return peak // 1024 if sys.platform == "darwin" else peak
+
+def _run_in_child(name, ws, scratch):
+    # Interpreter + imports, so the peak can be read relative to it
+    base_rss = _peak_rss_kb()
+    read0, written0 = _proc_io()
+    start = time.perf_counter()
+    extra = OPERATIONS[name](ws, scratch)
+    wall = time.perf_counter() - start
+    read1, written1 = _proc_io()
+    return {
+        "wall_s": wall,
+        "peak_rss_kb": _peak_rss_kb(),
+        "base_rss_kb": base_rss,
+        "read_bytes": None if read0 is None else read1 - read0,
+        "written_bytes": None if written0 is None else written1 - written0,
+        "extra": extra,
+    }
+
+
+# --- driver ---------------------------------------------------------------------
+
+def _reset(ws, scratch):
+    shutil.rmtree(scratch, ignore_errors=True)
+    os.makedirs(scratch)
+    # activate_slot leaves a deployed-state file behind, launch_preflight its cache
+    for name in (activation.LIVE_STATE_NAME, launcher.LAUNCHES_NAME):
+        try:
+            os.remove(os.path.join(ws, "mod_slots", name))
+        except FileNotFoundError:
+            pass
+
+def run_operation(name, ws, repeat):
+    ctx = multiprocessing.get_context("spawn")
+    scratch = os.path.join(ws, "scratch")
+    runs = []
+    for _ in range(repeat):
+        _reset(ws, scratch)
+        if name == "load_slots_warm":
+            SlotLibrary(os.path.join(ws, "mod_slots")).list_slots()
+        with ProcessPoolExecutor(max_workers=1, mp_context=ctx) as pool:
+            runs.append(pool.submit(_run_in_child, name, ws, scratch).result())
+    _reset(ws, scratch)
+    walls = [r["wall_s"] for r in runs]
+    rss = [r["peak_rss_kb"] for r in runs if r["peak_rss_kb"] is not None]
+    return {
+        "wall_s": statistics.median(walls),
+        "wall_min_s": min(walls),
+        "peak_rss_kb": max(rss) if rss else None,
+        "base_rss_kb": runs[-1]["base_rss_kb"],
+        "read_bytes": runs[-1]["read_bytes"],
+        "written_bytes": runs[-1]["written_bytes"],
+        "extra": runs[-1]["extra"],
+        "runs": walls,
+    }
+
+def compare(results, baseline, threshold):
+    """
+    Returns [(operation, baseline wall, new wall, ratio, regressed)] for
+    the operations present in both result sets.
+    """
+    rows = []
+    for name, new in results["results"].items():
+        old = baseline.get("results", {}).get(name)
+        if not old:
+            continue
+        ratio = new["wall_s"] / old["wall_s"] if old["wall_s"] else float("inf")
+        rows.append((name, old["wall_s"], new["wall_s"], ratio, ratio > threshold))
+    return rows
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark BalatroTool slot operations")
+    parser.add_argument("--profile", choices=list(PROFILES), default="small")
+    parser.add_argument("--mods", type=int)
+    parser.add_argument("--files-per-mod", type=int)
+    parser.add_argument("--median-size", type=int, help="median file size in bytes")
+    parser.add_argument("--max-size", type=int)
+    parser.add_argument("--incompressible", type=float, help="share of incompressible files, 0..1")
+    parser.add_argument("--slots", type=int)
+    parser.add_argument("--mods-per-slot", type=int)
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--only", nargs="+", choices=list(OPERATIONS), help="run only these operations")
+    parser.add_argument("--workdir", help="where to generate the trees (default: a temp dir)")
+    parser.add_argument("--keep", action="store_true", help="keep the generated trees")
+    parser.add_argument("--out", default="bench-results.json")
+    parser.add_argument("--baseline", help="results file to compare against")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="slowdown ratio that counts as a regression")
+    args = parser.parse_args(argv)
+
+    params = dict(PROFILES[args.profile])
+    for key in params:
+        value = getattr(args, key)
+        if value is not None:
+            params[key] = value
+
+    ws = tempfile.mkdtemp(prefix="bt-bench-", dir=args.workdir)
+    try:
+        start = time.perf_counter()
+        generate_workspace(ws, params, args.seed)
+        print(f"generated {args.profile} tree in {time.perf_counter() - start:.1f}s", file=sys.stderr)
+        results = {
+            "meta": {
+                "profile": args.profile,
+                "params": params,
+                "seed": args.seed,
+                "repeat": args.repeat,
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "cpu_count": os.cpu_count(),
+                "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            },
+            "results": {},
+        }
+        for name in args.only or OPERATIONS:
+            result = run_operation(name, ws, args.repeat)
+            results["results"][name] = result
+            print(f"{name:20} {result['wall_s'] * 1000:9.1f} ms  rss {result['peak_rss_kb'] or 0:>8} KiB",
+                  file=sys.stderr)
+    finally:
+        if not args.keep:
+            shutil.rmtree(ws, ignore_errors=True)
+
+    utills.write_json_atomic(args.out, results)
+    if not args.baseline:
+        return 0
+
+    with open(args.baseline, "r") as f:
+        baseline = json.load(f)
+    if baseline.get("meta", {}).get("params") != params:
+        print("warning: baseline was recorded with different tree parameters", file=sys.stderr)
+    regressed = False
+    for name, old, new, ratio, bad in compare(results, baseline, args.threshold):
+        flag = "  REGRESSION" if bad else ""
+        print(f"{name:20} {old * 1000:9.1f} -> {new * 1000:9.1f} ms  x{ratio:.2f}{flag}")
+        regressed = regressed or bad
+    return 1 if regressed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,87 @@
+import os
+import json
+import threading
+
+import utills
+import slotstore
+
+# One index file for the whole slots folder. Startup only rescans slots whose
+# stat fingerprint moved since the last run.
+CATALOG_NAME = ".catalog.json"
+CATALOG_VERSION = 3
+
+
+def _stat_key(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return [st.st_size, st.st_mtime_ns]
+
+def slot_fingerprint(slot_path):
+    """
+    Cheap change detector for a slot: the folder itself plus its metadata
+    and manifest. Loose-file slots (no manifest) also include their
+    top-level entries since nested edits don't touch the folder mtime.
+    """
+    fp = [
+        _stat_key(slot_path),
+        _stat_key(os.path.join(slot_path, slotstore.METADATA_NAME)),
+        _stat_key(os.path.join(slot_path, slotstore.MANIFEST_NAME)),
+    ]
+    if fp[2] is None:
+        for name in sorted(os.listdir(slot_path)):
+            fp.append([name, _stat_key(os.path.join(slot_path, name))])
+    return fp
+
+
+class SlotCatalog:
+    def __init__(self, slots_folder):
+        self.path = os.path.join(slots_folder, CATALOG_NAME)
+        # The startup scan updates it on a job thread while the UI remembers
+        # single slots, so every change and the dump go through the lock
+        self.lock = threading.Lock()
+        self.slots = {}
+        self.dirty = False
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, "r") as f:
+                    data = json.load(f)
+                if data.get("version") == CATALOG_VERSION:
+                    self.slots = data.get("slots", {})
+            except (OSError, ValueError):
+                self.slots = {}
+
+    def lookup(self, dir_name, fingerprint):
+        # Cached metadata dict if the slot hasn't changed, else None
+        cached = self.slots.get(dir_name)
+        if cached and cached["fingerprint"] == fingerprint:
+            return cached["meta"]
+        return None
+
+    def update(self, dir_name, slot_path, meta):
+        record = {"fingerprint": slot_fingerprint(slot_path), "meta": meta}
+        with self.lock:
+            if self.slots.get(dir_name) != record:
+                self.slots[dir_name] = record
+                self.dirty = True
+
+    def forget(self, dir_name):
+        with self.lock:
+            if self.slots.pop(dir_name, None) is not None:
+                self.dirty = True
+
+    def prune(self, keep):
+        with self.lock:
+            for dir_name in list(self.slots):
+                if dir_name not in keep:
+                    del self.slots[dir_name]
+                    self.dirty = True
+
+    def save(self):
+        with self.lock:
+            if not self.dirty:
+                return
+            slots = dict(self.slots)
+            utills.write_json_atomic(self.path, {"version": CATALOG_VERSION, "slots": slots}, indent=None)
+            self.dirty = False
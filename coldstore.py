@@ -0,0 +1,262 @@
+import os
+import json
+import time
+import zlib
+import zipfile
+import tempfile
+import threading
+
+import utills
+import slotstore
+import ziptools
+
+# Cold tier for slots nobody has loaded in a while. Their blobs that no hot
+# slot shares are packed, once each, into compressed zips under .cold/
+# (one pack per archiving run) and leave the blob store; the slot folder
+# keeps its manifest and metadata, so listing it costs the same as before.
+# Loading, exporting or patching a cold slot unpacks its blobs again
+# (thaw); verify reads the packs as they are.
+#
+# Invariant: every blob a cold slot's manifest names is in the blob store
+# or in a pack. Garbage collection only frees blobs that are packed
+# (BlobStore.cold), and a pack is only deleted once no cold slot uses it.
+
+COLD_DIRNAME = ".cold"
+INDEX_NAME = "index.json"
+INDEX_VERSION = 1
+PACK_PREFIX = "pack-"
+COPY_CHUNK = 1024 * 1024
+# What reading a damaged pack member can raise
+DAMAGED = (zipfile.BadZipFile, EOFError, zlib.error)
+
+
+class ColdStoreError(OSError):
+    pass
+
+
+def _manifest_key(slot_path):
+    # A slot that got re-imported or re-saved since it was frozen is not cold anymore
+    try:
+        st = os.stat(os.path.join(slot_path, slotstore.MANIFEST_NAME))
+    except OSError:
+        return None
+    return [st.st_size, st.st_mtime_ns]
+
+def _manifest_hashes(slot_path):
+    manifest = slotstore.read_manifest(slot_path)
+    return {e["hash"]: e for e in manifest["files"].values()} if manifest else {}
+
+
+class ColdStore:
+    """
+    <slots folder>/.cold/index.json:
+      "slots": dir_name -> {"frozen", "manifest", "files", "bytes"}, manifest
+               being the stat of the slot's manifest.json when it was frozen
+      "packs": pack file -> {"created", "blobs", "raw_bytes", "packed_bytes"}
+    Which blob sits in which pack comes from the packs' own zip directories,
+    read the first time a blob is actually needed.
+    """
+
+    def __init__(self, store):
+        self.store = store
+        self.root = os.path.join(store.slots_folder, COLD_DIRNAME)
+        self.index_path = os.path.join(self.root, INDEX_NAME)
+        # Held for whole freeze/thaw runs, so a pack can't be dropped while
+        # a freeze is counting on it. Both also count as store writers (taken
+        # first), garbage collection asks covered() and must not run meanwhile.
+        self.lock = threading.RLock()
+        self.slots = {}
+        self.packs = {}
+        self._packed = None  # digest -> pack file
+        try:
+            with open(self.index_path, "r") as f:
+                data = json.load(f)
+            if data.get("version") == INDEX_VERSION:
+                self.slots = data.get("slots", {})
+                self.packs = data.get("packs", {})
+        except (OSError, ValueError):
+            pass
+        store.cold = self
+
+    def save(self):
+        with self.lock:
+            os.makedirs(self.root, exist_ok=True)
+            utills.write_json_atomic(self.index_path, {"version": INDEX_VERSION, "slots": self.slots,
+                                                       "packs": self.packs}, indent=None)
+
+    def pack_path(self, name):
+        return os.path.join(self.root, name)
+
+    def info(self, dir_name, slot_path):
+        # Index entry of a slot that is cold right now, else None
+        entry = self.slots.get(dir_name)
+        if entry is None or entry["manifest"] != _manifest_key(slot_path):
+            return None
+        return entry
+
+    def packed(self):
+        with self.lock:
+            if self._packed is None:
+                packed = {}
+                for name in self.packs:
+                    try:
+                        with zipfile.ZipFile(self.pack_path(name)) as zf:
+                            for digest in zf.namelist():
+                                packed.setdefault(digest, name)
+                    except (OSError, zipfile.BadZipFile):
+                        continue  # its blobs count as gone, verify reports them
+                self._packed = packed
+            return self._packed
+
+    def covered(self, dir_name, slot_path):
+        # Digests the blob store may drop for this slot, the packs have them
+        if dir_name not in self.slots or self.info(dir_name, slot_path) is None:
+            return ()
+        return self.packed()
+
+    def freeze(self, slots, keep, job=None, preset=ziptools.DEFAULT_PRESET, workers=None):
+        """
+        slots: [(dir_name, slot_path)]. Packs their blobs that neither
+        `keep` (what hot slots use) nor an earlier pack holds into one new
+        pack and marks the slots cold. The blobs leave the store on the next
+        garbage collection. Returns ({dir_name: index entry}, pack entry or None).
+        """
+        with self.store.writing(), self.lock:
+            packed = self.packed()
+            wanted = {}
+            marked = {}
+            for dir_name, slot_path in slots:
+                manifest = slotstore.read_manifest(slot_path)
+                if manifest is None:
+                    raise ColdStoreError(f"Slot '{dir_name}' has no manifest, it can't be archived")
+                for entry in manifest["files"].values():
+                    digest = entry["hash"]
+                    # A blob that's gone already stays gone, verify reports it
+                    if digest not in keep and digest not in packed and digest not in wanted \
+                            and self.store.has(digest):
+                        wanted[digest] = entry
+                marked[dir_name] = {"frozen": time.time(), "manifest": _manifest_key(slot_path),
+                                    "files": len(manifest["files"]),
+                                    "bytes": sum(e["size"] for e in manifest["files"].values())}
+            pack = None
+            if wanted:
+                os.makedirs(self.root, exist_ok=True)
+                fd, path = tempfile.mkstemp(prefix=PACK_PREFIX, suffix=".zip", dir=self.root)
+                os.close(fd)
+                try:
+                    ziptools.pack_blobs(self.store, wanted, path, job, preset, workers)
+                except BaseException:
+                    os.remove(path)
+                    raise
+                pack = {"created": time.time(), "blobs": len(wanted),
+                        "raw_bytes": sum(e["size"] for e in wanted.values()),
+                        "packed_bytes": os.path.getsize(path)}
+                name = os.path.basename(path)
+                self.packs[name] = pack
+                for digest in wanted:
+                    packed[digest] = name
+            self.slots.update(marked)
+            self.save()
+            return marked, pack
+
+    def thaw(self, dir_name, slot_path, job=None):
+        """
+        Unpacks the blobs a cold slot is missing back into the store (each
+        one checked against its name) and takes it out of the index.
+        Returns bytes written.
+        """
+        with self.store.writing(), self.lock:
+            # Also run for an entry that went stale (its manifest was
+            # rewritten), the slot may still miss blobs only a pack has
+            if dir_name not in self.slots:
+                return 0
+            packed = self.packed()
+            by_pack = {}
+            for digest, entry in _manifest_hashes(slot_path).items():
+                if not self.store.has(digest) and digest in packed:
+                    by_pack.setdefault(packed[digest], []).append(entry)
+            if job:
+                job.add_total(sum(e["size"] for entries in by_pack.values() for e in entries))
+            written = 0
+            try:
+                for name, entries in sorted(by_pack.items()):
+                    with zipfile.ZipFile(self.pack_path(name)) as zf:
+                        for entry in entries:
+                            with zf.open(entry["hash"]) as src:
+                                digest, size, n = self.store.add_stream(src)
+                            if digest != entry["hash"]:
+                                raise ColdStoreError(f"Archive {name} is damaged ({entry['hash'][:12]})")
+                            written += n
+                            if job:
+                                job.add_progress(size)
+            except DAMAGED as e:
+                raise ColdStoreError(f"Archive of '{dir_name}' is damaged ({e})")
+            finally:
+                self.store.hash_cache.save()
+            del self.slots[dir_name]
+            self._drop_dead_packs()
+            self.save()
+            return written
+
+    def forget(self, dir_name):
+        # A cold slot was deleted
+        with self.lock:
+            if self.slots.pop(dir_name, None) is None:
+                return
+            self._drop_dead_packs()
+            self.save()
+
+    def _drop_dead_packs(self):
+        # Packs none of whose blobs a cold slot (stale ones included) still names
+        live = set()
+        for dir_name in self.slots:
+            live.update(_manifest_hashes(os.path.join(self.store.slots_folder, dir_name)))
+        packed = self.packed()
+        in_use = {name for digest, name in packed.items() if digest in live}
+        for name in list(self.packs):
+            if name not in in_use:
+                del self.packs[name]
+                path = self.pack_path(name)
+                if os.path.exists(path):
+                    os.remove(path)
+        self._packed = {digest: name for digest, name in packed.items() if name in self.packs}
+
+    def verify(self, dir_name, slot_path, deep=False):
+        """
+        Checks a cold slot without unpacking it: every blob must be in the
+        store or a pack; with deep, every blob it needs is hashed, from its
+        pack when it is packed (even if the store has a copy too), else
+        from the store.
+        Returns a report like slotstore.verify_slots plus "cold": True.
+        """
+        files = slotstore.slot_entries(slot_path)
+        packed = self.packed()
+        missing = []
+        modified = []
+        by_pack = {}
+        for rel, entry in files.items():
+            if entry["hash"] in packed:
+                if deep:
+                    by_pack.setdefault(packed[entry["hash"]], {}).setdefault(entry["hash"], []).append(rel)
+            elif not self.store.has(entry["hash"]):
+                missing.append(rel)
+            elif deep and slotstore.hash_file(self.store.blob_path(entry["hash"])) != entry["hash"]:
+                modified.append(rel)
+        for name, digests in sorted(by_pack.items()):
+            try:
+                zf = zipfile.ZipFile(self.pack_path(name))
+            except DAMAGED + (OSError,):
+                modified.extend(rel for rels in digests.values() for rel in rels)
+                continue
+            with zf:
+                for digest, rels in digests.items():
+                    h = slotstore.new_hasher()
+                    try:
+                        with zf.open(digest) as src:
+                            for chunk in iter(lambda: src.read(COPY_CHUNK), b""):
+                                h.update(chunk)
+                    except DAMAGED:
+                        pass
+                    if h.hexdigest() != digest:
+                        modified.extend(rels)
+        return {"missing": sorted(missing), "modified": sorted(modified), "extra": [], "cold": True}
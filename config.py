@@ -0,0 +1,198 @@
+import os
+import sys
+import copy
+import json
+import time
+import atexit
+import threading
+
+import utills
+import tracing
+import activation
+
+# The one place settings live. Everything reads the in-memory copy; writes
+# are batched and land on disk through a temp file + rename, so a setting
+# changed in one spot can never wipe out another.
+
+CONFIG_NAME = "balatrotool_config.json"
+# Where older versions kept it (next to the script), migrated on first load
+LEGACY_CONFIG_PATH = os.path.join(os.getcwd(), CONFIG_NAME)
+SAVE_DELAY = 0.5  # seconds of quiet before a batch of changes is written
+MAX_SAVE_DELAY = 3.0  # ...but never hold a change back longer than this
+SAVE_ERROR = "save_error"  # listener key for failed writes: (SAVE_ERROR, None, OSError)
+
+# key -> (allowed types, default, allowed values or None)
+SCHEMA = {
+    "dark_mode": ((bool,), True, None),
+    "balatro_exe_path": ((str, type(None)), None, None),
+    # checked against ziptools.EXPORT_PRESETS when exporting, None = default
+    "export_preset": ((str, type(None)), None, None),
+    "activation_mode": ((str,), activation.MODE_COPY, (activation.MODE_COPY, activation.MODE_LINK)),
+    "trace_enabled": ((bool,), False, None),
+    "trace_profile": ((bool,), False, None),
+    "auto_update_loaders": ((bool,), False, None),
+    # appdata save snapshots, see snapshots.py
+    "snapshot_before_switch": ((bool,), True, None),
+    "snapshot_before_launch": ((bool,), True, None),
+    "snapshot_keep": ((int,), 20, None),
+    # slots not loaded for this many days get archived (coldstore.py), 0 = never
+    "archive_after_days": ((int,), 30, None),
+    # loader name -> release URL, see loaders.LOADERS
+    "loader_sources": ((dict,), {}, None),
+}
+
+
+def config_dir():
+    # BALATROTOOL_CONFIG_DIR wins, for portable installs
+    override = os.getenv("BALATROTOOL_CONFIG_DIR")
+    if override:
+        return override
+    if sys.platform.startswith("win"):
+        base = os.getenv("APPDATA") or os.path.expanduser("~")
+        return os.path.join(base, "BalatroTool")
+    if sys.platform == "darwin":
+        return os.path.join(os.path.expanduser("~"), "Library", "Application Support", "BalatroTool")
+    base = os.getenv("XDG_CONFIG_HOME") or os.path.join(os.path.expanduser("~"), ".config")
+    return os.path.join(base, "balatrotool")
+
+def default_config_path():
+    return os.path.join(config_dir(), CONFIG_NAME)
+
+def cache_dir(name):
+    # Per-user cache folder next to the config (downloads etc.)
+    return os.path.join(config_dir(), "cache", name)
+
+def check_value(key, value):
+    """
+    Raises ValueError if value isn't allowed for a known key. Unknown keys
+    are passed through untouched so newer settings survive older versions.
+    """
+    if key not in SCHEMA:
+        return
+    types, _, choices = SCHEMA[key]
+    # bool is an int, but an int is not a bool
+    if not isinstance(value, types) or (bool in types and type(value) is not bool):
+        raise ValueError(f"Config '{key}' can't be {value!r}")
+    if choices is not None and value not in choices:
+        raise ValueError(f"Config '{key}' must be one of {', '.join(choices)}")
+
+
+class Config:
+    def __init__(self, path=None):
+        self.path = path or default_config_path()
+        self.values = {key: copy.deepcopy(default) for key, (_, default, _) in SCHEMA.items()}
+        self.listeners = []
+        self.lock = threading.RLock()
+        self.dirty = False
+        self._timer = None
+        self._first_change = None
+        self._load()
+        atexit.register(self.flush)
+
+    def _load(self):
+        path = self.path
+        migrate = False
+        if not os.path.exists(path) and os.path.exists(LEGACY_CONFIG_PATH):
+            path = LEGACY_CONFIG_PATH
+            migrate = True
+        try:
+            with open(path, "r") as f:
+                stored = json.load(f)
+        except (OSError, ValueError):
+            return
+        if not isinstance(stored, dict):
+            return
+        for key, value in stored.items():
+            try:
+                check_value(key, value)
+            except ValueError:
+                continue  # bad value, keep the default for this key only
+            self.values[key] = value
+        if migrate:
+            self.dirty = True
+            self.flush()
+
+    def __getitem__(self, key):
+        return self.get(key)
+
+    def get(self, key, default=None):
+        with self.lock:
+            return self.values.get(key, default)
+
+    def set(self, key, value):
+        self.update({key: value})
+
+    def update(self, changes):
+        """
+        Validates and applies {key: value}, tells the listeners about the
+        keys that really changed and schedules a write.
+        """
+        for key, value in changes.items():
+            check_value(key, value)
+        changed = []
+        with self.lock:
+            for key, value in changes.items():
+                old = self.values.get(key)
+                if old != value:
+                    self.values[key] = value
+                    changed.append((key, old, value))
+            if changed:
+                self.dirty = True
+                self._schedule_save()
+        for key, old, new in changed:
+            self._notify(key, old, new)
+
+    def add_listener(self, callback, key=None):
+        # callback(key, old, new) on the thread that made the change
+        self.listeners.append((key, callback))
+
+    def _notify(self, key, old, new):
+        for wanted, callback in list(self.listeners):
+            if wanted is None or wanted == key:
+                callback(key, old, new)
+
+    def remove_listener(self, callback):
+        self.listeners = [(k, cb) for k, cb in self.listeners if cb is not callback]
+
+    def _schedule_save(self):
+        # Restart the quiet period on each change, up to MAX_SAVE_DELAY
+        now = time.monotonic()
+        if self._timer is not None:
+            self._timer.cancel()
+        else:
+            self._first_change = now
+        delay = min(SAVE_DELAY, max(0.0, self._first_change + MAX_SAVE_DELAY - now))
+        self._timer = threading.Timer(delay, self.flush)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def flush(self):
+        # Writes pending changes now; also runs at exit
+        with self.lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            if not self.dirty:
+                return
+            try:
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+                utills.write_json_atomic(self.path, self.values)
+                self.dirty = False
+                return
+            except OSError as e:
+                error = e
+        # Stays dirty, so the next change or exit tries again
+        tracing.event("config.save_failed", path=self.path, error=str(error))
+        self._notify(SAVE_ERROR, None, error)
+
+
+_shared = None
+_shared_lock = threading.Lock()
+
+def shared():
+    # The process-wide Config, loaded from disk once
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = Config()
+        return _shared
@@ -0,0 +1,289 @@
+import re
+
+import utills
+
+# Checks a slot for the things that break a profile before the game even
+# starts: mods clashing over files, prefixes or Lovely patches, and missing
+# or circular dependencies. SlotAnalysis keeps an inverted index of the
+# slot's files so a changed slot only costs the paths that moved.
+
+ERROR = "error"
+WARNING = "warning"
+MODS_PREFIX = utills.MODS_DIRNAME + "/"
+_MODS_LOWER = MODS_PREFIX.lower()
+# Provided by the loader itself (the dll sits in the game folder, which a
+# slot doesn't always carry), so never reported missing
+IMPLICIT_IDS = {"lovely"}
+# Steamodded namespaces a mod's own assets by prefix; files under these
+# folders only clash when a mod without Steamodded metadata uses them
+ASSET_DIRS = ("assets/",)
+STEAMODDED_SOURCES = ("header", "json")
+
+_DEP_ID_RE = re.compile(r"^\s*([^\s(<>=!|]+)")
+_CONSTRAINT_RE = re.compile(r"(<<|>>|<=|>=|==|=|<|>)\s*([^\s()<>=|]+)")
+_NUMBERS_RE = re.compile(r"\d+")
+
+
+def parse_dependency(spec):
+    """
+    "Talisman (>=2.0) | Cryptid", "Steamodded>=1.0.0~ALPHA" ->
+    [(id, [(op, version)]), ...], one tuple per alternative.
+    """
+    options = []
+    for part in spec.split("|"):
+        match = _DEP_ID_RE.match(part)
+        if match:
+            options.append((match.group(1), _CONSTRAINT_RE.findall(part[match.end():])))
+    return options
+
+def version_key(version):
+    # "v1.0.0~ALPHA-0812d" -> (1, 0, 0); None if there is nothing to compare
+    if not version:
+        return None
+    numbers = _NUMBERS_RE.findall(str(version).lstrip("vV").split("~", 1)[0].split("-", 1)[0])
+    return tuple(int(n) for n in numbers) or None
+
+def satisfies(version, constraints):
+    have = version_key(version)
+    for op, wanted in constraints:
+        want = version_key(wanted)
+        if have is None or want is None:
+            continue  # can't tell, give it the benefit of the doubt
+        ok = {"<<": have < want, "<": have < want, ">>": have > want, ">": have > want,
+              "<=": have <= want, ">=": have >= want, "==": have == want, "=": have == want}[op]
+        if not ok:
+            return False
+    return True
+
+def problem(kind, severity, message, mods):
+    return {"kind": kind, "severity": severity, "message": message, "mods": sorted(str(m) for m in mods)}
+
+def has_errors(problems):
+    return any(p["severity"] == ERROR for p in problems)
+
+def describe(problems, limit=8):
+    # A few lines for a dialog, errors first
+    ordered = sorted(problems, key=lambda p: p["severity"] != ERROR)
+    lines = [("✖ " if p["severity"] == ERROR else "⚠ ") + p["message"] for p in ordered[:limit]]
+    if len(problems) > limit:
+        lines.append(f"... and {len(problems) - limit} more")
+    return "\n".join(lines)
+
+
+def _find_cycles(graph):
+    # Tarjan's strongly connected components; every SCC with more than one
+    # mod (or a mod needing itself) is a cycle
+    index = {}
+    low = {}
+    stack = []
+    on_stack = set()
+    cycles = []
+    counter = [0]
+
+    def visit(node):
+        index[node] = low[node] = counter[0]
+        counter[0] += 1
+        stack.append(node)
+        on_stack.add(node)
+        for dep in graph.get(node, ()):
+            if dep not in index:
+                visit(dep)
+                low[node] = min(low[node], low[dep])
+            elif dep in on_stack:
+                low[node] = min(low[node], index[dep])
+        if low[node] == index[node]:
+            component = []
+            while True:
+                member = stack.pop()
+                on_stack.discard(member)
+                component.append(member)
+                if member == node:
+                    break
+            if len(component) > 1 or node in graph.get(node, ()):
+                cycles.append(sorted(component))
+
+    for node in sorted(graph):
+        if node not in index:
+            visit(node)
+    return cycles
+
+def check_mods(mods):
+    """
+    Problems that only depend on the mod list: duplicate ids and prefixes,
+    missing, mismatched or circular dependencies, declared conflicts and
+    overlapping Lovely patches.
+    """
+    problems = []
+    folders_by_id = {}
+    by_id = {}
+    for mod in mods:
+        folders_by_id.setdefault(mod["id"].lower(), set()).add(mod["folder"])
+        by_id.setdefault(mod["id"].lower(), []).append(mod)
+        for provided in mod.get("provides") or []:
+            for pid, _ in parse_dependency(provided):
+                by_id.setdefault(pid.lower(), []).append(mod)
+
+    for mod_id, folders in sorted(folders_by_id.items()):
+        if len(folders) > 1:
+            names = sorted(str(f) for f in folders)
+            problems.append(problem("duplicate_id", ERROR,
+                                    f"Mod id '{by_id[mod_id][0]['id']}' is in {len(folders)} folders: "
+                                    + ", ".join(names), names))
+
+    by_prefix = {}
+    for mod in mods:
+        if mod.get("prefix"):
+            by_prefix.setdefault(mod["prefix"].lower(), set()).add(mod["id"])
+    for prefix, ids in sorted(by_prefix.items()):
+        if len(ids) > 1:
+            problems.append(problem("duplicate_prefix", ERROR,
+                                    f"Mods {', '.join(sorted(ids))} share the prefix '{prefix}'", ids))
+
+    graph = {}
+    for mod in mods:
+        edges = graph.setdefault(mod["id"].lower(), set())
+        for spec in mod.get("dependencies") or []:
+            options = parse_dependency(spec)
+            found = None
+            for dep_id, constraints in options:
+                if dep_id.lower() in IMPLICIT_IDS:
+                    found = True
+                    break
+                for candidate in by_id.get(dep_id.lower(), ()):
+                    if satisfies(candidate.get("version"), constraints):
+                        found = candidate
+                        break
+                if found:
+                    break
+            if found is None:
+                present = [c for dep_id, _ in options for c in by_id.get(dep_id.lower(), ())]
+                if present:
+                    problems.append(problem("version_mismatch", ERROR,
+                                            f"{mod['name']} needs {spec.strip()}, found "
+                                            f"{present[0]['id']} {present[0].get('version') or '(no version)'}",
+                                            [mod["id"], present[0]["id"]]))
+                else:
+                    problems.append(problem("missing_dependency", ERROR,
+                                            f"{mod['name']} needs {spec.strip()}, which isn't in this slot",
+                                            [mod["id"]]))
+            elif found is not True:
+                edges.add(found["id"].lower())
+
+        for spec in mod.get("conflicts") or []:
+            for dep_id, constraints in parse_dependency(spec):
+                for other in by_id.get(dep_id.lower(), ()):
+                    if other["folder"] != mod["folder"] and satisfies(other.get("version"), constraints):
+                        problems.append(problem("declared_conflict", ERROR,
+                                                f"{mod['name']} doesn't work with {other['name']}",
+                                                [mod["id"], other["id"]]))
+
+    names = {m["id"].lower(): m["id"] for m in mods}
+    for cycle in _find_cycles(graph):
+        ids = [names.get(c, c) for c in cycle]
+        problems.append(problem("dependency_cycle", ERROR,
+                                "Circular dependency: " + " -> ".join(ids + ids[:1]), ids))
+
+    hooks = {}
+    for mod in mods:
+        for kind, target, text in mod.get("lovely_hooks") or []:
+            if kind in ("pattern", "regex", "module"):
+                hooks.setdefault((kind, target, text), set()).add(mod["folder"])
+    for (kind, target, text), folders in sorted(hooks.items()):
+        if len(folders) < 2:
+            continue
+        if kind == "module":
+            problems.append(problem("duplicate_module", ERROR,
+                                    f"Lovely module '{text}' is defined by {', '.join(sorted(folders))}", folders))
+        else:
+            snippet = text.splitlines()[0] if text else ""
+            problems.append(problem("patch_overlap", WARNING,
+                                    f"{', '.join(sorted(folders))} patch the same code in {target}: {snippet}",
+                                    folders))
+    return problems
+
+
+class SlotAnalysis:
+    """
+    Inverted index path -> owning mod folder for one slot. update() diffs
+    the new file listing against the last one and only re-files the paths
+    that changed; mod level checks rerun only when the mod list changed.
+    """
+
+    def __init__(self):
+        self.files = {}  # rel -> content id
+        self.by_lower = {}  # lower-cased rel -> rel
+        self.case_clash = {}  # lower-cased rel -> {rels}, only when there are several
+        self.assets = {}  # lower-cased path inside a mod folder -> {rel: (folder, content id)}
+        self.shared_assets = set()  # asset paths more than one rel has
+        self.mods = None
+        self.mod_problems = []
+
+    def _file(self, rel, content):
+        low = rel.lower()
+        # Same live path on a case-insensitive filesystem
+        other = self.by_lower.setdefault(low, rel)
+        if other != rel:
+            self.case_clash.setdefault(low, {other}).add(rel)
+        if low.startswith(_MODS_LOWER):
+            cut = low.find("/", len(_MODS_LOWER))
+            if cut > 0 and low.startswith(ASSET_DIRS, cut + 1):
+                inner = low[cut + 1:]
+                owners = self.assets.setdefault(inner, {})
+                owners[rel] = (rel[len(MODS_PREFIX):cut], content)
+                if len(owners) > 1:
+                    self.shared_assets.add(inner)
+
+    def _unfile(self, rel):
+        low = rel.lower()
+        clash = self.case_clash.get(low)
+        if clash is not None:
+            clash.discard(rel)
+            if self.by_lower.get(low) == rel:
+                self.by_lower[low] = next(iter(clash))
+            if len(clash) < 2:
+                del self.case_clash[low]
+        elif self.by_lower.get(low) == rel:
+            del self.by_lower[low]
+        if low.startswith(_MODS_LOWER):
+            cut = low.find("/", len(_MODS_LOWER))
+            owners = self.assets.get(low[cut + 1:]) if cut > 0 else None
+            if owners is not None and owners.pop(rel, None) is not None:
+                if len(owners) < 2:
+                    self.shared_assets.discard(low[cut + 1:])
+                if not owners:
+                    del self.assets[low[cut + 1:]]
+
+    def update(self, entries, mods):
+        """
+        entries: the slot's {rel: manifest entry}, mods: its modindex
+        records. Returns the list of problems.
+        """
+        files = {rel: entry.get("hash") or (entry["size"], entry["mtime_ns"]) for rel, entry in entries.items()}
+        if files != self.files:
+            for rel, content in self.files.items():
+                if files.get(rel) != content:
+                    self._unfile(rel)
+            for rel, content in files.items():
+                if self.files.get(rel) != content:
+                    self._file(rel, content)
+            self.files = files
+        if mods != self.mods:
+            self.mod_problems = check_mods(mods)
+            self.mods = mods
+        return self.mod_problems + self._file_problems()
+
+    def _file_problems(self):
+        steamodded = {m["folder"] for m in self.mods if m["source"] in STEAMODDED_SOURCES}
+        problems = []
+        for low, rels in sorted(self.case_clash.items()):
+            folders = {rel.split("/", 2)[1] for rel in rels if rel.startswith(MODS_PREFIX) and rel.count("/") >= 2}
+            problems.append(problem("case_collision", ERROR,
+                                    f"{' and '.join(sorted(rels))} are the same file on Windows", folders))
+        for inner in sorted(self.shared_assets):
+            owners = self.assets[inner]
+            folders = {f for f, _ in owners.values()}
+            contents = {c for _, c in owners.values()}
+            if len(folders) > 1 and len(contents) > 1 and not folders <= steamodded:
+                problems.append(problem("asset_override", WARNING,
+                                        f"{', '.join(sorted(folders))} all replace {inner}", folders))
+        return problems
@@ -0,0 +1,174 @@
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# Long running slot work (zip import/export, ...) runs on a small worker pool.
+# Workers never touch Tk; they push events into a queue that the scheduler
+# drains from the mainloop with after().
+
+POLL_MS = 100
+_POST = object()  # event marker for Job.post
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class Job:
+    def __init__(self, title, func, on_done=None, on_error=None, cleanup=None, silent=False):
+        """
+        func(job) does the work on a worker thread and returns a result.
+        on_done(result) / on_error(exc) run on the Tk thread afterwards.
+        cleanup() runs on the worker when the job fails or is cancelled,
+        it should remove any partial output.
+        silent jobs (startup scans etc.) stay out of the status bar and the
+        active job count.
+        """
+        self.title = title
+        self.func = func
+        self.on_done = on_done
+        self.on_error = on_error
+        self.cleanup = cleanup
+        self.silent = silent
+        self.scheduler = None
+        self.done_bytes = 0
+        self.total_bytes = 0
+        self.state = "queued"
+        self._cancel = threading.Event()
+        self._progress_lock = threading.Lock()
+
+    def cancel(self):
+        self._cancel.set()
+
+    @property
+    def cancelled(self):
+        return self._cancel.is_set()
+
+    def check_cancelled(self):
+        if self._cancel.is_set():
+            raise JobCancelled(self.title)
+
+    def report(self, done_bytes, total_bytes=None):
+        # Called from the worker; plain attribute writes, the poller reads them
+        self.done_bytes = done_bytes
+        if total_bytes is not None:
+            self.total_bytes = total_bytes
+        self.check_cancelled()
+
+    def post(self, callback, *args):
+        # Runs callback(*args) on the Tk thread, in order with the job's end
+        self.scheduler.events.put((self, _POST, (callback, args)))
+        self.check_cancelled()
+
+    def add_total(self, nbytes):
+        # For jobs that only learn their size while running
+        with self._progress_lock:
+            self.total_bytes += nbytes
+
+    def add_progress(self, nbytes):
+        # Parallel workers of one job may add progress at the same time
+        with self._progress_lock:
+            self.done_bytes += nbytes
+        self.check_cancelled()
+
+    @property
+    def percent(self):
+        if not self.total_bytes:
+            return 0
+        return min(100, int(self.done_bytes * 100 / self.total_bytes))
+
+
+class JobScheduler:
+    def __init__(self, root, status_callback, max_workers=3):
+        self.root = root
+        self.status_callback = status_callback
+        self.pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="balatrotool-job")
+        self.events = queue.Queue()
+        self.active = []
+        self.listeners = []
+        self._polling = False
+
+    def submit(self, job):
+        job.scheduler = self
+        self.active.append(job)
+        self.pool.submit(self._run, job)
+        self._notify()
+        if not self._polling:
+            self._polling = True
+            self.root.after(POLL_MS, self._poll)
+        return job
+
+    def _run(self, job):
+        job.state = "running"
+        try:
+            job.check_cancelled()
+            result = job.func(job)
+        except BaseException as e:
+            if job.cleanup:
+                try:
+                    job.cleanup()
+                except Exception:
+                    pass
+            job.state = "cancelled" if isinstance(e, JobCancelled) else "failed"
+            self.events.put((job, None, e))
+            return
+        job.state = "done"
+        self.events.put((job, result, None))
+
+    def _poll(self):
+        while True:
+            try:
+                job, result, error = self.events.get_nowait()
+            except queue.Empty:
+                break
+            if result is _POST:
+                callback, args = error
+                callback(*args)
+                continue
+            self.active.remove(job)
+            if error is None:
+                if job.on_done:
+                    job.on_done(result)
+            elif isinstance(error, JobCancelled):
+                self.status_callback(f"Cancelled: {job.title}")
+            elif job.on_error:
+                job.on_error(error)
+            else:
+                self.status_callback(f"Failed: {job.title} ({error})")
+            self._notify()
+        if self.active:
+            if self.visible():
+                self.status_callback(self.describe())
+            self.root.after(POLL_MS, self._poll)
+        else:
+            self._polling = False
+
+    def visible(self):
+        return [job for job in self.active if not job.silent]
+
+    def describe(self):
+        active = self.visible()
+        if len(active) == 1:
+            job = active[0]
+            return f"{job.title}... {job.percent}%"
+        done = sum(j.done_bytes for j in active)
+        total = sum(j.total_bytes for j in active)
+        pct = int(done * 100 / total) if total else 0
+        return f"{len(active)} jobs running... {pct}%"
+
+    def add_listener(self, callback):
+        # callback(active_job_count) whenever a job starts or finishes
+        self.listeners.append(callback)
+
+    def _notify(self):
+        count = len(self.visible())
+        for callback in self.listeners:
+            callback(count)
+
+    def cancel_all(self):
+        for job in self.active:
+            job.cancel()
+
+    def shutdown(self):
+        self.cancel_all()
+        self.pool.shutdown(wait=True, cancel_futures=True)
@@ -0,0 +1,470 @@
+import os
+import sys
+import json
+import time
+import statistics
+import threading
+import subprocess
+from contextlib import contextmanager
+
+import utills
+import tracing
+import activation
+import catalog
+import conflicts
+
+# Starting the game. Pre-flight checks (exe there, live folders still match
+# the slot that was deployed, loader in place) are keyed by a stat
+# fingerprint of everything they read, so launching again without touching
+# anything costs a few stat calls. The game process is watched from a
+# thread: when it got to the menu, how it exited and, on a crash, which
+# loader log says why. Per-slot launch numbers go to .launches.json.
+#
+# Deploying a slot holds <slots folder>/.switching, across processes; a
+# launch refuses (or waits) while someone else holds it and holds it itself
+# while the process is being started.
+
+SWITCH_LOCK_NAME = ".switching"
+LAUNCHES_NAME = ".launches.json"
+LAUNCHES_VERSION = 1
+# A lock file with no pid in it yet is someone halfway through taking it
+LOCK_GRACE_SECONDS = 5
+WAIT_POLL_SECONDS = 0.1
+POLL_SECONDS = 0.25
+# Lovely's loader next to the exe (Windows/Proton, macOS)
+LOVELY_FILES = ("version.dll", "liblovely.dylib")
+STEAMODDED_NAMES = ("steamodded", "smods")
+# Balatro writes its settings and profile once the main menu is up. The
+# first write after the start is as close to "reached the menu" as we can
+# see from outside the game.
+READY_FILES = ("settings.jkr", "1/profile.jkr", "2/profile.jkr", "3/profile.jkr")
+# Lovely keeps its logs and dumps in Mods/lovely, the game writes there
+LOVELY_DIRNAME = "lovely"
+LOVELY_LOG_DIR = (LOVELY_DIRNAME, "log")
+CRASH_MARKERS = ("Oops! The game crashed", "stack traceback:")
+LOG_TAIL_BYTES = 64 * 1024
+LOG_TAIL_LINES = 20
+MENU_SAMPLES = 20  # latencies kept per slot
+
+
+class LaunchError(Exception):
+    pass
+
+
+def _stat_key(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return [st.st_size, st.st_mtime_ns]
+
+def _mods_key(mods_dir):
+    # Where the Mods folder points and its mod folders (not the folder's own
+    # mtime, the game creating Mods/lovely would move it). Edits deep inside
+    # a mod folder that don't replace any of its direct entries aren't seen.
+    if not mods_dir or not os.path.lexists(mods_dir):
+        return None
+    key = [os.path.realpath(mods_dir) if activation.is_link(mods_dir) else None]
+    try:
+        names = sorted(os.listdir(mods_dir))
+    except OSError:
+        return key
+    for name in names:
+        if name.lower() != LOVELY_DIRNAME:
+            key.append([name, _stat_key(os.path.join(mods_dir, name))])
+    return key
+
+def pid_alive(pid):
+    if pid == os.getpid():
+        return True
+    if sys.platform.startswith("win"):
+        # os.kill(pid, 0) would terminate the process on Windows
+        import ctypes
+        kernel32 = ctypes.windll.kernel32
+        handle = kernel32.OpenProcess(0x1000, False, pid)  # PROCESS_QUERY_LIMITED_INFORMATION
+        if not handle:
+            return False
+        code = ctypes.c_ulong()
+        kernel32.GetExitCodeProcess(handle, ctypes.byref(code))
+        kernel32.CloseHandle(handle)
+        return code.value == 259  # STILL_ACTIVE
+    try:
+        os.kill(pid, 0)
+    except PermissionError:
+        return True
+    except OSError:
+        return False
+    return True
+
+def _busy_message(holder):
+    if holder.get("what") == "launch":
+        return "The game is being started right now, try again in a moment."
+    if holder.get("what") == "archive":
+        return "Idle slots are being archived right now, try again in a moment."
+    slot = holder.get("slot")
+    what = f"Slot '{slot}'" if slot else "A slot"
+    return f"{what} is being loaded right now, try again when it's done."
+
+def _first_write(paths, since_ns):
+    # Seconds from since_ns to the earliest of paths written after it, or None
+    found = None
+    for path in paths:
+        try:
+            mtime_ns = os.stat(path).st_mtime_ns
+        except OSError:
+            continue
+        if mtime_ns > since_ns and (found is None or mtime_ns < found):
+            found = mtime_ns
+    return None if found is None else (found - since_ns) / 1e9
+
+def read_crash_log(logs_dir, since):
+    """
+    Looks at the newest loader log written since `since` (time.time()).
+    Returns (path, crashed, last lines); the lines start at the crash
+    message when there is one. (None, False, []) without a log.
+    """
+    newest = None
+    try:
+        names = os.listdir(logs_dir)
+    except OSError:
+        names = []
+    for name in names:
+        path = os.path.join(logs_dir, name)
+        try:
+            st = os.stat(path)
+        except OSError:
+            continue
+        if st.st_mtime >= since - 1 and (newest is None or st.st_mtime > newest[1].st_mtime):
+            newest = (path, st)
+    if newest is None:
+        return None, False, []
+    path, st = newest
+    try:
+        with open(path, "rb") as f:
+            f.seek(max(0, st.st_size - LOG_TAIL_BYTES))
+            text = f.read().decode("utf-8", "replace")
+    except OSError:
+        return path, False, []
+    for marker in CRASH_MARKERS:
+        at = text.rfind(marker)
+        if at >= 0:
+            return path, True, text[at:].splitlines()[:LOG_TAIL_LINES]
+    return path, False, text.splitlines()[-LOG_TAIL_LINES:]
+
+
+class GameRun:
+    """
+    One started game. The monitor thread fills in menu_seconds (launch to
+    main menu), exit_code, ended and, on a crash, crash_log/crash_tail;
+    finished is set once the process is gone and the run is recorded.
+    """
+
+    def __init__(self, slot_name, exe_path, process):
+        self.slot_name = slot_name
+        self.exe_path = exe_path
+        self.process = process
+        self.pid = process.pid
+        self.started = time.time()
+        self.menu_seconds = None
+        self.exit_code = None
+        self.ended = None
+        self.crashed = False
+        self.crash_log = None
+        self.crash_tail = []
+        self.finished = threading.Event()
+
+    @property
+    def running(self):
+        return not self.finished.is_set()
+
+    def wait(self, timeout=None):
+        return self.finished.wait(timeout)
+
+    def to_record(self):
+        return {"slot": self.slot_name, "pid": self.pid, "started": self.started,
+                "menu_seconds": self.menu_seconds, "exit_code": self.exit_code, "ended": self.ended,
+                "runtime": None if self.ended is None else round(self.ended - self.started, 3),
+                "crashed": self.crashed, "crash_log": self.crash_log, "crash_tail": self.crash_tail}
+
+
+class Launcher:
+    """
+    <slots folder>/.launches.json:
+      "preflight": [key, problems] of the last pre-flight run
+      "slots": slot dir name -> {"launches", "runs", "crashes",
+               "menu_seconds" (last MENU_SAMPLES), "last" (GameRun record)}
+    """
+
+    def __init__(self, store):
+        self.store = store
+        self.folder = store.slots_folder
+        self.lock_path = os.path.join(self.folder, SWITCH_LOCK_NAME)
+        self.path = os.path.join(self.folder, LAUNCHES_NAME)
+        self.lock = threading.Lock()
+        self._preflight = None  # [key, problems]
+        self.runs = []  # games started from this process
+
+    # --- switch lock -------------------------------------------------------
+
+    def switch_in_progress(self):
+        # The lock holder's {"pid", "what", "slot", "started"}, or None.
+        # A lock left behind by a process that died is removed here.
+        try:
+            with open(self.lock_path, "r") as f:
+                holder = json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError):
+            try:
+                age = time.time() - os.path.getmtime(self.lock_path)
+            except OSError:
+                return None
+            if age < LOCK_GRACE_SECONDS:
+                return {"what": "switch"}
+            holder = {}
+        if isinstance(holder, dict) and isinstance(holder.get("pid"), int) and pid_alive(holder["pid"]):
+            return holder
+        try:
+            os.remove(self.lock_path)
+        except OSError:
+            pass
+        return None
+
+    @contextmanager
+    def switching(self, slot_name, what="switch"):
+        """
+        Holds the switch lock for a deployment (or, with what="launch",
+        while the game is started). Raises LaunchError if it's taken.
+        """
+        for _ in range(2):
+            try:
+                fd = os.open(self.lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+                break
+            except FileExistsError:
+                holder = self.switch_in_progress()
+                if holder is not None:
+                    raise LaunchError(_busy_message(holder))
+        else:
+            raise LaunchError(_busy_message({"what": what, "slot": slot_name}))
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump({"pid": os.getpid(), "what": what, "slot": slot_name, "started": time.time()}, f)
+            yield
+        finally:
+            try:
+                os.remove(self.lock_path)
+            except OSError:
+                pass
+
+    def wait_for_switch(self, timeout=0):
+        # Returns once no switch is running; LaunchError if one still is after timeout
+        deadline = time.monotonic() + timeout
+        while True:
+            holder = self.switch_in_progress()
+            if holder is None:
+                return
+            if time.monotonic() >= deadline:
+                raise LaunchError(_busy_message(holder))
+            time.sleep(WAIT_POLL_SECONDS)
+
+    # --- pre-flight --------------------------------------------------------
+
+    def _read(self):
+        try:
+            with open(self.path, "r") as f:
+                data = json.load(f)
+            if data.get("version") == LAUNCHES_VERSION:
+                return data
+        except (OSError, ValueError):
+            pass
+        return {"version": LAUNCHES_VERSION, "preflight": None, "slots": {}}
+
+    def _update(self, change):
+        # Read-modify-write; other processes may have recorded runs meanwhile
+        with self.lock:
+            data = self._read()
+            change(data)
+            utills.write_json_atomic(self.path, data, indent=None)
+
+    def preflight_key(self, exe_path, mods_dir, slot_path):
+        game_dir = os.path.dirname(exe_path) if exe_path else None
+        return [
+            exe_path, mods_dir,
+            _stat_key(exe_path) if exe_path else None,
+            [_stat_key(os.path.join(game_dir, name)) for name in LOVELY_FILES] if game_dir else None,
+            _stat_key(os.path.join(self.folder, activation.LIVE_STATE_NAME)),
+            catalog.slot_fingerprint(slot_path) if slot_path and os.path.isdir(slot_path) else None,
+            _mods_key(mods_dir),
+        ]
+
+    def preflight(self, exe_path, mods_dir, slot=None):
+        """
+        Returns (problems, cached). problems are conflicts.problem() dicts,
+        so conflicts.has_errors/describe work on them. slot is the deployed
+        ModSlot (None when no slot is loaded); the checks rerun only when
+        the exe, loader, live state, slot manifest or Mods folder changed.
+        """
+        key = self.preflight_key(exe_path, mods_dir, slot.path if slot else None)
+        key.append(slot.dir_name if slot else None)
+        if self._preflight is None:
+            self._preflight = self._read().get("preflight") or [None, None]
+        if self._preflight[0] == key:
+            return self._preflight[1], True
+        # The key was taken before the checks, a change made while they ran
+        # shows up as a miss next time
+        problems = self._check(exe_path, mods_dir, slot)
+        self._preflight = [key, problems]
+        self._update(lambda data: data.update(preflight=[key, problems]))
+        return problems, False
+
+    def _check(self, exe_path, mods_dir, slot):
+        problems = []
+        if not exe_path or not os.path.isfile(exe_path):
+            problems.append(conflicts.problem("exe_missing", conflicts.ERROR,
+                                              f"Balatro.exe not found at {exe_path or '(not set)'}", []))
+            return problems
+        game_dir = os.path.dirname(exe_path)
+        live = activation.read_live_state(self.folder)
+        if live.get("slot") and slot is None:
+            problems.append(conflicts.problem("slot_missing", conflicts.WARNING,
+                                              f"The deployed slot '{live['slot']}' doesn't exist anymore",
+                                              []))
+        if slot is not None:
+            problems.extend(self._check_deployment(slot, mods_dir, game_dir, live.get("mode")))
+
+        has_mods = bool(slot.mods) if slot is not None else bool(activation.scan_live_mods(mods_dir))
+        if has_mods and not any(os.path.isfile(os.path.join(game_dir, name)) for name in LOVELY_FILES):
+            problems.append(conflicts.problem("loader_missing", conflicts.ERROR,
+                                              "Lovely isn't installed next to Balatro.exe, mods won't load",
+                                              ["lovely"]))
+        if slot is not None:
+            # Mods that declare the dependency are reported by conflicts already
+            needs = [m for m in slot.mods if m["source"] in conflicts.STEAMODDED_SOURCES
+                     and not any(dep_id.lower() in STEAMODDED_NAMES for spec in m.get("dependencies") or []
+                                 for dep_id, _ in conflicts.parse_dependency(spec))]
+            has = any(m["id"].lower() in STEAMODDED_NAMES or m["folder"].lower().startswith(STEAMODDED_NAMES)
+                      for m in slot.mods)
+            if needs and not has:
+                names = ", ".join(m["name"] for m in needs[:3]) + (f" and {len(needs) - 3} more" if len(needs) > 3 else "")
+                problems.append(conflicts.problem("loader_missing", conflicts.ERROR,
+                                                  f"Steamodded isn't in this slot, needed by {names}",
+                                                  [m["id"] for m in needs]))
+        return problems
+
+    def _check_deployment(self, slot, mods_dir, game_dir, mode):
+        # Does what's live still match the slot's manifest?
+        if mode == activation.MODE_LINK:
+            target = activation.materialized_path(mods_dir, slot.dir_name)
+            if not activation.is_link(mods_dir) or \
+                    os.path.realpath(mods_dir) != os.path.realpath(target):
+                return [conflicts.problem("live_drift", conflicts.ERROR,
+                                          f"The Mods folder isn't linked to slot '{slot.name}' anymore, "
+                                          "load it again", [])]
+            plans = [activation.plan_materialize(self.store, slot.path, slot.dir_name, mods_dir),
+                     activation.plan_activation(self.store, slot.path, slot.dir_name, None, game_dir)]
+        else:
+            plans = [activation.plan_activation(self.store, slot.path, slot.dir_name, mods_dir, game_dir)]
+        added = replaced = extra = 0
+        for plan in plans:
+            if plan is None:
+                continue
+            added += sum(1 for op in plan.copies if op[0] == "add")
+            replaced += sum(1 for op in plan.copies if op[0] == "replace")
+            extra += sum(1 for rel, _ in plan.deletes
+                         if not rel.lower().startswith(activation.MODS_PREFIX.lower() + LOVELY_DIRNAME + "/"))
+        if not (added or replaced or extra):
+            return []
+        return [conflicts.problem("live_drift", conflicts.ERROR if added else conflicts.WARNING,
+                                  f"Live files don't match slot '{slot.name}': {added} missing, "
+                                  f"{replaced} changed, {extra} extra, load it again to reset them", [])]
+
+    # --- launching ---------------------------------------------------------
+
+    def launch(self, exe_path, slot_name, mods_dir=None, wait=0):
+        """
+        Starts the game unless a slot is being switched (waits up to `wait`
+        seconds for that first) and watches it from a thread. mods_dir
+        locates the appdata folder for the menu/crash log checks.
+        Returns the GameRun.
+        """
+        self.wait_for_switch(wait)
+        exe_path = os.path.abspath(exe_path)
+        game_dir = os.path.dirname(exe_path)
+        with self.switching(slot_name, what="launch"):
+            try:
+                process = subprocess.Popen([exe_path], cwd=game_dir)
+            except OSError as e:
+                raise LaunchError(f"Could not start {os.path.basename(exe_path)}: {e}")
+        run = GameRun(slot_name, exe_path, process)
+        self.runs.append(run)
+        key = slot_name or utills.NO_SLOT
+
+        def started(data):
+            stats = data["slots"].setdefault(key, {"launches": 0, "runs": 0, "crashes": 0, "menu_seconds": []})
+            stats["launches"] += 1
+            stats["last"] = run.to_record()
+        try:
+            self._update(started)
+        except OSError:
+            pass  # the game runs either way, it just goes uncounted
+        appdata = os.path.dirname(mods_dir) if mods_dir else None
+        threading.Thread(target=self._watch, args=(run, appdata), name="game-monitor", daemon=True).start()
+        return run
+
+    def _watch(self, run, appdata):
+        ready = [os.path.join(appdata, *rel.split("/")) for rel in READY_FILES] if appdata else []
+        since_ns = int(run.started * 1e9)
+        try:
+            while run.menu_seconds is None and ready:
+                try:
+                    run.process.wait(POLL_SECONDS)
+                    break
+                except subprocess.TimeoutExpired:
+                    run.menu_seconds = _first_write(ready, since_ns)
+            if run.menu_seconds is not None:
+                tracing.event("game.menu", slot=run.slot_name, pid=run.pid, seconds=round(run.menu_seconds, 3))
+            run.exit_code = run.process.wait()
+            run.ended = time.time()
+            if appdata:
+                logs_dir = os.path.join(appdata, utills.MODS_DIRNAME, *LOVELY_LOG_DIR)
+                run.crash_log, marked, tail = read_crash_log(logs_dir, run.started)
+                run.crashed = marked or run.exit_code != 0
+                run.crash_tail = tail if run.crashed else []
+            else:
+                run.crashed = run.exit_code != 0
+            try:
+                self._record_exit(run)
+            except OSError:
+                pass
+        finally:
+            run.finished.set()
+
+    def _record_exit(self, run):
+        record = run.to_record()
+        key = run.slot_name or utills.NO_SLOT
+
+        def ended(data):
+            stats = data["slots"].setdefault(key, {"launches": 1, "runs": 0, "crashes": 0, "menu_seconds": []})
+            stats["runs"] += 1
+            stats["crashes"] += int(run.crashed)
+            if run.menu_seconds is not None:
+                stats["menu_seconds"] = (stats["menu_seconds"] + [round(run.menu_seconds, 3)])[-MENU_SAMPLES:]
+            stats["last"] = record
+        self._update(ended)
+        tracing.event("game.exit", slot=run.slot_name, pid=run.pid, exit_code=run.exit_code,
+                      crashed=run.crashed, runtime=record["runtime"], menu_seconds=run.menu_seconds)
+
+    def stats(self):
+        """
+        slot dir name -> {"launches", "runs", "crashes", "crash_rate",
+        "menu_seconds" (median of the recent ones, None without samples),
+        "last"}. crash_rate counts finished runs only.
+        """
+        result = {}
+        for key, stats in self._read()["slots"].items():
+            samples = stats.get("menu_seconds") or []
+            result[key] = {"launches": stats["launches"], "runs": stats["runs"], "crashes": stats["crashes"],
+                           "crash_rate": stats["crashes"] / stats["runs"] if stats["runs"] else None,
+                           "menu_seconds": statistics.median(samples) if samples else None,
+                           "last": stats.get("last")}
+        return result
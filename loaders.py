@@ -0,0 +1,352 @@
+import os
+import re
+import json
+import time
+import shutil
+import zipfile
+import hashlib
+import threading
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+import utills
+import ziptools
+import activation
+
+# Lovely / Steamodded updater. Release info and artifacts are cached per
+# version; release checks are conditional (ETag / Last-Modified) so an
+# unchanged release costs one request, and artifacts download in parallel
+# into .part files that are resumed with a Range request next time.
+
+CACHE_INDEX_NAME = "index.json"
+USER_AGENT = "BalatroTool"
+TIMEOUT = 30
+DOWNLOAD_CHUNK = 256 * 1024
+
+# release_url answers like the GitHub "latest release" API. Override per
+# loader with the loader_sources config key, e.g. a local test server.
+LOADERS = {
+    "lovely": {
+        "title": "Lovely",
+        "release_url": "https://api.github.com/repos/ethangreen-dev/lovely-injector/releases/latest",
+        # Balatro runs the Windows build everywhere (Proton on Linux/Deck)
+        "asset": r"windows.*\.zip$",
+        # zip member -> slot path
+        "files": {"version.dll": "version.dll"},
+    },
+    "steamodded": {
+        "title": "Steamodded",
+        "release_url": "https://api.github.com/repos/Steamodded/smods/releases/latest",
+        "asset": None,  # the source zip of the release
+        # Where a fresh install goes; an existing one is found by its mod id
+        # (or a folder named like it) and replaced where it is
+        "folder": f"{utills.MODS_DIRNAME}/smods",
+        "mod_id": "Steamodded",
+        "folder_names": ("smods", "steamodded"),
+    },
+}
+
+
+class LoaderError(OSError):
+    pass
+
+
+def _request(url, headers=None):
+    req = urllib.request.Request(url, headers=dict({"User-Agent": USER_AGENT}, **(headers or {})))
+    return urllib.request.urlopen(req, timeout=TIMEOUT)
+
+
+class LoaderCache:
+    """
+    <root>/index.json remembers per loader the last release document with
+    its ETag/Last-Modified, and per artifact URL the cached file + sha256.
+    Files live in <root>/<loader>/<version>/.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        self.index_path = os.path.join(root, CACHE_INDEX_NAME)
+        self.lock = threading.Lock()
+        self.index = {"releases": {}, "artifacts": {}, "installed": {}}
+        try:
+            with open(self.index_path, "r") as f:
+                self.index.update(json.load(f))
+        except (OSError, ValueError):
+            pass
+
+    def save(self):
+        with self.lock:
+            os.makedirs(self.root, exist_ok=True)
+            utills.write_json_atomic(self.index_path, self.index)
+
+    def version_dir(self, name, version):
+        return os.path.join(self.root, name, re.sub(r"[^\w.-]", "_", version).strip(".") or "unknown")
+
+    def cached_artifact(self, url):
+        # Path of a finished download whose size still matches, else None
+        entry = self.index["artifacts"].get(url)
+        if entry and os.path.isfile(entry["path"]) and os.path.getsize(entry["path"]) == entry["size"]:
+            return entry
+        return None
+
+    def remember_artifact(self, url, path, sha256):
+        with self.lock:
+            self.index["artifacts"][url] = {"path": path, "size": os.path.getsize(path), "sha256": sha256}
+
+    def unpacked_files(self, url):
+        # {slot path: file} extracted from a cached artifact earlier, if still there
+        entry = self.index["artifacts"].get(url) or {}
+        files = entry.get("files")
+        if files and all(os.path.isfile(path) for path in files.values()):
+            return files
+        return None
+
+    def remember_unpacked(self, url, files):
+        with self.lock:
+            self.index["artifacts"][url]["files"] = files
+
+
+def fetch_release(name, url, cache):
+    """
+    Returns (release dict, changed). Sends the stored ETag/Last-Modified;
+    a 304 answer reuses the cached release document.
+    """
+    cached = cache.index["releases"].get(name)
+    headers = {"Accept": "application/vnd.github+json"}
+    if cached and cached.get("url") == url:
+        if cached.get("etag"):
+            headers["If-None-Match"] = cached["etag"]
+        if cached.get("last_modified"):
+            headers["If-Modified-Since"] = cached["last_modified"]
+    try:
+        with _request(url, headers) as resp:
+            release = json.load(resp)
+            etag = resp.headers.get("ETag")
+            last_modified = resp.headers.get("Last-Modified")
+    except urllib.error.HTTPError as e:
+        if e.code == 304 and cached:
+            return cached["release"], False
+        raise LoaderError(f"{name}: release check failed (HTTP {e.code})")
+    except (urllib.error.URLError, OSError, ValueError) as e:
+        raise LoaderError(f"{name}: release check failed ({e})")
+    with cache.lock:
+        cache.index["releases"][name] = {"url": url, "etag": etag, "last_modified": last_modified,
+                                         "release": release, "checked": int(time.time())}
+    changed = not cached or cached["release"].get("tag_name") != release.get("tag_name")
+    return release, changed
+
+def pick_artifact(name, spec, release):
+    """
+    Returns {"url", "name", "size", "sha256"} for the file to download.
+    size/sha256 are None when the release doesn't say.
+    """
+    if spec["asset"] is None:
+        url = release.get("zipball_url")
+        if not url:
+            raise LoaderError(f"{name}: release has no source zip")
+        return {"url": url, "name": f"{name}-{release.get('tag_name', 'latest')}.zip", "size": None, "sha256": None}
+    pattern = re.compile(spec["asset"], re.IGNORECASE)
+    for asset in release.get("assets", []):
+        if pattern.search(asset["name"]):
+            digest = asset.get("digest") or ""
+            return {
+                "url": asset["browser_download_url"],
+                "name": asset["name"],
+                "size": asset.get("size"),
+                "sha256": digest[7:] if digest.startswith("sha256:") else None,
+            }
+    raise LoaderError(f"{name}: no release file matching {spec['asset']}")
+
+
+def download(url, dest, size=None, sha256=None, job=None):
+    """
+    Downloads url to dest through dest + ".part". An existing .part is
+    resumed with a Range request when the server supports it. The result
+    is checked against size/sha256 when known. Returns the sha256.
+    """
+    part = dest + ".part"
+    os.makedirs(os.path.dirname(dest), exist_ok=True)
+    hasher = hashlib.sha256()
+    have = 0
+    if os.path.exists(part):
+        with open(part, "rb") as f:
+            while True:
+                chunk = f.read(DOWNLOAD_CHUNK)
+                if not chunk:
+                    break
+                hasher.update(chunk)
+                have += len(chunk)
+    headers = {"Range": f"bytes={have}-"} if have else {}
+    try:
+        with _request(url, headers) as resp:
+            resumed = have and resp.status == 206 and \
+                (resp.headers.get("Content-Range") or "").startswith(f"bytes {have}-")
+            if not resumed:
+                # Full body, start over
+                hasher = hashlib.sha256()
+                have = 0
+            if job:
+                job.add_progress(have)
+            with open(part, "ab" if resumed else "wb") as f:
+                while True:
+                    chunk = resp.read(DOWNLOAD_CHUNK)
+                    if not chunk:
+                        break
+                    f.write(chunk)
+                    hasher.update(chunk)
+                    have += len(chunk)
+                    if job:
+                        job.add_progress(len(chunk))
+    except urllib.error.HTTPError as e:
+        if e.code == 416 and have:
+            # Range past the end, the .part is probably complete already
+            pass
+        else:
+            raise LoaderError(f"Download failed: {url} (HTTP {e.code})")
+    except (urllib.error.URLError, OSError) as e:
+        # The .part stays for the next attempt
+        raise LoaderError(f"Download interrupted: {url} ({e})")
+    digest = hasher.hexdigest()
+    if (size is not None and have != size) or (sha256 and digest != sha256):
+        os.remove(part)
+        raise LoaderError(f"Downloaded file doesn't match the release: {os.path.basename(dest)}")
+    os.replace(part, dest)
+    return digest
+
+
+def unpack_artifact(name, spec, archive, dest_dir):
+    """
+    Extracts what the loader needs from a downloaded zip into dest_dir.
+    Returns {slot path: extracted file}.
+    """
+    files = {}
+    with zipfile.ZipFile(archive) as zf:
+        members = ziptools.validate_members(zf)
+        if "files" in spec:
+            wanted = {src.lower(): rel for src, rel in spec["files"].items()}
+            picked = [(wanted[os.path.basename(rel).lower()], info) for rel, info in members
+                      if os.path.basename(rel).lower() in wanted]
+            if len(picked) != len(wanted):
+                raise LoaderError(f"{name}: release zip is missing {', '.join(spec['files'])}")
+        else:
+            # Source zips have one top level folder (Owner-repo-sha/), drop it
+            tops = {rel.split("/", 1)[0] for rel, _ in members}
+            strip = len(tops) == 1 and all("/" in rel for rel, _ in members)
+            picked = []
+            for rel, info in members:
+                inner = rel.split("/", 1)[1] if strip else rel
+                picked.append((f"{spec['folder']}/{inner}", info))
+        if os.path.isdir(dest_dir):
+            shutil.rmtree(dest_dir)
+        for slot_rel, info in picked:
+            out = os.path.join(dest_dir, *slot_rel.split("/"))
+            os.makedirs(os.path.dirname(out), exist_ok=True)
+            with zf.open(info) as src, open(out, "wb") as dst:
+                shutil.copyfileobj(src, dst, DOWNLOAD_CHUNK)
+            files[slot_rel] = out
+    return files
+
+
+class LoaderUpdate:
+    def __init__(self, name, version, changed, files, downloaded):
+        self.name = name
+        self.version = version
+        self.changed = changed  # release differs from the last check
+        self.files = files  # slot path -> file to install
+        self.downloaded = downloaded  # False when served from the cache
+        self.replace_prefix = LOADERS[name].get("folder")
+
+
+def update_loaders(names, cache_root, sources=None, job=None, workers=4):
+    """
+    Checks, downloads (in parallel) and unpacks the given loaders.
+    sources overrides release_url per loader. Returns [LoaderUpdate];
+    installing them is up to the caller (retarget, then
+    SlotLibrary.install_files or install_live).
+    """
+    cache = LoaderCache(cache_root)
+    sources = sources or {}
+
+    def one(name):
+        spec = LOADERS[name]
+        release, changed = fetch_release(name, sources.get(name) or spec["release_url"], cache)
+        version = release.get("tag_name") or "latest"
+        artifact = pick_artifact(name, spec, release)
+        vdir = cache.version_dir(name, version)
+        cached = cache.cached_artifact(artifact["url"])
+        downloaded = cached is None or bool(artifact["sha256"] and cached["sha256"] != artifact["sha256"])
+        if downloaded:
+            if job and artifact["size"]:
+                job.add_total(artifact["size"])
+            path = os.path.join(vdir, utills.safe_filename(os.path.splitext(artifact["name"])[0]) + ".zip")
+            digest = download(artifact["url"], path, artifact["size"], artifact["sha256"], job)
+            cache.remember_artifact(artifact["url"], path, digest)
+        else:
+            path = cached["path"]
+        files = None if downloaded else cache.unpacked_files(artifact["url"])
+        if files is None:
+            files = unpack_artifact(name, spec, path, os.path.join(vdir, "unpacked"))
+            cache.remember_unpacked(artifact["url"], files)
+        return LoaderUpdate(name, version, changed, files, downloaded)
+
+    pool = ThreadPoolExecutor(max_workers=max(1, min(workers, len(names))), thread_name_prefix="loader-dl")
+    try:
+        futures = [pool.submit(one, name) for name in names]
+        results = [f.result() for f in futures]
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+        cache.save()
+    return results
+
+def installed_folder(name, mods):
+    """
+    Slot path of the folder a loader sits in now, going by mod index
+    records (its mod id first, then a folder named like it). None when
+    it isn't installed or isn't a Mods folder loader.
+    """
+    spec = LOADERS[name]
+    if "mod_id" not in spec:
+        return None
+    found = [m["folder"] for m in mods if m["folder"] and m["id"].lower() == spec["mod_id"].lower()]
+    found += [m["folder"] for m in mods if m["folder"] and m["folder"].lower().startswith(spec["folder_names"])]
+    return f"{utills.MODS_DIRNAME}/{found[0]}" if found else None
+
+def retarget(updates, mods):
+    # Points updates at the folders their loaders are installed in already,
+    # so an update replaces e.g. Mods/Steamodded instead of adding Mods/smods
+    for update in updates:
+        folder = installed_folder(update.name, mods)
+        default = update.replace_prefix
+        if not folder or not default or folder == default:
+            continue
+        update.files = {folder + rel[len(default):] if rel.startswith(default + "/") else rel: src
+                        for rel, src in update.files.items()}
+        update.replace_prefix = folder
+
+def mark_installed(cache_root, updates):
+    cache = LoaderCache(cache_root)
+    for update in updates:
+        cache.index["installed"][update.name] = update.version
+    cache.save()
+
+def install_live(updates, mods_dir, game_dir):
+    """
+    Copies loader files straight into the game folders, for when no slot
+    is deployed. Returns the slot paths that had nowhere to go (the dll
+    without a known game folder).
+    """
+    skipped = []
+    for update in updates:
+        if update.replace_prefix and mods_dir:
+            old = activation.live_path(update.replace_prefix, mods_dir, game_dir)
+            if old and os.path.isdir(old):
+                shutil.rmtree(old)
+        for rel, src in update.files.items():
+            dest = activation.live_path(rel, mods_dir, game_dir)
+            if dest is None:
+                skipped.append(rel)
+                continue
+            os.makedirs(os.path.dirname(dest), exist_ok=True)
+            utills.fast_copy(src, dest)
+    return skipped
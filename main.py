@@ -1,76 +1,29 @@
+import time
+_START = time.perf_counter()
+
 import tkinter as tk
 from tkinter import ttk, messagebox, filedialog, simpledialog
 import os
-import json
-import webbrowser
-import shutil
-from datetime import datetime
-import subprocess
-import zipfile
-
-CONFIG_PATH = "balatrotool_config.json"
-
-dark_colors = {
-    "bg": "#2e2e2e",
-    "fg": "#dcdcdc",
-    "entry_bg": "#3e3e3e",
-    "button_bg": "#444444",
-    "highlight": "#57a0ff"
-}
-light_colors = {
-    "bg": "#f0f0f0",
-    "fg": "#000000",
-    "entry_bg": "#ffffff",
-    "button_bg": "#e0e0e0",
-    "highlight": "#1a73e8"
-}
+
+# webbrowser is imported where it is used, it isn't needed to get the
+# window up (ziptools and subprocess come in with slots anyway).
+import utills
+import activation
+import conflicts
+import config
+import jobs
+import slotlist
+import theming
+import tracing
+from slots import SlotLibrary, safe_slot_name
 
 ABOUT_YT_URL = "https://www.youtube.com/@moonplaysvr"
 
-class ModSlot:
-    def __init__(self, name, path):
-        self.name = name
-        self.path = path
-        self.locked = False
-        self.tags = []
-        self.description = ""
-        self.creation_date = None
-        self.mod_count = 0
-        self.loaded = False
-
-    def save_metadata(self):
-        meta_path = os.path.join(self.path, "metadata.json")
-        meta = {
-            "name": self.name,
-            "locked": self.locked,
-            "tags": self.tags,
-            "description": self.description,
-            "creation_date": self.creation_date,
-            "mod_count": self.mod_count
-        }
-        with open(meta_path, "w") as f:
-            json.dump(meta, f, indent=2)
-
-    def load_metadata(self):
-        meta_path = os.path.join(self.path, "metadata.json")
-        if os.path.exists(meta_path):
-            with open(meta_path, "r") as f:
-                meta = json.load(f)
-                self.name = meta.get("name", self.name)
-                self.locked = meta.get("locked", False)
-                self.tags = meta.get("tags", [])
-                self.description = meta.get("description", "")
-                self.creation_date = meta.get("creation_date", None)
-                self.mod_count = meta.get("mod_count", 0)
-
-    def count_mod_files(self):
-        count = 0
-        for root, _, files in os.walk(self.path):
-            for f in files:
-                if not f.lower().endswith('.exe'):
-                    count += 1
-        self.mod_count = count
-        self.save_metadata()
+# Window up and painted within this long after the interpreter started
+# (source run, warm disk); the slot list fills in afterwards.
+FIRST_PAINT_TARGET_MS = 300
+DISCOVERY_BATCH = 50
+GAME_POLL_MS = 1000  # how often the UI looks at a running game's monitor
 
 class BalatroToolApp(tk.Tk):
     def __init__(self):
@@ -82,73 +35,56 @@ class BalatroToolApp(tk.Tk):
         if os.path.exists("icon.ico"):
             self.iconbitmap("icon.ico")
 
-        self.dark_mode = True
-        self.load_config()
+        # Read once; settings code writes through it, listeners react
+        self.settings = config.shared()
+        tracing.configure(self.settings["trace_enabled"], self.settings["trace_profile"])
+        self.settings.add_listener(lambda *_: self.apply_theme(), "dark_mode")
+        self.settings.add_listener(self.on_trace_config_changed, "trace_enabled")
+        self.settings.add_listener(self.on_trace_config_changed, "trace_profile")
+        self.settings.add_listener(self.on_config_save_failed, config.SAVE_ERROR)
 
-        self.style = ttk.Style()
-        self.style.theme_use('default')
+        # ttk styles + registry of the few raw tk widgets we use
+        self.theme = theming.ThemeManager(self, self.settings["dark_mode"])
+        self.style = self.theme.style
+        self.theme.register(self, "bg")
 
         self.create_widgets()
-        self.apply_theme()
 
-    def load_config(self):
-        if os.path.exists(CONFIG_PATH):
-            try:
-                with open(CONFIG_PATH, "r") as f:
-                    cfg = json.load(f)
-                    self.dark_mode = cfg.get("dark_mode", True)
-            except:
-                self.dark_mode = True
-        else:
-            self.dark_mode = True
-
-    def save_config(self):
-        cfg = {"dark_mode": self.dark_mode}
-        with open(CONFIG_PATH, "w") as f:
-            json.dump(cfg, f, indent=2)
-
-    def apply_theme(self):
-        colors = dark_colors if self.dark_mode else light_colors
+        # Zip import/export etc. run here so the window stays responsive
+        self.jobs = jobs.JobScheduler(self, self.status_var.set)
+        self.jobs.add_listener(self.on_jobs_changed)
+        self.protocol("WM_DELETE_WINDOW", self.on_close)
 
-        self.configure(bg=colors["bg"])
+        self.first_paint_ms = None
+        self.after_idle(self.on_first_paint)
 
-        self.style.configure("TFrame", background=colors["bg"])
-        self.style.configure("TLabel", background=colors["bg"], foreground=colors["fg"])
-        self.style.configure("TButton",
-                             background=colors["button_bg"],
-                             foreground=colors["fg"],
-                             borderwidth=0)
-        self.style.map("TButton",
-                       background=[('active', colors["highlight"])],
-                       foreground=[('active', colors["fg"])])
+    def on_first_paint(self):
+        # Runs once the window has been drawn, then the slot scan starts
+        self.first_paint_ms = (time.perf_counter() - _START) * 1000
+        tracing.event("ui.first_paint", since_start_ms=round(self.first_paint_ms, 1),
+                      target_ms=FIRST_PAINT_TARGET_MS)
+        self.load_mod_slots()
+        if self.settings["auto_update_loaders"]:
+            self.run_loader_update(["lovely", "steamodded"], quiet=True)
 
-        self.style.configure("TEntry",
-                             fieldbackground=colors["entry_bg"],
-                             foreground=colors["fg"])
+    def on_trace_config_changed(self, key, old, new):
+        tracing.configure(self.settings["trace_enabled"], self.settings["trace_profile"])
 
-        # Status bar config
-        self.status_bar.configure(background=colors["bg"], foreground=colors["fg"])
+    def on_config_save_failed(self, key, old, error):
+        # Usually called from the config's save timer thread
+        self.after(0, self.status_var.set, f"Could not save settings: {error}")
 
-        # Update all widgets recursively
-        self.update_widgets_colors(self, colors)
+    def apply_theme(self):
+        # Updates the ttk styles once and repaints only registered tk widgets
+        self.theme.set_dark_mode(self.settings["dark_mode"])
 
-    def update_widgets_colors(self, widget, colors):
-        for child in widget.winfo_children():
-            try:
-                cls_name = child.winfo_class()
-                if cls_name == "Label":
-                    child.configure(bg=colors["bg"], fg=colors["fg"])
-                elif cls_name == "Button":
-                    child.configure(bg=colors["button_bg"], fg=colors["fg"], activebackground=colors["highlight"])
-                elif cls_name == "Entry":
-                    child.configure(bg=colors["entry_bg"], fg=colors["fg"])
-                elif cls_name == "Text":
-                    child.configure(bg=colors["entry_bg"], fg=colors["fg"], insertbackground=colors["fg"])
-                elif cls_name == "Frame" or cls_name == "TFrame":
-                    child.configure(bg=colors["bg"])
-                self.update_widgets_colors(child, colors)
-            except:
-                pass
+    def make_window(self, title, geometry):
+        # Toplevel that is themed from the start
+        win = tk.Toplevel(self)
+        win.title(title)
+        win.geometry(geometry)
+        self.theme.register(win, "bg")
+        return win
 
     def create_widgets(self):
         # Main frame
@@ -179,6 +115,10 @@ class BalatroToolApp(tk.Tk):
         self.export_btn = ttk.Button(btn_frame, text="⬇ Export ZIP", command=self.export_zip_slot)
         self.export_btn.pack(side=tk.LEFT, padx=3)
 
+        # Export Patch button
+        self.export_patch_btn = ttk.Button(btn_frame, text="⬇ Export Patch", command=self.export_patch)
+        self.export_patch_btn.pack(side=tk.LEFT, padx=3)
+
         # Update loader button
         self.update_loader_btn = ttk.Button(btn_frame, text="Update Loader", command=self.update_loader)
         self.update_loader_btn.pack(side=tk.RIGHT, padx=3)
@@ -191,27 +131,33 @@ class BalatroToolApp(tk.Tk):
         self.launch_btn = ttk.Button(btn_frame, text="Launch Game ▶", command=self.launch_game)
         self.launch_btn.pack(side=tk.RIGHT, padx=3)
 
-        # Mod Slots Listbox + scrollbar
-        list_frame = ttk.Frame(self.main_frame)
-        list_frame.pack(fill=tk.BOTH, expand=True, pady=10)
-
-        self.mod_slots_var = tk.StringVar(value=[])
-        self.mod_slots_listbox = tk.Listbox(list_frame, listvariable=self.mod_slots_var, height=15)
-        self.mod_slots_listbox.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
-
-        scrollbar = ttk.Scrollbar(list_frame, orient=tk.VERTICAL, command=self.mod_slots_listbox.yview)
-        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
-        self.mod_slots_listbox.configure(yscrollcommand=scrollbar.set)
-
-        self.mod_slots_listbox.bind('<<ListboxSelect>>', self.on_slot_select)
+        # Search box (name, tags, description)
+        search_frame = ttk.Frame(self.main_frame)
+        search_frame.pack(fill=tk.X, pady=(10, 0))
+        ttk.Label(search_frame, text="Search:").pack(side=tk.LEFT, padx=(0, 5))
+        self.search_var = tk.StringVar()
+        self.search_var.trace_add("write", lambda *args: self.apply_slot_filter())
+        ttk.Entry(search_frame, textvariable=self.search_var).pack(side=tk.LEFT, fill=tk.X, expand=True)
+
+        # Mod Slots list, only draws the visible rows
+        self.mod_slots_list = slotlist.VirtualListView(self.main_frame, self.slot_label, on_select=self.on_slot_select)
+        self.mod_slots_list.pack(fill=tk.BOTH, expand=True, pady=10)
+        self.theme.register(self.mod_slots_list, lambda c: self.mod_slots_list.set_colors(
+            c["entry_bg"], c["fg"], c["highlight"], "#ffffff"))
+        self.slot_index = slotlist.SlotSearchIndex()
+        self.slot_filter = None  # set of matching slot paths, None = show all
 
         # Info Button
         self.info_btn = ttk.Button(self.main_frame, text="Info ℹ", command=self.show_slot_info)
         self.info_btn.pack(pady=5)
 
+        # Cancel button, only shown while background jobs are running
+        self.cancel_jobs_btn = ttk.Button(self.main_frame, text="Cancel Jobs ✖", command=self.cancel_jobs)
+
         # Status bar
         self.status_var = tk.StringVar(value="Ready")
         self.status_bar = tk.Label(self, textvariable=self.status_var, anchor="w", relief=tk.SUNKEN)
+        self.theme.register(self.status_bar, "label")
         self.status_bar.pack(side=tk.BOTTOM, fill=tk.X)
 
         # Bottom left About Button
@@ -221,11 +167,13 @@ class BalatroToolApp(tk.Tk):
 
         # Load mod slots folder
         self.mod_slots_folder = os.path.join(os.getcwd(), "mod_slots")
-        if not os.path.exists(self.mod_slots_folder):
-            os.makedirs(self.mod_slots_folder)
+        self.library = SlotLibrary(self.mod_slots_folder)
+        self.library.snapshot_keep = self.settings["snapshot_keep"]
+        self.settings.add_listener(lambda key, old, new: setattr(self.library, "snapshot_keep", new), "snapshot_keep")
 
         self.mod_slots = []
-        self.load_mod_slots()
+        self.slots_by_path = {}
+        self.mod_slots_list.set_placeholder("Loading slots...")
 
     def toast(self, message):
         # Simple toast message that disappears
@@ -239,99 +187,285 @@ class BalatroToolApp(tk.Tk):
         toast.geometry(f"+{x}+{y}")
         toast.after(1500, toast.destroy)
 
+    def on_jobs_changed(self, active_count):
+        if active_count:
+            self.cancel_jobs_btn.pack(pady=5)
+        else:
+            self.cancel_jobs_btn.pack_forget()
+
+    def cancel_jobs(self):
+        if messagebox.askyesno("Cancel Jobs", "Cancel all running imports/exports?"):
+            self.jobs.cancel_all()
+
+    def on_close(self):
+        if self.jobs.visible() and not messagebox.askyesno(
+                "Quit", "Imports/exports are still running. Cancel them and quit?"):
+            return
+        self.jobs.shutdown()
+        self.settings.remove_listener(self.on_config_save_failed)
+        self.settings.flush()
+        self.destroy()
+
     def load_mod_slots(self):
+        # Scans in the background and streams slots into the list in batches
         self.mod_slots = []
-        for fname in os.listdir(self.mod_slots_folder):
-            path = os.path.join(self.mod_slots_folder, fname)
-            if os.path.isdir(path):
-                slot = ModSlot(fname, path)
-                slot.load_metadata()
-                slot.count_mod_files()
-                self.mod_slots.append(slot)
         self.refresh_mod_slots_listbox()
+        self.mod_slots_list.set_placeholder("Loading slots...")
+        self.status_var.set("Loading slots...")
+        started = time.perf_counter()
+
+        def work(job):
+            batch = []
+            for slot in self.library.iter_slots():
+                batch.append(slot)
+                if len(batch) >= DISCOVERY_BATCH:
+                    job.post(self.add_discovered_slots, batch)
+                    batch = []
+            return batch
+
+        def done(batch):
+            self.add_discovered_slots(batch)
+            self.mod_slots_list.set_placeholder("No slots yet, save or import one")
+            self.status_var.set(f"Loaded {len(self.mod_slots)} slots")
+            tracing.event("ui.load_mod_slots", slots=len(self.mod_slots),
+                          elapsed_ms=round((time.perf_counter() - started) * 1000, 1))
+            if self.settings["archive_after_days"] > 0:
+                self.archive_idle_slots()
+
+        def failed(e):
+            self.mod_slots_list.set_placeholder("Could not read the slots folder")
+            self.status_var.set(f"Loading slots failed: {e}")
+
+        self.jobs.submit(jobs.Job("Loading slots", work, on_done=done, on_error=failed, silent=True))
+
+    def archive_idle_slots(self):
+        # Packs slots nobody loaded in a while, quietly after startup
+        days = self.settings["archive_after_days"]
+        slots = list(self.mod_slots)
+
+        def work(job):
+            return self.library.freeze_idle(days, job, slots)
+
+        def done(archived):
+            for slot in archived:
+                self.mod_slots_list.update_row(slot.path)
+            if archived:
+                self.status_var.set(f"Archived {len(archived)} slot(s) not used in {days} days")
+
+        self.jobs.submit(jobs.Job("Archiving idle slots", work, on_done=done, silent=True))
+
+    def add_discovered_slots(self, batch):
+        # Slots saved/imported while the scan ran are already in the list
+        added = False
+        for slot in batch:
+            if slot.path not in self.slots_by_path:
+                self.mod_slots.append(slot)
+                self.slots_by_path[slot.path] = slot
+                self.slot_index.add(slot.path, slot.name, slot.tags, slot.description)
+                added = True
+        if added:
+            self.apply_slot_filter()
+
+    def slot_label(self, path):
+        slot = self.slots_by_path[path]
+        prefix = "● " if getattr(slot, "loaded", False) else "  "
+        archived = "  ❄" if slot.cold else ""
+        return f"{prefix}{slot.name}  ({slot.mod_count} mod{'' if slot.mod_count == 1 else 's'}){archived}"
 
     def refresh_mod_slots_listbox(self):
-        display_names = []
+        # Full rebuild, only needed when the whole slot list was reloaded
+        self.slots_by_path = {slot.path: slot for slot in self.mod_slots}
+        self.slot_index = slotlist.SlotSearchIndex()
         for slot in self.mod_slots:
-            prefix = "● " if getattr(slot, "loaded", False) else "  "
-            display_names.append(f"{prefix}{slot.name}")
-        self.mod_slots_var.set(display_names)
+            self.slot_index.add(slot.path, slot.name, slot.tags, slot.description)
+        self.apply_slot_filter()
+
+    def apply_slot_filter(self):
+        self.slot_filter = self.slot_index.search(self.search_var.get())
+        self.mod_slots_list.set_items(s.path for s in self.mod_slots
+                                      if self.slot_filter is None or s.path in self.slot_filter)
+
+    def _matches_filter(self, slot):
+        query = self.search_var.get()
+        if not query.strip():
+            return True
+        self.slot_filter = self.slot_index.search(query)
+        return slot.path in self.slot_filter
+
+    def put_slot(self, slot):
+        # Add a new slot or replace an existing one, touching only its row
+        existing = self.slots_by_path.get(slot.path)
+        if existing is not None:
+            self.mod_slots[self.mod_slots.index(existing)] = slot
+        else:
+            self.mod_slots.append(slot)
+        self.slots_by_path[slot.path] = slot
+        self.slot_index.add(slot.path, slot.name, slot.tags, slot.description)
+        shown = self.mod_slots_list.index_of(slot.path) is not None
+        if not self._matches_filter(slot):
+            self.mod_slots_list.remove(slot.path)
+        elif shown:
+            self.mod_slots_list.update_row(slot.path)
+        else:
+            self.mod_slots_list.append(slot.path)
 
-    def on_slot_select(self, event):
-        # Could update UI based on selection if needed
-        pass
+    def drop_slot(self, slot):
+        self.mod_slots.remove(slot)
+        del self.slots_by_path[slot.path]
+        self.slot_index.remove(slot.path)
+        self.mod_slots_list.remove(slot.path)
+
+    def selected_slot(self):
+        path = self.mod_slots_list.selected
+        return self.slots_by_path.get(path) if path else None
+
+    def on_slot_select(self, path):
+        slot = self.slots_by_path.get(path)
+        if slot:
+            tags = f" - tags: {', '.join(slot.tags)}" if slot.tags else ""
+            self.status_var.set(f"{slot.name}: {slot.mod_count} mods{tags}")
 
     def load_mod_slot(self):
-        idx = self.mod_slots_listbox.curselection()
-        if not idx:
+        slot = self.selected_slot()
+        if slot is None:
             messagebox.showwarning("Load Slot", "No mod slot selected.")
             return
-        slot = self.mod_slots[idx[0]]
-        # Here: implement the actual loading logic (copy files, unzip, etc)
-        # For now just mark loaded
-        for s in self.mod_slots:
-            s.loaded = False
-        slot.loaded = True
-        self.refresh_mod_slots_listbox()
-        self.status_var.set(f"Loaded slot '{slot.name}'")
-        self.toast(f"Loaded slot '{slot.name}'")
+        mods_dir = utills.find_balatro_mods()
+        if not mods_dir:
+            messagebox.showwarning("Load Slot", "Could not find the Balatro appdata folder.")
+            return
+        exe_path = self.settings["balatro_exe_path"]
+        game_dir = os.path.dirname(exe_path) if exe_path else None
+
+        # Dry run first so the user sees how much will actually change
+        try:
+            plan, mode = self.library.activate(slot, mods_dir, game_dir, self.settings["activation_mode"], dry_run=True)
+        except Exception as e:
+            messagebox.showerror("Error", f"Failed to compare slot with live files.\n{e}")
+            return
+        note = ""
+        if mode != self.settings["activation_mode"]:
+            note = " - folder links not supported here, copied instead"
+        try:
+            problems = self.library.analyze(slot)
+        except Exception as e:
+            problems = []
+            self.status_var.set(f"Could not check slot for conflicts: {e}")
+
+        if (plan is not None and not plan.is_noop) or conflicts.has_errors(problems):
+            msg = f"Load slot '{slot.name}'?"
+            if plan is not None:
+                msg += f"\n\n{plan.summary()}"
+            if mode == activation.MODE_COPY and plan is not None and \
+                    any(not rel.startswith(activation.MODS_PREFIX) for rel in plan.skipped):
+                msg += "\n\nThe exe/loader files are skipped until you set your Balatro.exe path."
+            if problems:
+                msg += "\n\nProblems found:\n" + conflicts.describe(problems)
+            if not messagebox.askyesno("Load Slot", msg):
+                return
+        snapshot = self.settings["snapshot_before_switch"]
+
+        # Unpacking an archived slot and copying can take a while
+        def work(job):
+            return self.library.activate(slot, mods_dir, game_dir, mode, snapshot=snapshot, job=job)
+
+        def done(result):
+            plan, used = result
+            for s in self.mod_slots:
+                if s.loaded:
+                    s.loaded = False
+                    s.live_mode = None
+                    self.mod_slots_list.update_row(s.path)
+            slot.loaded = True
+            slot.live_mode = used
+            self.mod_slots_list.update_row(slot.path)
+            summary = plan.summary() if plan is not None else "already prepared, switched link"
+            self.status_var.set(f"Loaded slot '{slot.name}' ({summary}){note}")
+            self.toast(f"Loaded slot '{slot.name}'")
+
+        def failed(e):
+            self.status_var.set(f"Loading slot '{slot.name}' failed")
+            messagebox.showerror("Error", f"Failed to load slot.\n{e}")
+
+        self.jobs.submit(jobs.Job(f"Loading '{slot.name}'", work, done, failed))
 
     def save_mod_slot(self):
         # Prompt for name
         name = simpledialog.askstring("Save Slot", "Enter name for this slot:")
         if not name:
             return
-        safe_name = "".join(c for c in name if c.isalnum() or c in (' ', '_', '-')).rstrip()
-        slot_path = os.path.join(self.mod_slots_folder, safe_name)
-        if os.path.exists(slot_path):
+        safe_name = safe_slot_name(name)
+        if not utills.collect_live_files(self.settings["balatro_exe_path"]):
+            messagebox.showwarning("Save Slot", "No Balatro.exe or Mods folder found to save.")
+            return
+        overwrite = self.library.exists(safe_name)
+        if overwrite:
             if not messagebox.askyesno("Overwrite Slot", f"Slot '{safe_name}' exists. Overwrite?"):
                 return
-            shutil.rmtree(slot_path)
-        os.makedirs(slot_path)
-        # TODO: Copy current mod files to slot_path - user logic needed
-        # For demo, just create metadata file
-        slot = ModSlot(safe_name, slot_path)
-        slot.creation_date = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        slot.mod_count = 0
-        slot.save_metadata()
-        self.mod_slots.append(slot)
-        self.refresh_mod_slots_listbox()
-        self.status_var.set(f"Saved slot '{safe_name}'")
+        try:
+            slot, written = self.library.save_from_live(safe_name, self.settings["balatro_exe_path"], overwrite=overwrite)
+        except Exception as e:
+            messagebox.showerror("Error", f"Failed to save slot.\n{e}")
+            return
+        self.put_slot(slot)
+        self.status_var.set(f"Saved slot '{safe_name}' ({written // 1024} KB new data)")
         self.toast(f"Saved slot '{safe_name}'")
 
     def delete_mod_slot(self):
-        idx = self.mod_slots_listbox.curselection()
-        if not idx:
+        slot = self.selected_slot()
+        if slot is None:
             messagebox.showwarning("Delete Slot", "No mod slot selected.")
             return
-        slot = self.mod_slots[idx[0]]
         if slot.locked:
             messagebox.showinfo("Delete Slot", "Cannot delete a locked slot.")
             return
         if not messagebox.askyesno("Delete Slot", f"Are you sure you want to delete slot '{slot.name}'?"):
             return
-        shutil.rmtree(slot.path)
-        self.mod_slots.pop(idx[0])
-        self.refresh_mod_slots_listbox()
+        try:
+            self.library.delete(slot)
+        except Exception as e:
+            messagebox.showerror("Error", f"Failed to delete slot.\n{e}")
+            return
+        self.drop_slot(slot)
         self.status_var.set(f"Deleted slot '{slot.name}'")
         self.toast(f"Deleted slot '{slot.name}'")
 
     def show_slot_info(self):
-        idx = self.mod_slots_listbox.curselection()
-        if not idx:
+        slot = self.selected_slot()
+        if slot is None:
             messagebox.showwarning("Slot Info", "No mod slot selected.")
             return
-        slot = self.mod_slots[idx[0]]
 
-        info_win = tk.Toplevel(self)
-        info_win.title(f"Info - {slot.name}")
-        info_win.geometry("400x350")
+        info_win = self.make_window(f"Info - {slot.name}", "460x540")
 
         ttk.Label(info_win, text=f"Slot Name: {slot.name}", font=("Segoe UI", 14, "bold")).pack(pady=5)
         locked_str = "Yes" if slot.locked else "No"
         ttk.Label(info_win, text=f"Locked: {locked_str}").pack()
+        if slot.loaded:
+            live_str = "Live (linked folder)" if slot.live_mode == activation.MODE_LINK else "Live (copied)"
+        elif slot.cold:
+            live_str = "Archived (unpacked when loaded or exported)"
+        else:
+            live_str = "Stored"
+        ttk.Label(info_win, text=f"Status: {live_str}").pack()
         ttk.Label(info_win, text=f"Creation Date: {slot.creation_date or 'Unknown'}").pack()
-        ttk.Label(info_win, text=f"Number of mods (excluding .exe): {slot.mod_count}").pack()
+        ttk.Label(info_win, text=f"Mods: {slot.mod_count}").pack()
+        launches = self.library.launch_stats().get(slot.dir_name)
+        if launches:
+            text = f"Launched {launches['launches']}x, {launches['crashes']} crashed"
+            if launches["menu_seconds"] is not None:
+                text += f", menu in {launches['menu_seconds']:.1f}s"
+            ttk.Label(info_win, text=text).pack()
+
+        # What the mod index found: name, version, where the info came from
+        columns = ("mod", "version", "source")
+        mods_tree = ttk.Treeview(info_win, columns=columns, show="headings", height=6)
+        for col, width in zip(columns, (230, 100, 80)):
+            mods_tree.heading(col, text=col.capitalize())
+            mods_tree.column(col, width=width, anchor="w")
+        for mod in slot.mods:
+            mods_tree.insert("", tk.END, values=(mod["name"], mod["version"] or "-", mod["source"]))
+        mods_tree.pack(fill=tk.X, padx=10, pady=5)
 
         # Tags
         ttk.Label(info_win, text="Tags (comma separated):").pack(pady=(10,0))
@@ -341,7 +475,7 @@ class BalatroToolApp(tk.Tk):
 
         # Description
         ttk.Label(info_win, text="Description:").pack(pady=(10,0))
-        desc_text = tk.Text(info_win, height=6, wrap=tk.WORD)
+        desc_text = self.theme.register(tk.Text(info_win, height=6, wrap=tk.WORD), "text")
         desc_text.pack(fill=tk.BOTH, padx=10, pady=5)
         desc_text.insert("1.0", slot.description)
 
@@ -352,47 +486,253 @@ class BalatroToolApp(tk.Tk):
             slot.tags = [t.strip() for t in tags_var.get().split(",") if t.strip()]
             slot.description = desc_text.get("1.0", "end").strip()
             slot.save_metadata()
-            self.load_mod_slots()
+            self.library.remember(slot)
+            self.put_slot(slot)
             self.toast(f"Saved info for '{slot.name}'")
             info_win.destroy()
 
         ttk.Button(info_win, text="Save", command=save_info).pack(pady=10)
+        ttk.Button(info_win, text="Verify files", command=lambda: self.verify_slots([slot], deep=True)).pack()
         ttk.Button(info_win, text="< Back", command=info_win.destroy).pack(side=tk.BOTTOM, pady=5)
 
+    def verify_slots(self, slots, deep=False):
+        # deep hashes every file; otherwise files unchanged since their last hash are trusted
+        def work(job):
+            return self.library.verify_many(slots, deep=deep, job=job)
+
+        def done(result):
+            reports, stats = result
+            bad = {name: r for name, r in reports.items() if r["missing"] or r["modified"] or r["extra"]}
+            checked = f"{stats['hashed_files']} files hashed, {stats['trusted_files']} unchanged"
+            if not bad:
+                self.status_var.set(f"Verified {len(reports)} slot(s): all good ({checked})")
+                self.toast("All slot files are intact")
+                return
+            lines = []
+            for name, r in sorted(bad.items()):
+                parts = [f"{len(r[k])} {k}" for k in ("missing", "modified", "extra") if r[k]]
+                lines.append(f"{name}: {', '.join(parts)}")
+                lines.extend("    " + rel for rel in (r["missing"] + r["modified"])[:5])
+            self.status_var.set(f"Verify found problems in {len(bad)} slot(s)")
+            messagebox.showwarning("Verify", "Damaged slots (re-save or re-import them):\n\n" + "\n".join(lines[:30]))
+
+        def failed(e):
+            messagebox.showerror("Error", f"Failed to verify slots.\n{e}")
+            self.status_var.set("Verify failed.")
+
+        label = f"'{slots[0].name}'" if len(slots) == 1 else f"{len(slots)} slots"
+        self.jobs.submit(jobs.Job(f"Verifying {label}", work, done, failed))
+
     def update_loader(self):
-        messagebox.showinfo("Update Loader", "This feature will update Lovely and Steammodded automatically.\n(Implementation needed)")
-        self.status_var.set("Updating loader... (stub)")
+        win = self.make_window("Update Loader", "320x150")
+        ttk.Label(win, text="Update which loader?").pack(pady=10)
+        row = ttk.Frame(win)
+        row.pack()
+        for label, names in (("Lovely", ["lovely"]), ("Steamodded", ["steamodded"]),
+                             ("Both", ["lovely", "steamodded"])):
+            ttk.Button(row, text=label,
+                       command=lambda n=names: (win.destroy(), self.run_loader_update(n))).pack(side=tk.LEFT, padx=3)
+        ttk.Button(win, text="Cancel", command=win.destroy).pack(pady=10)
+
+    def run_loader_update(self, names, quiet=False):
+        # Download/check in the background, then install into the loaded
+        # slot (and redeploy it) or straight into the game folders
+        import loaders
+        cache_root = config.cache_dir("loaders")
+        sources = self.settings["loader_sources"]
+        mode = self.settings["activation_mode"]
+        exe_path = self.settings["balatro_exe_path"]
+        game_dir = os.path.dirname(exe_path) if exe_path else None
+        mods_dir = utills.find_balatro_mods()
+        if not mods_dir:
+            if not quiet:
+                messagebox.showerror("Update Loader", "Could not find the Balatro appdata folder.")
+            return
+
+        def work(job):
+            updates = loaders.update_loaders(names, cache_root, sources, job)
+            slot = self.library.loaded_slot()
+            loaders.retarget(updates, slot.mods if slot is not None else self.library.live_mods(mods_dir))
+            skipped = []
+            if slot is not None:
+                for update in updates:
+                    self.library.install_files(slot, update.files, update.replace_prefix)
+                self.library.activate(slot, mods_dir, game_dir, mode)
+            else:
+                with self.library.switching():
+                    skipped = loaders.install_live(updates, mods_dir, game_dir)
+            loaders.mark_installed(cache_root, updates)
+            return updates, slot, skipped
+
+        def done(result):
+            updates, slot, skipped = result
+            versions = ", ".join(f"{loaders.LOADERS[u.name]['title']} {u.version}" for u in updates)
+            where = f"slot '{slot.name}'" if slot else "the game folders"
+            self.status_var.set(f"Installed {versions} into {where}")
+            if slot is not None:
+                self.put_slot(slot)
+            if skipped and not quiet:
+                messagebox.showwarning("Update Loader",
+                                       "Set the game exe (Launch Game) to install: " + ", ".join(skipped))
+            if not quiet:
+                self.toast(f"Installed {versions}")
+
+        def failed(e):
+            self.status_var.set(f"Loader update failed: {e}")
+            if not quiet:
+                messagebox.showerror("Update Loader", f"Loader update failed.\n{e}")
+
+        self.jobs.submit(jobs.Job("Updating " + " + ".join(loaders.LOADERS[n]["title"] for n in names),
+                                  work, done, failed))
 
     def open_settings(self):
-        settings_win = tk.Toplevel(self)
-        settings_win.title("Settings")
-        settings_win.geometry("300x150")
+        settings_win = self.make_window("Settings", "300x620")
 
         ttk.Label(settings_win, text="Settings", font=("Segoe UI", 14, "bold")).pack(pady=10)
 
-        # Dummy auto-update toggle
-        auto_update_var = tk.BooleanVar(value=False)
+        auto_update_var = tk.BooleanVar(value=self.settings["auto_update_loaders"])
         def toggle_auto_update():
             val = auto_update_var.get()
+            self.settings.set("auto_update_loaders", val)
             self.status_var.set(f"Auto-update on startup set to {val}")
             self.toast(f"Auto-update set to {val}")
         ttk.Checkbutton(settings_win, text="Auto-update loader on startup", variable=auto_update_var, command=toggle_auto_update).pack(pady=10)
 
         # Light mode toggle (checkbox checked = use light mode)
-        light_mode_var = tk.BooleanVar(value=not self.dark_mode)
+        light_mode_var = tk.BooleanVar(value=not self.settings["dark_mode"])
         def toggle_light_mode():
-            self.dark_mode = not light_mode_var.get()
-            self.apply_theme()
-            self.save_config()
-            self.toast(f"{'Light' if not self.dark_mode else 'Dark'} mode enabled")
+            self.settings.set("dark_mode", not light_mode_var.get())
+            self.toast(f"{'Light' if light_mode_var.get() else 'Dark'} mode enabled")
         ttk.Checkbutton(settings_win, text="Use Light Mode", variable=light_mode_var, command=toggle_light_mode).pack(pady=10)
 
+        # Link mode: Mods becomes a symlink/junction, switching is one rename
+        link_mode_var = tk.BooleanVar(value=self.settings["activation_mode"] == activation.MODE_LINK)
+        def toggle_link_mode():
+            self.settings.set("activation_mode", activation.MODE_LINK if link_mode_var.get() else activation.MODE_COPY)
+            self.toast("Fast switching (linked Mods folder) " + ("on" if link_mode_var.get() else "off"))
+        ttk.Checkbutton(settings_win, text="Fast switching (link Mods folder)", variable=link_mode_var, command=toggle_link_mode).pack(pady=5)
+
+        # ZIP export compression (fast = level 1, max = level 9, store = no compression)
+        ttk.Label(settings_win, text="ZIP export compression:").pack()
+        import ziptools
+        preset = self.settings["export_preset"]
+        preset_var = tk.StringVar(value=preset if preset in ziptools.EXPORT_PRESETS else ziptools.DEFAULT_PRESET)
+        def change_preset(event=None):
+            self.settings.set("export_preset", preset_var.get())
+            self.toast(f"Export compression set to {preset_var.get()}")
+        preset_box = ttk.Combobox(settings_win, textvariable=preset_var, state="readonly",
+                                  values=list(ziptools.EXPORT_PRESETS))
+        preset_box.bind("<<ComboboxSelected>>", change_preset)
+        preset_box.pack(pady=5)
+
+        # Operation traces go to logs/trace.jsonl, profiles to logs/profiles/
+        trace_var = tk.BooleanVar(value=self.settings["trace_enabled"])
+        profile_var = tk.BooleanVar(value=self.settings["trace_profile"])
+        def toggle_tracing():
+            self.settings.update({"trace_enabled": trace_var.get(), "trace_profile": profile_var.get()})
+            self.toast("Operation tracing " + ("on" if trace_var.get() else "off"))
+        ttk.Checkbutton(settings_win, text="Record operation timings", variable=trace_var, command=toggle_tracing).pack(pady=5)
+        ttk.Checkbutton(settings_win, text="Profile operations (slower)", variable=profile_var, command=toggle_tracing).pack(pady=5)
+        ttk.Button(settings_win, text="Last operations...", command=self.show_recent_operations).pack(pady=5)
+
+        # Save file snapshots before switching slots / launching
+        snap_switch_var = tk.BooleanVar(value=self.settings["snapshot_before_switch"])
+        snap_launch_var = tk.BooleanVar(value=self.settings["snapshot_before_launch"])
+        def toggle_snapshots():
+            self.settings.update({"snapshot_before_switch": snap_switch_var.get(),
+                                "snapshot_before_launch": snap_launch_var.get()})
+        ttk.Checkbutton(settings_win, text="Back up saves before switching", variable=snap_switch_var, command=toggle_snapshots).pack(pady=5)
+        ttk.Checkbutton(settings_win, text="Back up saves before launching", variable=snap_launch_var, command=toggle_snapshots).pack(pady=5)
+        ttk.Button(settings_win, text="Save backups...", command=self.show_snapshots).pack(pady=5)
+        # Cold storage: slots unused this long are packed into .cold/, 0 = never
+        ttk.Label(settings_win, text="Archive slots unused for (days, 0 = never):").pack()
+        archive_var = tk.StringVar(value=str(self.settings["archive_after_days"]))
+        def change_archive_days(*_):
+            try:
+                days = int(archive_var.get())
+            except ValueError:
+                return
+            if days >= 0:
+                self.settings.set("archive_after_days", days)
+        archive_var.trace_add("write", change_archive_days)
+        ttk.Spinbox(settings_win, from_=0, to=3650, textvariable=archive_var, width=6).pack(pady=5)
+        ttk.Button(settings_win, text="Verify all slots", command=lambda: self.verify_slots(list(self.mod_slots))).pack(pady=5)
+
         ttk.Button(settings_win, text="Close", command=settings_win.destroy).pack(pady=10)
 
+    def show_recent_operations(self):
+        ops_win = self.make_window("Last operations", "620x360")
+        columns = ("time", "operation", "ms", "status", "details")
+        tree = ttk.Treeview(ops_win, columns=columns, show="headings")
+        for col, width in zip(columns, (70, 150, 70, 50, 260)):
+            tree.heading(col, text=col.capitalize())
+            tree.column(col, width=width, anchor="w")
+        tree.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+
+        def fill():
+            tree.delete(*tree.get_children())
+            for record in tracing.recent_spans():
+                if record["parent"] is not None:
+                    continue  # nested spans are in the trace log
+                details = ", ".join(f"{k}={v}" for k, v in record["attrs"].items() if k != "profile")
+                if record.get("error"):
+                    details = record["error"] + "  " + details
+                tree.insert("", tk.END, values=(
+                    time.strftime("%H:%M:%S", time.localtime(record["start"])),
+                    record["span"], f"{record['ms']:.1f}", record["status"], details))
+
+        if not tracing.enabled():
+            ttk.Label(ops_win, text="Turn on \"Record operation timings\" in Settings to fill this list.").pack()
+        btns = ttk.Frame(ops_win)
+        btns.pack(pady=5)
+        ttk.Button(btns, text="Refresh", command=fill).pack(side=tk.LEFT, padx=3)
+        ttk.Button(btns, text="Close", command=ops_win.destroy).pack(side=tk.LEFT, padx=3)
+        fill()
+
+    def show_snapshots(self):
+        snap_win = self.make_window("Save backups", "560x360")
+        columns = ("time", "slot", "reason", "files", "stored")
+        tree = ttk.Treeview(snap_win, columns=columns, show="headings", selectmode="browse")
+        for col, width in zip(columns, (140, 150, 110, 60, 80)):
+            tree.heading(col, text=col.capitalize())
+            tree.column(col, width=width, anchor="w")
+        tree.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+
+        def fill():
+            tree.delete(*tree.get_children())
+            for meta in self.library.snapshots.list():
+                tree.insert("", tk.END, iid=meta["id"], values=(
+                    time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(meta["created"])),
+                    meta["slot"] or "(none)", meta["reason"], meta["file_count"],
+                    f"{meta['stored_bytes'] / 1024:.1f} KB"))
+
+        def restore():
+            selected = tree.selection()
+            if not selected:
+                messagebox.showwarning("Restore", "No backup selected.", parent=snap_win)
+                return
+            snapshot_id = selected[0]
+            if not messagebox.askyesno("Restore", "Replace the current save files with this backup?\n\n"
+                                       "The current saves are backed up first.", parent=snap_win):
+                return
+            try:
+                written, removed = self.library.restore_snapshot(snapshot_id)
+            except Exception as e:
+                messagebox.showerror("Error", f"Failed to restore backup.\n{e}", parent=snap_win)
+                return
+            self.status_var.set(f"Restored save backup ({written} files written, {removed} removed)")
+            self.toast("Save backup restored")
+            fill()
+
+        btns = ttk.Frame(snap_win)
+        btns.pack(pady=5)
+        ttk.Button(btns, text="Restore", command=restore).pack(side=tk.LEFT, padx=3)
+        ttk.Button(btns, text="Refresh", command=fill).pack(side=tk.LEFT, padx=3)
+        ttk.Button(btns, text="Close", command=snap_win.destroy).pack(side=tk.LEFT, padx=3)
+        fill()
+
     def show_about(self):
-        about_win = tk.Toplevel(self)
-        about_win.title("About BalatroTool")
-        about_win.geometry("450x400")
+        about_win = self.make_window("About BalatroTool", "450x400")
 
         text = (
             "About BalatroTool\n\n"
@@ -415,27 +755,19 @@ class BalatroToolApp(tk.Tk):
             "ONLY SHARE IF YOU OWN THE GAME!"
         )
 
-        label = tk.Label(about_win, text=text, wraplength=420, justify="left")
+        label = self.theme.register(tk.Label(about_win, text=text, wraplength=420, justify="left"), "label")
         label.pack(padx=10, pady=10)
 
-        yt_btn = ttk.Button(about_win, text="moonplaysvr YouTube Channel", command=lambda: webbrowser.open(ABOUT_YT_URL))
+        def open_channel():
+            import webbrowser
+            webbrowser.open(ABOUT_YT_URL)
+        yt_btn = ttk.Button(about_win, text="moonplaysvr YouTube Channel", command=open_channel)
         yt_btn.pack(pady=5)
 
         ttk.Button(about_win, text="Close", command=about_win.destroy).pack(pady=10)
 
     def launch_game(self):
-        import platform
-        exe_path = None
-
-        # Try to load last saved exe path
-        config_file = "balatrotool_config.json"
-        if os.path.exists(config_file):
-            try:
-                with open(config_file, "r") as f:
-                    cfg = json.load(f)
-                    exe_path = cfg.get("balatro_exe_path", None)
-            except:
-                exe_path = None
+        exe_path = self.settings["balatro_exe_path"]
 
         if not exe_path or not os.path.exists(exe_path):
             messagebox.showinfo("Select Executable", "Please select your Balatro.exe file.")
@@ -447,22 +779,56 @@ class BalatroToolApp(tk.Tk):
                 self.status_var.set("Game launch cancelled.")
                 return
             # Save for next time
+            self.settings.set("balatro_exe_path", exe_path)
+
+        # Cached until the exe, loader, live folders or the slot change
+        mods_dir = utills.find_balatro_mods()
+        try:
+            slot, problems, _ = self.library.preflight(exe_path, mods_dir)
+        except Exception as e:
+            slot, problems = None, []
+            self.status_var.set(f"Could not check the game setup: {e}")
+        if conflicts.has_errors(problems):
+            what = f"Slot '{slot.name}'" if slot is not None else "The game setup"
+            if not messagebox.askyesno("Launch Game",
+                                       f"{what} has problems:\n\n{conflicts.describe(problems)}\n\nLaunch anyway?"):
+                self.status_var.set("Game launch cancelled.")
+                return
+
+        if self.settings["snapshot_before_launch"]:
             try:
-                with open(config_file, "r") as f:
-                    cfg = json.load(f)
-            except:
-                cfg = {}
-            cfg["balatro_exe_path"] = exe_path
-            with open(config_file, "w") as f:
-                json.dump(cfg, f, indent=2)
+                self.library.snapshot_appdata("launch")
+            except Exception as e:
+                # Not worth blocking the game over
+                self.status_var.set(f"Save backup failed: {e}")
 
         try:
-            subprocess.Popen([exe_path])
-            self.status_var.set(f"Launched game: {os.path.basename(exe_path)}")
-            self.toast(f"Launched game: {os.path.basename(exe_path)}")
+            run = self.library.launch(exe_path, mods_dir)
         except Exception as e:
             messagebox.showerror("Error", f"Failed to launch game.\n{e}")
             self.status_var.set("Failed to launch game.")
+            return
+        self.status_var.set(f"Launched game: {os.path.basename(exe_path)}")
+        self.toast(f"Launched game: {os.path.basename(exe_path)}")
+        self.after(GAME_POLL_MS, self.watch_game, run)
+
+    def watch_game(self, run, menu_seen=False):
+        # The monitor thread fills in run, this only reads it on the Tk thread
+        if not menu_seen and run.menu_seconds is not None:
+            menu_seen = True
+            self.status_var.set(f"Balatro reached the menu in {run.menu_seconds:.1f}s")
+        if run.running:
+            self.after(GAME_POLL_MS, self.watch_game, run, menu_seen)
+            return
+        if run.crashed:
+            self.status_var.set(f"Balatro crashed (exit code {run.exit_code})")
+            msg = f"Balatro crashed (exit code {run.exit_code})."
+            if run.crash_log:
+                msg += f"\n\n{run.crash_log}:\n" + "\n".join(run.crash_tail)
+            messagebox.showwarning("Game Crashed", msg)
+        else:
+            minutes = (run.ended - run.started) / 60
+            self.status_var.set(f"Balatro closed after {minutes:.0f} min")
 
     def import_zip_slot(self):
         zip_path = filedialog.askopenfilename(
@@ -471,43 +837,79 @@ class BalatroToolApp(tk.Tk):
         )
         if not zip_path:
             return
+        import ziptools
+        try:
+            patch = ziptools.read_patch_info(zip_path)
+        except (OSError, ValueError) as e:
+            messagebox.showerror("Error", f"Failed to read ZIP.\n{e}")
+            return
+        if patch is not None:
+            self.apply_patch_zip(zip_path, patch)
+            return
         # Ask for slot name
         name = simpledialog.askstring("Import ZIP", "Enter name for this imported slot:")
         if not name:
             return
-        safe_name = "".join(c for c in name if c.isalnum() or c in (' ', '_', '-')).rstrip()
-        slot_path = os.path.join(self.mod_slots_folder, safe_name)
-        if os.path.exists(slot_path):
+        safe_name = safe_slot_name(name)
+        if self.library.exists(safe_name):
             if not messagebox.askyesno("Overwrite Slot", f"Slot '{safe_name}' exists. Overwrite?"):
                 return
-            shutil.rmtree(slot_path)
-        os.makedirs(slot_path)
 
-        # Extract ZIP
-        try:
-            with zipfile.ZipFile(zip_path, 'r') as zip_ref:
-                zip_ref.extractall(slot_path)
-        except Exception as e:
+        # Extract ZIP in the background, the old slot is only replaced once it's done
+        def work(job):
+            return self.library.import_zip(zip_path, safe_name, overwrite=True, job=job)
+
+        def done(res):
+            slot, result = res
+            self.library.store.collect_garbage()
+            self.library.remember(slot)
+            self.put_slot(slot)
+            skipped = f", {result.skipped_bytes // 1024} KB already stored" if result.skipped_bytes else ""
+            self.status_var.set(f"Imported ZIP as slot '{safe_name}' ({result.written_bytes // 1024} KB new{skipped})")
+            self.toast(f"Imported ZIP as slot '{safe_name}'")
+
+        def failed(e):
             messagebox.showerror("Error", f"Failed to extract ZIP.\n{e}")
-            shutil.rmtree(slot_path)
+            self.status_var.set("Import failed.")
+
+        self.jobs.submit(jobs.Job(f"Importing '{safe_name}'", work, done, failed))
+
+    def apply_patch_zip(self, zip_path, patch):
+        import ziptools
+        # The selected slot is the likely target, the others are tried after it
+        selected = self.selected_slot()
+        candidates = [s for s in self.mod_slots if not s.locked]
+        candidates.sort(key=lambda s: s is not selected)
+        if not messagebox.askyesno("Apply Patch", f"This ZIP is a patch ({len(patch['files'])} files changed, "
+                                   f"{len(patch['deleted'])} removed).\n\n"
+                                   "Apply it to the slot it was made for?"):
             return
 
-        # Save metadata
-        slot = ModSlot(safe_name, slot_path)
-        slot.creation_date = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        slot.count_mod_files()
-        slot.save_metadata()
-        self.mod_slots.append(slot)
-        self.refresh_mod_slots_listbox()
-        self.status_var.set(f"Imported ZIP as slot '{safe_name}'")
-        self.toast(f"Imported ZIP as slot '{safe_name}'")
+        def work(job):
+            for slot in candidates:
+                job.check_cancelled()
+                _, hashes = ziptools.entry_hashes(self.library.store, slot.path)
+                if ziptools.content_digest(hashes) == patch["base_digest"]:
+                    return slot, self.library.apply_patch(slot, zip_path, job)
+            raise ziptools.PatchError("None of the unlocked slots is the version this patch was made for.")
+
+        def done(res):
+            slot, result = res
+            self.put_slot(slot)
+            self.status_var.set(f"Patched slot '{slot.name}' ({result.written_bytes // 1024} KB new)")
+            self.toast(f"Patched slot '{slot.name}'")
+
+        def failed(e):
+            messagebox.showerror("Error", f"Failed to apply patch.\n{e}")
+            self.status_var.set("Patch failed.")
+
+        self.jobs.submit(jobs.Job("Applying patch", work, done, failed))
 
     def export_zip_slot(self):
-        idx = self.mod_slots_listbox.curselection()
-        if not idx:
+        slot = self.selected_slot()
+        if slot is None:
             messagebox.showwarning("Export ZIP", "No mod slot selected.")
             return
-        slot = self.mod_slots[idx[0]]
 
         # Ask where to save
         export_path = filedialog.asksaveasfilename(
@@ -519,20 +921,72 @@ class BalatroToolApp(tk.Tk):
         if not export_path:
             return
 
-        try:
-            with zipfile.ZipFile(export_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
-                # Walk slot folder recursively
-                for root, dirs, files in os.walk(slot.path):
-                    for file in files:
-                        file_path = os.path.join(root, file)
-                        # Include everything inside the slot folder (exe + mod files)
-                        arcname = os.path.relpath(file_path, slot.path)
-                        zipf.write(file_path, arcname)
-        except Exception as e:
+        # Include everything in the slot (exe + mod files), read from the blob store
+        preset = self.settings["export_preset"]
+        def work(job):
+            return self.library.export_zip(slot, export_path, preset, job)
+
+        def done(count):
+            self.status_var.set(f"Exported slot '{slot.name}' as ZIP ({count} files)")
+            self.toast(f"Exported slot '{slot.name}' as ZIP")
+
+        def failed(e):
             messagebox.showerror("Error", f"Failed to export ZIP.\n{e}")
+            self.status_var.set("Export failed.")
+
+        self.jobs.submit(jobs.Job(f"Exporting '{slot.name}'", work, done, failed))
+
+    def export_patch(self):
+        slot = self.selected_slot()
+        if slot is None:
+            messagebox.showwarning("Export Patch", "No mod slot selected.")
+            return
+        others = [s for s in self.mod_slots if s is not slot]
+        if not others:
+            messagebox.showwarning("Export Patch", "A patch needs another slot to compare against.")
             return
-        self.status_var.set(f"Exported slot '{slot.name}' as ZIP")
-        self.toast(f"Exported slot '{slot.name}' as ZIP")
+        self.export_patch_slot(slot, others)
+
+    def export_patch_slot(self, slot, others):
+        patch_win = self.make_window("Export patch", "320x140")
+        ttk.Label(patch_win, text=f"Changes that turn this slot into '{slot.name}':").pack(pady=(10, 3))
+        base_box = ttk.Combobox(patch_win, values=[s.name for s in others], state="readonly")
+        base_box.current(0)
+        base_box.pack(fill=tk.X, padx=10)
+
+        def export():
+            base = others[base_box.current()]
+            export_path = filedialog.asksaveasfilename(
+                title="Export patch as ZIP",
+                defaultextension=".zip",
+                filetypes=[("ZIP archives", "*.zip")],
+                initialfile=f"{base.name}-to-{slot.name}.zip",
+                parent=patch_win
+            )
+            if not export_path:
+                return
+            patch_win.destroy()
+            preset = self.settings["export_preset"]
+
+            def work(job):
+                return self.library.export_patch(base, slot, export_path, preset, job)
+
+            def done(res):
+                changed, deleted = res
+                self.status_var.set(f"Exported patch '{base.name}' -> '{slot.name}' "
+                                    f"({changed} files changed, {deleted} removed)")
+                self.toast(f"Exported patch for '{slot.name}'")
+
+            def failed(e):
+                messagebox.showerror("Error", f"Failed to export patch.\n{e}")
+                self.status_var.set("Export failed.")
+
+            self.jobs.submit(jobs.Job(f"Exporting patch for '{slot.name}'", work, done, failed))
+
+        btns = ttk.Frame(patch_win)
+        btns.pack(pady=10)
+        ttk.Button(btns, text="Export", command=export).pack(side=tk.LEFT, padx=3)
+        ttk.Button(btns, text="Cancel", command=patch_win.destroy).pack(side=tk.LEFT, padx=3)
 
 if __name__ == "__main__":
     app = BalatroToolApp()
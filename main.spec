@@ -1,5 +1,10 @@
 # -*- mode: python ; coding: utf-8 -*-
+import os
 
+# One-file builds unpack the whole bundle into a temp folder on every launch.
+# BALATROTOOL_ONEDIR=1 pyinstaller main.spec builds dist/main/ instead, which
+# starts straight from disk with nothing to extract.
+ONEDIR = os.environ.get("BALATROTOOL_ONEDIR") == "1"
 
 a = Analysis(
     ['main.py'],
@@ -19,14 +24,15 @@ pyz = PYZ(a.pure)
 exe = EXE(
     pyz,
     a.scripts,
-    a.binaries,
-    a.datas,
+    *([] if ONEDIR else [a.binaries, a.datas]),
     [],
+    exclude_binaries=ONEDIR,
     name='main',
     debug=False,
     bootloader_ignore_signals=False,
     strip=False,
-    upx=True,
+    # UPX'd dlls have to be unpacked in memory at every start
+    upx=not ONEDIR,
     upx_exclude=[],
     runtime_tmpdir=None,
     console=False,
@@ -37,3 +43,13 @@ exe = EXE(
     entitlements_file=None,
     icon=['icon.ico'],
 )
+if ONEDIR:
+    coll = COLLECT(
+        exe,
+        a.binaries,
+        a.datas,
+        strip=False,
+        upx=False,
+        upx_exclude=[],
+        name='main',
+    )
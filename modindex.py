@@ -0,0 +1,325 @@
+import os
+import re
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import tomllib
+except ImportError:  # Python < 3.11
+    tomllib = None
+
+import utills
+import slotstore
+
+# Finds the actual mods in a slot instead of counting files. A mod is a
+# folder under Mods/ and its metadata comes from a Steamodded Lua header,
+# a Steamodded JSON manifest or Lovely patch files. Only the few files that
+# can carry metadata are read, in a thread pool, and what they said is
+# cached by (size, mtime) so a rescan reads nothing that didn't change.
+
+INDEX_CACHE_NAME = ".modindex.json"
+INDEX_CACHE_VERSION = 2
+HEADER_BYTES = 4 * 1024  # Lua headers sit at the very top of the file
+MAX_MANIFEST_BYTES = 256 * 1024
+HOOK_TEXT_CHARS = 80  # how much of a patch pattern is kept to compare/show
+PARALLEL_MIN_FILES = 8  # fewer misses than this are parsed inline
+MODS_PREFIX = utills.MODS_DIRNAME + "/"
+# Lovely keeps its logs and dumps in Mods/lovely, that's not a mod
+NOT_MODS = {"lovely"}
+
+_HEADER_RE = re.compile(r"^---\s*([A-Z_]+)\s*:\s*(.*?)\s*$")
+_TOML_VALUE_RE = re.compile(r'^\s*(version|priority)\s*=\s*"?([^"\n#]*?)"?\s*(?:#.*)?$', re.MULTILINE)
+
+
+def _split_list(value):
+    # "[a, b]" or "a, b" -> ["a", "b"]
+    value = value.strip()
+    if value.startswith("[") and value.endswith("]"):
+        value = value[1:-1]
+    return [item.strip() for item in value.split(",") if item.strip()]
+
+def _priority(value):
+    try:
+        return int(float(value))
+    except (TypeError, ValueError):
+        return 0
+
+def parse_lua_header(data):
+    """
+    Reads a Steamodded header (--- MOD_NAME: ... lines at the top of a Lua
+    file). Returns a mod record, or None if the file doesn't have one.
+    """
+    text = data.decode("utf-8", "replace").lstrip("\ufeff")
+    fields = {}
+    for line in text.splitlines():
+        if not line.startswith("---"):
+            break
+        match = _HEADER_RE.match(line)
+        if match:
+            fields.setdefault(match.group(1), match.group(2))
+    if "MOD_ID" not in fields or "MOD_NAME" not in fields:
+        return None
+    return {
+        "id": fields["MOD_ID"],
+        "name": fields["MOD_NAME"],
+        "version": fields.get("VERSION") or fields.get("MOD_VERSION"),
+        "author": _split_list(fields.get("MOD_AUTHOR", "")),
+        "priority": _priority(fields.get("PRIORITY")),
+        "dependencies": _split_list(fields.get("DEPENDENCIES") or fields.get("DEPENDS") or ""),
+        "conflicts": _split_list(fields.get("CONFLICTS", "")),
+        "prefix": fields.get("PREFIX"),
+        "provides": [],
+        "source": "header",
+    }
+
+def parse_json_manifest(data):
+    """
+    Reads a Steamodded JSON manifest ({"id", "name", "main_file", ...}).
+    Returns a mod record, or None for any other JSON file.
+    """
+    try:
+        doc = json.loads(data.decode("utf-8-sig"))
+    except ValueError:
+        return None
+    if not isinstance(doc, dict) or not isinstance(doc.get("id"), str) or "main_file" not in doc:
+        return None
+    author = doc.get("author") or []
+    version = doc.get("version")
+    return {
+        "id": doc["id"],
+        "name": str(doc.get("name") or doc["id"]),
+        "version": str(version) if version is not None else None,
+        "author": [str(a) for a in author] if isinstance(author, list) else [str(author)],
+        "priority": _priority(doc.get("priority")),
+        "dependencies": [str(d) for d in doc.get("dependencies") or []],
+        "conflicts": [str(c) for c in doc.get("conflicts") or []],
+        "prefix": doc.get("prefix") if isinstance(doc.get("prefix"), str) else None,
+        "provides": [str(p) for p in doc.get("provides") or []],
+        "source": "json",
+    }
+
+def parse_lovely_toml(data):
+    """
+    Reads the [manifest] of a Lovely patch file. Returns {"version",
+    "priority", "patches", "hooks"} or None if it doesn't parse. hooks are
+    [kind, target file, pattern or module name] per patch.
+    """
+    text = data.decode("utf-8", "replace")
+    if tomllib is not None:
+        try:
+            doc = tomllib.loads(text)
+        except tomllib.TOMLDecodeError:
+            return None
+        manifest = doc.get("manifest") or {}
+        patches = len(doc.get("patches") or [])
+        hooks = []
+        for patch in doc.get("patches") or []:
+            for kind, body in patch.items():
+                if not isinstance(body, dict):
+                    continue
+                what = body.get("name") if kind == "module" else body.get("pattern")
+                if isinstance(what, list):
+                    what = "\n".join(map(str, what))
+                hooks.append([kind, str(body.get("target", "")), str(what or "")[:HOOK_TEXT_CHARS]])
+        version = manifest.get("version")
+        priority = manifest.get("priority")
+    else:
+        # Good enough for the two values we want
+        head = text.split("[[", 1)[0]
+        values = dict(_TOML_VALUE_RE.findall(head))
+        patches = text.count("[[patches]]")
+        hooks = []  # needs a real TOML parser
+        version = values.get("version")
+        priority = values.get("priority")
+    return {"version": str(version) if version is not None else None,
+            "priority": _priority(priority), "patches": patches, "hooks": hooks}
+
+
+def candidate_kind(rel):
+    """
+    Which parser a slot path needs, or None if it can't hold metadata.
+    Steamodded looks at Lua/JSON files in a mod folder and one level down,
+    Lovely at <mod>/lovely.toml and <mod>/lovely/*.toml.
+    """
+    if not rel.startswith(MODS_PREFIX):
+        return None
+    parts = rel.split("/")[1:]
+    name = parts[-1].lower()
+    if parts[0].lower() in NOT_MODS:
+        return None
+    if name.endswith(".toml"):
+        if (len(parts) == 2 and name == "lovely.toml") or (len(parts) == 3 and parts[1].lower() == "lovely"):
+            return "lovely"
+        return None
+    if len(parts) > 3:
+        return None
+    if name.endswith(".lua"):
+        return "lua"
+    if name.endswith(".json") and len(parts) > 1:
+        return "json"
+    return None
+
+def mod_folder(rel):
+    # Mods/<folder>/... -> <folder>; loose Mods/x.lua -> None
+    parts = rel.split("/")
+    return parts[1] if len(parts) > 2 else None
+
+def parse_file(kind, path, size):
+    if kind == "json" and size > MAX_MANIFEST_BYTES:
+        return None
+    with open(path, "rb") as f:
+        if kind == "lua":
+            data = f.read(HEADER_BYTES)
+            return parse_lua_header(data) if data.startswith(b"---") or data.startswith(b"\xef\xbb\xbf---") else None
+        data = f.read()
+    if kind == "json":
+        return parse_json_manifest(data)
+    return parse_lovely_toml(data)
+
+
+class ParseCache:
+    """
+    <slots folder>/.modindex.json: what each metadata candidate parsed to.
+    Blob backed files are keyed by hash (their content can't change),
+    loose files by path; both are only trusted while size and mtime match.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.dirty = False
+        self.entries = {}
+        try:
+            with open(path, "r") as f:
+                data = json.load(f)
+            if data.get("version") == INDEX_CACHE_VERSION:
+                self.entries = data.get("files", {})
+        except (OSError, ValueError):
+            pass
+
+    @staticmethod
+    def key(src, entry):
+        return entry.get("hash") or os.path.abspath(src)
+
+    def lookup(self, key, entry):
+        # (True, result) on a hit, result may be None for "no metadata"
+        hit = self.entries.get(key)
+        if hit and hit[0] == entry["size"] and (hit[1] is None or hit[1] == entry["mtime_ns"]):
+            return True, hit[2]
+        return False, None
+
+    def remember(self, key, entry, result):
+        value = [entry["size"], None if entry.get("hash") else entry["mtime_ns"], result]
+        with self.lock:
+            if self.entries.get(key) != value:
+                self.entries[key] = value
+                self.dirty = True
+
+    def prune(self, exists):
+        with self.lock:
+            for key in list(self.entries):
+                if not exists(key):
+                    del self.entries[key]
+                    self.dirty = True
+
+    def save(self):
+        with self.lock:
+            if not self.dirty:
+                return
+            utills.write_json_atomic(self.path, {"version": INDEX_CACHE_VERSION, "files": self.entries}, indent=None)
+            self.dirty = False
+
+
+class ModIndexer:
+    def __init__(self, store, workers=None):
+        self.store = store
+        self.workers = workers or min(8, (os.cpu_count() or 1) + 2)
+        self.cache = ParseCache(os.path.join(store.slots_folder, INDEX_CACHE_NAME))
+
+    def index(self, slot_path, entries=None):
+        """
+        Returns the mods of a slot as a list of records sorted by name:
+        {"id", "name", "version", "author", "priority", "dependencies",
+        "conflicts", "prefix", "provides", "folder", "source",
+        "lovely_patches", "lovely_hooks"}. source is
+        "header", "json", "lovely" (patches only) or "folder" (no metadata).
+        """
+        if entries is None:
+            entries = slotstore.slot_entries(slot_path)
+        candidates = []
+        folders = {}
+        for rel, entry in entries.items():
+            folder = mod_folder(rel)
+            if folder is not None and folder.lower() not in NOT_MODS:
+                folders.setdefault(folder, [])
+            kind = candidate_kind(rel)
+            if kind is not None:
+                candidates.append((rel, kind, entry))
+
+        results = {}
+        misses = []
+        for rel, kind, entry in candidates:
+            src = slotstore.entry_source(self.store, slot_path, rel, entry)
+            key = self.cache.key(src, entry)
+            hit, result = self.cache.lookup(key, entry)
+            if hit:
+                results[rel] = result
+            else:
+                misses.append((rel, kind, entry, src, key))
+
+        def parse(miss):
+            rel, kind, entry, src, key = miss
+            try:
+                result = parse_file(kind, src, entry["size"])
+            except OSError:
+                return rel, None  # missing blob, verify reports those
+            self.cache.remember(key, entry, result)
+            return rel, result
+
+        if len(misses) >= PARALLEL_MIN_FILES and self.workers > 1:
+            with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="modindex") as pool:
+                results.update(pool.map(parse, misses))
+        else:
+            results.update(map(parse, misses))
+
+        # Steamodded mods first, Lovely-only and bare folders fill the gaps
+        lovely = {}
+        for rel, kind, _ in sorted(candidates):
+            result = results.get(rel)
+            if result is None:
+                continue
+            folder = mod_folder(rel)
+            if kind == "lovely":
+                lovely.setdefault(folder, []).append(result)
+            elif folder is None or folder.lower() not in NOT_MODS:
+                folders.setdefault(folder, []).append(result)
+
+        mods = []
+        for folder, records in folders.items():
+            by_id = {}
+            for record in records:
+                # A JSON manifest wins over a header for the same id
+                if record["id"] not in by_id or record["source"] == "json":
+                    by_id[record["id"]] = dict(record, folder=folder)
+            patches = lovely.get(folder, [])
+            if not by_id and folder is not None:
+                first = patches[0] if patches else {}
+                by_id[folder] = {"id": folder, "name": folder, "version": first.get("version"),
+                                 "author": [], "priority": first.get("priority", 0),
+                                 "dependencies": [], "conflicts": [], "prefix": None, "provides": [],
+                                 "source": "lovely" if patches else "folder", "folder": folder}
+            for n, mod in enumerate(by_id.values()):
+                # Patches belong to the folder, they're counted on its first mod
+                mod["lovely_patches"] = sum(p["patches"] for p in patches) if n == 0 else 0
+                mod["lovely_hooks"] = [h for p in patches for h in p.get("hooks", [])] if n == 0 else []
+                mods.append(mod)
+        mods.sort(key=lambda m: (m["name"].lower(), m["id"]))
+        return mods
+
+    def save(self):
+        # New results came in, so files may also have gone: drop entries
+        # whose blob or loose file doesn't exist anymore
+        if self.cache.dirty:
+            self.cache.prune(lambda key: os.path.exists(key if os.path.isabs(key) else self.store.blob_path(key)))
+        self.cache.save()
@@ -0,0 +1,272 @@
+import re
+import bisect
+import tkinter as tk
+from tkinter import ttk
+
+# Slot list widget that only draws the rows on screen, plus an in-memory
+# word index for searching slots by name, tags and description.
+
+_WORD_RE = re.compile(r"\w+")
+
+
+def _words(text):
+    return _WORD_RE.findall(text.lower())
+
+
+class SlotSearchIndex:
+    """
+    Maps every word of a slot's name, tags and description to the slot.
+    Search terms match word prefixes, all terms have to match.
+    """
+
+    def __init__(self):
+        self.words_by_key = {}
+        self.keys_by_word = {}
+        self.sorted_words = []
+        self._last_query = None
+        self._last_result = None
+
+    def add(self, key, name, tags, description):
+        self.remove(key)
+        words = set(_words(name))
+        for tag in tags:
+            words.update(_words(tag))
+        words.update(_words(description))
+        self.words_by_key[key] = words
+        for word in words:
+            keys = self.keys_by_word.get(word)
+            if keys is None:
+                keys = self.keys_by_word[word] = set()
+                bisect.insort(self.sorted_words, word)
+            keys.add(key)
+        self._last_query = None
+
+    def remove(self, key):
+        for word in self.words_by_key.pop(key, ()):
+            keys = self.keys_by_word[word]
+            keys.discard(key)
+            if not keys:
+                del self.keys_by_word[word]
+                i = bisect.bisect_left(self.sorted_words, word)
+                del self.sorted_words[i]
+        self._last_query = None
+
+    def _prefix_keys(self, prefix):
+        found = set()
+        i = bisect.bisect_left(self.sorted_words, prefix)
+        while i < len(self.sorted_words) and self.sorted_words[i].startswith(prefix):
+            found |= self.keys_by_word[self.sorted_words[i]]
+            i += 1
+        return found
+
+    def search(self, query):
+        """
+        Returns the set of matching keys, or None for an empty query.
+        Typing more characters narrows the previous result instead of
+        starting over.
+        """
+        terms = _words(query)
+        if not terms:
+            return None
+        if self._last_query and query.lower().startswith(self._last_query):
+            candidates = self._last_result
+        else:
+            candidates = None
+        for term in terms:
+            matches = self._prefix_keys(term)
+            candidates = matches if candidates is None else candidates & matches
+            if not candidates:
+                break
+        self._last_query = query.lower()
+        self._last_result = candidates
+        return candidates
+
+
+class VirtualListView(tk.Frame):
+    """
+    Listbox replacement that keeps only as many canvas items as there are
+    visible rows. Rows are identified by key; text comes from label_for(key).
+    insert/remove/update_row touch a single row without rebuilding the rest.
+    """
+
+    ROW_HEIGHT = 20
+    PAD_X = 6
+
+    def __init__(self, master, label_for, on_select=None, font=None):
+        super().__init__(master)
+        self.label_for = label_for
+        self.on_select = on_select
+        self.font = font or ("Segoe UI", 10)
+        self.keys = []
+        self._index = {}
+        self._index_dirty = False
+        self.selected = None
+        self.offset = 0
+        self.rows = []  # pool of (rect id, text id) reused while scrolling
+        self.placeholder = None  # text shown while the list is empty
+        self._placeholder_id = None
+        self.colors = {"bg": "#ffffff", "fg": "#000000", "select_bg": "#1a73e8", "select_fg": "#ffffff"}
+
+        self.canvas = tk.Canvas(self, highlightthickness=0, takefocus=1, bd=0)
+        self.scrollbar = ttk.Scrollbar(self, orient=tk.VERTICAL, command=self.yview)
+        self.canvas.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+
+        self.canvas.bind("<Configure>", lambda e: self.redraw())
+        self.canvas.bind("<Button-1>", self._on_click)
+        self.canvas.bind("<MouseWheel>", self._on_wheel)
+        self.canvas.bind("<Button-4>", lambda e: self.yview("scroll", -3, "units"))
+        self.canvas.bind("<Button-5>", lambda e: self.yview("scroll", 3, "units"))
+        self.canvas.bind("<Up>", lambda e: self._move_selection(-1))
+        self.canvas.bind("<Down>", lambda e: self._move_selection(1))
+
+    # --- data --------------------------------------------------------------
+
+    def index_of(self, key):
+        if self._index_dirty:
+            self._index = {k: i for i, k in enumerate(self.keys)}
+            self._index_dirty = False
+        return self._index.get(key)
+
+    def set_items(self, keys):
+        self.keys = list(keys)
+        self._index_dirty = True
+        if self.selected is not None and self.index_of(self.selected) is None:
+            self.selected = None
+        self.offset = min(self.offset, self._max_offset())
+        self.redraw()
+
+    def insert(self, position, key):
+        self.keys.insert(position, key)
+        self._index_dirty = True
+        self.redraw()
+
+    def append(self, key):
+        self.keys.append(key)
+        if not self._index_dirty:
+            self._index[key] = len(self.keys) - 1
+        self.redraw()
+
+    def remove(self, key):
+        i = self.index_of(key)
+        if i is None:
+            return
+        del self.keys[i]
+        self._index_dirty = True
+        if self.selected == key:
+            self.selected = None
+        self.offset = min(self.offset, self._max_offset())
+        self.redraw()
+
+    def update_row(self, key):
+        i = self.index_of(key)
+        if i is not None and self._is_visible(i):
+            self.redraw()
+
+    def select(self, key):
+        self.selected = key
+        self.see(key)
+        self.redraw()
+
+    # --- scrolling ---------------------------------------------------------
+
+    def _view_height(self):
+        return max(1, self.canvas.winfo_height())
+
+    def _max_offset(self):
+        return max(0, len(self.keys) * self.ROW_HEIGHT - self._view_height())
+
+    def _is_visible(self, i):
+        top = self.offset // self.ROW_HEIGHT
+        return top <= i <= top + self._view_height() // self.ROW_HEIGHT + 1
+
+    def yview(self, *args):
+        if args[0] == "moveto":
+            self.offset = int(float(args[1]) * len(self.keys) * self.ROW_HEIGHT)
+        elif args[0] == "scroll":
+            step = self.ROW_HEIGHT if args[2] == "units" else self._view_height()
+            self.offset += int(args[1]) * step
+        self.offset = max(0, min(self.offset, self._max_offset()))
+        self.redraw()
+
+    def see(self, key):
+        i = self.index_of(key)
+        if i is None:
+            return
+        top = i * self.ROW_HEIGHT
+        if top < self.offset:
+            self.offset = top
+        elif top + self.ROW_HEIGHT > self.offset + self._view_height():
+            self.offset = top + self.ROW_HEIGHT - self._view_height()
+
+    def _on_wheel(self, event):
+        # Windows reports multiples of 120, macOS small deltas
+        delta = event.delta // 120 if abs(event.delta) >= 120 else event.delta
+        self.yview("scroll", -delta * 3, "units")
+
+    # --- drawing -----------------------------------------------------------
+
+    def set_placeholder(self, text):
+        self.placeholder = text
+        self.redraw()
+
+    def set_colors(self, bg, fg, select_bg, select_fg=None):
+        self.colors = {"bg": bg, "fg": fg, "select_bg": select_bg, "select_fg": select_fg or fg}
+        self.canvas.configure(bg=bg)
+        self.redraw()
+
+    def redraw(self):
+        height = self._view_height()
+        width = self.canvas.winfo_width()
+        first = self.offset // self.ROW_HEIGHT
+        count = min(len(self.keys) - first, height // self.ROW_HEIGHT + 2)
+        count = max(0, count)
+        while len(self.rows) < count:
+            rect = self.canvas.create_rectangle(0, 0, 0, 0, width=0)
+            text = self.canvas.create_text(0, 0, anchor="w", font=self.font)
+            self.rows.append((rect, text))
+        for n, (rect, text) in enumerate(self.rows):
+            if n >= count:
+                self.canvas.itemconfigure(rect, state="hidden")
+                self.canvas.itemconfigure(text, state="hidden")
+                continue
+            key = self.keys[first + n]
+            y = (first + n) * self.ROW_HEIGHT - self.offset
+            chosen = key == self.selected
+            self.canvas.coords(rect, 0, y, width, y + self.ROW_HEIGHT)
+            self.canvas.itemconfigure(rect, state="normal",
+                                      fill=self.colors["select_bg"] if chosen else self.colors["bg"])
+            self.canvas.coords(text, self.PAD_X, y + self.ROW_HEIGHT // 2)
+            self.canvas.itemconfigure(text, state="normal", text=self.label_for(key),
+                                      fill=self.colors["select_fg"] if chosen else self.colors["fg"])
+        if self._placeholder_id is None:
+            self._placeholder_id = self.canvas.create_text(0, 0, anchor="center", font=self.font)
+        show = self.placeholder and not self.keys
+        self.canvas.coords(self._placeholder_id, width // 2, height // 2)
+        self.canvas.itemconfigure(self._placeholder_id, state="normal" if show else "hidden",
+                                  text=self.placeholder or "", fill=self.colors["fg"])
+        total = len(self.keys) * self.ROW_HEIGHT
+        if total <= height:
+            self.scrollbar.set(0, 1)
+        else:
+            self.scrollbar.set(self.offset / total, (self.offset + height) / total)
+
+    # --- selection ---------------------------------------------------------
+
+    def _on_click(self, event):
+        self.canvas.focus_set()
+        i = (self.offset + event.y) // self.ROW_HEIGHT
+        if 0 <= i < len(self.keys):
+            self.selected = self.keys[i]
+            self.redraw()
+            if self.on_select:
+                self.on_select(self.selected)
+
+    def _move_selection(self, step):
+        if not self.keys:
+            return
+        i = self.index_of(self.selected)
+        i = 0 if i is None else max(0, min(len(self.keys) - 1, i + step))
+        self.select(self.keys[i])
+        if self.on_select:
+            self.on_select(self.selected)
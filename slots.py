@@ -0,0 +1,621 @@
+import os
+import json
+import time
+import shutil
+import contextlib
+from datetime import datetime
+
+import utills
+import slotstore
+import activation
+import catalog
+import modindex
+import conflicts
+import tracing
+import snapshots
+import coldstore
+import launcher
+
+# GUI-free slot operations. BalatroToolApp and the balatrotool CLI both go
+# through SlotLibrary; anything that needs the user raises SlotError instead
+# of asking.
+
+DEFAULT_SLOTS_FOLDER = os.path.join(os.getcwd(), "mod_slots")
+
+
+class SlotError(Exception):
+    pass
+
+
+class ModSlot:
+    def __init__(self, name, path):
+        self.name = name
+        self.path = path
+        self.locked = False
+        self.tags = []
+        self.description = ""
+        self.creation_date = None
+        self.mod_count = 0
+        self.mods = []  # modindex records
+        # loaded = this slot is what's deployed in the game right now (live),
+        # live_mode says how: activation.MODE_COPY or MODE_LINK
+        self.loaded = False
+        self.live_mode = None
+        # cold = its blobs are packed away in .cold/ (see coldstore)
+        self.cold = False
+        self.last_used = None  # time.time() of the last load
+
+    @property
+    def dir_name(self):
+        return os.path.basename(self.path)
+
+    def to_meta(self):
+        return {
+            "name": self.name,
+            "locked": self.locked,
+            "tags": self.tags,
+            "description": self.description,
+            "creation_date": self.creation_date,
+            "mod_count": self.mod_count,
+            "mods": self.mods,
+            "last_used": self.last_used,
+        }
+
+    def apply_meta(self, meta):
+        self.name = meta.get("name", self.name)
+        self.locked = meta.get("locked", False)
+        self.tags = meta.get("tags", [])
+        self.description = meta.get("description", "")
+        self.creation_date = meta.get("creation_date", None)
+        self.mod_count = meta.get("mod_count", 0)
+        self.mods = meta.get("mods", [])
+        self.last_used = meta.get("last_used")
+
+    def save_metadata(self):
+        meta_path = os.path.join(self.path, "metadata.json")
+        with open(meta_path, "w") as f:
+            json.dump(self.to_meta(), f, indent=2)
+
+    def load_metadata(self):
+        meta_path = os.path.join(self.path, "metadata.json")
+        if os.path.exists(meta_path):
+            with open(meta_path, "r") as f:
+                self.apply_meta(json.load(f))
+
+    def set_mods(self, mods):
+        # Only touch metadata.json when the index actually moved
+        if mods != self.mods or len(mods) != self.mod_count or \
+                not os.path.exists(os.path.join(self.path, "metadata.json")):
+            self.mods = mods
+            self.mod_count = len(mods)
+            self.save_metadata()
+
+
+def safe_slot_name(name):
+    return "".join(c for c in name if c.isalnum() or c in (' ', '_', '-')).rstrip()
+
+def now_stamp():
+    return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+
+class SlotLibrary:
+    def __init__(self, slots_folder=DEFAULT_SLOTS_FOLDER):
+        os.makedirs(slots_folder, exist_ok=True)
+        self.folder = slots_folder
+        self.store = slotstore.BlobStore(slots_folder)
+        self.catalog = catalog.SlotCatalog(slots_folder)
+        self.cold = coldstore.ColdStore(self.store)
+        self.launcher = launcher.Launcher(self.store)
+        self._snapshots = None
+        self._indexer = None
+        self._analyses = {}  # dir_name -> [fingerprint, SlotAnalysis, problems]
+        self.snapshot_keep = snapshots.DEFAULT_KEEP  # snapshots kept per slot
+
+    def slot_path(self, dir_name):
+        return os.path.join(self.folder, dir_name)
+
+    def exists(self, dir_name):
+        return os.path.isdir(self.slot_path(dir_name))
+
+    def _read_slot(self, dir_name, live_state):
+        path = self.slot_path(dir_name)
+        slot = ModSlot(dir_name, path)
+        slot.cold = dir_name in self.cold.slots and self.cold.info(dir_name, path) is not None
+        # Only rescan slots that changed since the catalog was written
+        cached = self.catalog.lookup(dir_name, catalog.slot_fingerprint(path))
+        if cached is not None:
+            slot.apply_meta(cached)
+        else:
+            slot.load_metadata()
+            self.index_mods(slot, save=False)
+            self.catalog.update(dir_name, path, slot.to_meta())
+        slot.loaded = dir_name == live_state.get("slot")
+        slot.live_mode = live_state.get("mode", activation.MODE_COPY) if slot.loaded else None
+        return slot
+
+    def list_slots(self):
+        return list(self.iter_slots())
+
+    def iter_slots(self):
+        """
+        Yields slots one by one as they are read, so a caller can show the
+        first ones before the whole folder is scanned. The catalog is
+        pruned and saved once the scan has run to the end.
+        """
+        with tracing.span("slots.list") as sp:
+            seen = set()
+            live_state = activation.read_live_state(self.folder)
+            for fname in os.listdir(self.folder):
+                if fname.startswith("."):
+                    continue  # shared blob store etc.
+                if os.path.isdir(self.slot_path(fname)):
+                    seen.add(fname)
+                    yield self._read_slot(fname, live_state)
+            self.catalog.prune(seen)
+            self._save_indexes()
+            sp.set(slots=len(seen))
+
+    def get(self, dir_name):
+        if dir_name.startswith(".") or not self.exists(dir_name):
+            raise SlotError(f"No slot named '{dir_name}'")
+        slot = self._read_slot(dir_name, activation.read_live_state(self.folder))
+        self._save_indexes()
+        return slot
+
+    @property
+    def indexer(self):
+        # Only built (and its cache read) when a slot actually needs indexing
+        if self._indexer is None:
+            self._indexer = modindex.ModIndexer(self.store)
+        return self._indexer
+
+    def index_mods(self, slot, entries=None, save=True):
+        """
+        Finds the mods in a slot (see modindex) and stores them in its
+        metadata. entries: the slot's manifest files if already at hand.
+        """
+        if slot.cold:
+            return slot.mods  # indexed before it was archived, files can't have moved since
+        with tracing.span("slots.index", slot=slot.dir_name) as sp:
+            mods = self.indexer.index(slot.path, entries)
+            slot.set_mods(mods)
+            if save:
+                self.indexer.save()
+            sp.set(mods=len(mods))
+        return mods
+
+    def analyze(self, slot):
+        """
+        Returns the slot's conflict/dependency problems (see conflicts).
+        Cached per slot; when its files changed only the difference is
+        re-filed into the slot's path index.
+        """
+        with tracing.span("slots.analyze", slot=slot.dir_name) as sp:
+            fingerprint = catalog.slot_fingerprint(slot.path)
+            cached = self._analyses.get(slot.dir_name)
+            if cached is not None and cached[0] == fingerprint:
+                sp.set(cached=True, problems=len(cached[2]))
+                return cached[2]
+            entries = slotstore.slot_entries(slot.path)
+            meta = self.catalog.lookup(slot.dir_name, fingerprint)
+            if meta is not None:
+                slot.mods = meta.get("mods", [])
+            else:
+                # Files moved since the mods were indexed
+                self.index_mods(slot, entries)
+                self.remember(slot)
+            analysis = cached[1] if cached is not None else conflicts.SlotAnalysis()
+            problems = analysis.update(entries, slot.mods)
+            self._analyses[slot.dir_name] = [catalog.slot_fingerprint(slot.path), analysis, problems]
+            sp.set(cached=False, problems=len(problems))
+            return problems
+
+    def _save_indexes(self):
+        self.catalog.save()
+        if self._indexer is not None:
+            self._indexer.save()
+
+    def remember(self, slot):
+        # Keep the catalog in step after a single slot changed
+        self.catalog.update(slot.dir_name, slot.path, slot.to_meta())
+        self.catalog.save()
+
+    def install_files(self, slot, files, replace_prefix=None):
+        """
+        Puts {slot path: file} into a slot (loader updates etc.). With
+        replace_prefix the slot's old files under that folder go first.
+        Returns bytes newly written to the blob store.
+        """
+        drop = None
+        if replace_prefix:
+            prefix = replace_prefix.rstrip("/") + "/"
+            drop = lambda rel: rel.startswith(prefix)
+        self.thaw(slot)
+        with tracing.span("slots.install", slot=slot.dir_name, files=len(files)) as sp:
+            written = slotstore.update_slot(self.store, slot.path, files, drop)
+            self.store.collect_garbage()
+            self.index_mods(slot)
+            self.remember(slot)
+            sp.set(written_bytes=written)
+            return written
+
+    @property
+    def snapshots(self):
+        if self._snapshots is None:
+            self._snapshots = snapshots.SnapshotStore(self.folder)
+        return self._snapshots
+
+    def snapshot_appdata(self, reason, prune=True):
+        """
+        Snapshots the appdata save files under the slot that is deployed
+        right now. Returns the snapshot meta.
+        """
+        slot_name = activation.read_live_state(self.folder).get("slot")
+        with tracing.span("slots.snapshot", slot=slot_name, reason=reason) as sp:
+            try:
+                meta = self.snapshots.take(utills.find_balatro_appdata(), slot_name, reason,
+                                           self.snapshot_keep if prune else None)
+            except snapshots.SnapshotError as e:
+                raise SlotError(str(e))
+            sp.set(files=meta["file_count"], read_bytes=meta["read_bytes"], stored_bytes=meta["stored_bytes"])
+            return meta
+
+    def restore_snapshot(self, snapshot_id):
+        """
+        Puts a snapshot back into appdata, after snapshotting the current
+        state so the restore itself can be undone. Returns (written, removed).
+        """
+        appdata = utills.find_balatro_appdata()
+        with tracing.span("slots.restore_snapshot", snapshot=snapshot_id):
+            try:
+                self.snapshots.load(snapshot_id)
+                # Prune only afterwards, it could drop the snapshot being restored
+                undo = self.snapshot_appdata("before restore", prune=False)
+                result = self.snapshots.restore(snapshot_id, appdata)
+                self.snapshots.prune(undo["slot"], self.snapshot_keep)
+                return result
+            except snapshots.SnapshotError as e:
+                raise SlotError(str(e))
+
+    def live_mods(self, mods_dir):
+        # Mod index records for the live Mods folder, when no slot is deployed
+        appdata = os.path.dirname(mods_dir)
+        entries = {rel: {"hash": None, "size": st.st_size, "mtime_ns": st.st_mtime_ns}
+                   for rel, st in activation.scan_live_mods(mods_dir).items()}
+        mods = self.indexer.index(appdata, entries)
+        self.indexer.save()
+        return mods
+
+    def loaded_slot(self):
+        # The slot that is deployed in the game right now, or None
+        dir_name = activation.read_live_state(self.folder).get("slot")
+        if dir_name and self.exists(dir_name):
+            return self.get(dir_name)
+        return None
+
+    def save_from_live(self, name, exe_path=None, overwrite=False):
+        """
+        Saves the current exe + Mods folder as a slot.
+        Returns (slot, bytes newly written to the blob store).
+        """
+        with tracing.span("slots.save", slot=name) as sp:
+            slot, written = self._save_from_live(name, exe_path, overwrite)
+            sp.set(mods=slot.mod_count, written_bytes=written)
+            return slot, written
+
+    def _save_from_live(self, name, exe_path, overwrite):
+        dir_name = safe_slot_name(name)
+        if not dir_name:
+            raise SlotError("Slot name is empty")
+        slot_path = self.slot_path(dir_name)
+        sources = utills.collect_live_files(exe_path)
+        if not sources:
+            raise SlotError("No Balatro.exe or Mods folder found to save.")
+        existed = os.path.exists(slot_path)
+        if existed and not overwrite:
+            raise SlotError(f"Slot '{dir_name}' exists")
+        # Files go into the shared blob store, the slot only keeps a manifest.
+        # Built in a staging folder so a failed save leaves the old slot alone.
+        staging = self.slot_path(f".save-{dir_name}")
+        if os.path.exists(staging):
+            shutil.rmtree(staging)
+        try:
+            with self.store.writing():
+                written = slotstore.save_slot(self.store, staging, sources)
+                if existed:
+                    shutil.rmtree(slot_path)
+                os.replace(staging, slot_path)
+        except BaseException:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+        if existed:
+            self.store.collect_garbage()
+        slot = ModSlot(dir_name, slot_path)
+        slot.creation_date = now_stamp()
+        self.index_mods(slot)
+        self.remember(slot)
+        return slot, written
+
+    def import_zip(self, zip_path, name, overwrite=False, job=None, workers=None, gc_on_error=True):
+        """
+        Imports a zip as a slot. Safe to run from worker threads/processes;
+        call remember() afterwards from the owner of the catalog.
+        Returns (slot, ziptools.ImportResult).
+        """
+        import ziptools
+        dir_name = safe_slot_name(name)
+        if not dir_name:
+            raise SlotError("Slot name is empty")
+        slot_path = self.slot_path(dir_name)
+        if os.path.exists(slot_path) and not overwrite:
+            raise SlotError(f"Slot '{dir_name}' exists")
+        with tracing.span("slots.import", slot=dir_name, zip_bytes=os.path.getsize(zip_path)) as sp:
+            result = ziptools.import_zip_slot(self.store, zip_path, slot_path, job,
+                                             workers=workers, gc_on_error=gc_on_error)
+            sp.set(files=result.file_count, written_bytes=result.written_bytes,
+                   skipped_bytes=result.skipped_bytes)
+        # The manifest is still at hand, no need to read it back
+        slot = ModSlot(dir_name, slot_path)
+        slot.creation_date = now_stamp()
+        self.index_mods(slot, result.files)
+        return slot, result
+
+    def export_zip(self, slot, export_path, preset=None, job=None, workers=None):
+        import ziptools
+        if preset not in ziptools.EXPORT_PRESETS:
+            preset = ziptools.DEFAULT_PRESET
+        self.thaw(slot, job)
+        with tracing.span("slots.export", slot=slot.dir_name, preset=preset) as sp:
+            count = ziptools.export_slot_zip(self.store, slot.path, export_path, job, preset=preset, workers=workers)
+            sp.set(files=count, zip_bytes=os.path.getsize(export_path))
+            return count
+
+    def export_patch(self, base, target, export_path, preset=None, job=None, workers=None):
+        """
+        Writes a zip that turns `base` into `target`: only the files that
+        differ plus a list of deletions. Returns (changed, deleted) counts.
+        """
+        import ziptools
+        if preset not in ziptools.EXPORT_PRESETS:
+            preset = ziptools.DEFAULT_PRESET
+        self.thaw(base, job)
+        self.thaw(target, job)
+        with tracing.span("slots.export_patch", base=base.dir_name, slot=target.dir_name, preset=preset) as sp:
+            changed, deleted = ziptools.export_patch_zip(self.store, base.path, target.path, export_path, job,
+                                                         preset=preset, workers=workers)
+            sp.set(files=changed, deleted=deleted, zip_bytes=os.path.getsize(export_path))
+            return changed, deleted
+
+    def apply_patch(self, slot, zip_path, job=None, workers=None):
+        """
+        Applies a patch zip from export_patch to a slot in place. The slot
+        must be exactly the patch's base. Returns a ziptools.ImportResult.
+        """
+        import ziptools
+        if slot.locked:
+            raise SlotError(f"Slot '{slot.name}' is locked")
+        self.thaw(slot, job)
+        with tracing.span("slots.apply_patch", slot=slot.dir_name, zip_bytes=os.path.getsize(zip_path)) as sp:
+            result = ziptools.apply_patch_zip(self.store, zip_path, slot.path, job, workers=workers)
+            sp.set(files=result.file_count, written_bytes=result.written_bytes,
+                   skipped_bytes=result.skipped_bytes)
+            self.store.collect_garbage()
+        self.index_mods(slot, result.files)
+        self.remember(slot)
+        return result
+
+    def delete(self, slot, force=False):
+        if slot.locked and not force:
+            raise SlotError(f"Slot '{slot.name}' is locked")
+        with tracing.span("slots.delete", slot=slot.dir_name):
+            shutil.rmtree(slot.path)
+            self.cold.forget(slot.dir_name)
+            self.store.collect_garbage()
+        mods_dir = utills.find_balatro_mods()
+        if mods_dir:
+            activation.forget_materialized(mods_dir, slot.dir_name)
+        self.catalog.forget(slot.dir_name)
+        self.catalog.save()
+        self._analyses.pop(slot.dir_name, None)
+
+    def activate(self, slot, mods_dir, game_dir, mode=activation.MODE_COPY, dry_run=False, snapshot=False,
+                 job=None):
+        """
+        Deploys a slot into the live folders. Link mode falls back to copy
+        mode when folder links can't be made here. With snapshot the save
+        files are snapshotted first (under the slot being switched away from).
+        A dry run leaves an archived slot packed, plan.unpack_bytes tells
+        what the real run unpacks first (with progress on job).
+        Returns (plan, mode actually used); plan is None when a linked slot
+        was already up to date.
+        """
+        # A launch waits for (or refuses during) a real switch
+        with contextlib.nullcontext() if dry_run else self.switching(slot.dir_name):
+            if not dry_run:
+                if snapshot:
+                    self.snapshot_appdata("switch")
+                self.thaw(slot, job)
+            with tracing.span("slots.activate", slot=slot.dir_name, mode=mode, dry_run=dry_run) as sp:
+                plan, mode = self._activate(slot, mods_dir, game_dir, mode, dry_run)
+                sp.set(mode_used=mode)
+                if plan is not None:
+                    sp.set(files=len(plan.copies), deletes=len(plan.deletes),
+                           bytes=plan.bytes_to_copy, backends=plan.backends)
+        if dry_run:
+            if plan is not None:
+                plan.unpack_bytes = self.unpack_bytes(slot)
+        else:
+            # What idle_slots goes by
+            slot.last_used = time.time()
+            slot.save_metadata()
+            self.remember(slot)
+        return plan, mode
+
+    def _activate(self, slot, mods_dir, game_dir, mode, dry_run):
+        if not mods_dir:
+            raise SlotError("Could not find the Balatro appdata folder.")
+        if mode == activation.MODE_LINK:
+            try:
+                plan = activation.activate_slot_linked(self.store, slot.path, slot.dir_name,
+                                                       mods_dir, game_dir, dry_run=dry_run)
+                return plan, mode
+            except activation.LinkNotSupported:
+                mode = activation.MODE_COPY
+        plan = activation.activate_slot(self.store, slot.path, slot.dir_name, mods_dir, game_dir, dry_run=dry_run)
+        return plan, mode
+
+    @contextlib.contextmanager
+    def switching(self, slot_name=None, what="switch"):
+        # Cross-process lock for anything that rewrites the live folders,
+        # see launcher. SlotError if someone else holds it.
+        try:
+            with self.launcher.switching(slot_name, what):
+                yield
+        except launcher.LaunchError as e:
+            raise SlotError(str(e))
+
+    # --- launching ------------------------------------------------------------
+
+    def preflight(self, exe_path, mods_dir):
+        """
+        Checks before starting the game: exe, live folders against the
+        deployed slot, loader, plus the slot's own conflicts. Cached by stat
+        fingerprint, see launcher. Returns (loaded slot or None, problems, cached).
+        """
+        slot = self.loaded_slot()
+        with tracing.span("slots.preflight", slot=slot.dir_name if slot else None) as sp:
+            problems, cached = self.launcher.preflight(exe_path, mods_dir, slot)
+            if slot is not None:
+                problems = problems + self.analyze(slot)
+            sp.set(cached=cached, problems=len(problems))
+        return slot, problems, cached
+
+    def launch(self, exe_path, mods_dir=None, wait=0):
+        """
+        Starts the game for the deployed slot and monitors it. Waits up to
+        `wait` seconds for a slot switch to finish first, SlotError if one
+        is still running. Returns the launcher.GameRun.
+        """
+        slot_name = activation.read_live_state(self.folder).get("slot")
+        with tracing.span("game.launch", exe=exe_path, slot=slot_name) as sp:
+            try:
+                run = self.launcher.launch(exe_path, slot_name, mods_dir, wait)
+            except launcher.LaunchError as e:
+                raise SlotError(str(e))
+            sp.set(pid=run.pid)
+        return run
+
+    def launch_stats(self):
+        # slot dir name -> launch/crash numbers, see Launcher.stats
+        return self.launcher.stats()
+
+    def verify(self, slot, deep=False, workers=None, job=None):
+        """
+        Checks a slot's files against the hashes in its manifest.
+        Returns {"missing": [...], "modified": [...], "extra": [...]}.
+        """
+        return self.verify_many([slot], deep, workers, job)[0][slot.dir_name]
+
+    def verify_many(self, slots, deep=False, workers=None, job=None):
+        """
+        Verifies several slots in one pass over the blob store, shared
+        blobs are hashed once. Without deep, blobs whose stat is unchanged
+        since they were last hashed are not read.
+        Returns ({dir_name: report}, stats), see slotstore.verify_slots.
+        """
+        # Archived slots are checked against their archive, without unpacking
+        cold = [s for s in slots if s.dir_name in self.cold.slots and self.cold.info(s.dir_name, s.path)]
+        hot = [s for s in slots if s not in cold]
+        with tracing.span("slots.verify", slots=len(slots), cold=len(cold), deep=deep) as sp:
+            reports, stats = slotstore.verify_slots(self.store, [s.path for s in hot], deep, workers, job)
+            result = {s.dir_name: reports[s.path] for s in hot}
+            for slot in cold:
+                result[slot.dir_name] = self.cold.verify(slot.dir_name, slot.path, deep)
+            sp.set(**stats)
+        return result, stats
+
+    # --- cold storage ---------------------------------------------------------
+
+    def idle_slots(self, days, slots=None):
+        """
+        Slots neither loaded nor changed in the last `days` days, which
+        freeze() would take. Loose-file slots never qualify.
+        """
+        cutoff = time.time() - days * 86400
+        idle = []
+        for slot in self.list_slots() if slots is None else slots:
+            if slot.cold or slot.loaded:
+                continue
+            try:
+                changed = os.path.getmtime(os.path.join(slot.path, slotstore.MANIFEST_NAME))
+            except OSError:
+                continue
+            if max(slot.last_used or 0, changed) < cutoff:
+                idle.append(slot)
+        return idle
+
+    def freeze(self, slots, job=None, workers=None):
+        """
+        Moves slots to the cold tier (see coldstore): the blobs no hot slot
+        shares are packed into one compressed pack and freed from the
+        store. The loaded slot and loose-file slots are skipped.
+        Returns the slots that were archived.
+        """
+        # Holds the switch lock throughout so no slot gets loaded while its
+        # blobs are on their way out
+        with self.switching(what="archive"):
+            return self._freeze(slots, job, workers)
+
+    def _freeze(self, slots, job, workers):
+        live = activation.read_live_state(self.folder).get("slot")
+        slots = [s for s in slots if s.dir_name != live and s.dir_name not in self.cold.slots
+                 and os.path.exists(os.path.join(s.path, slotstore.MANIFEST_NAME))]
+        if not slots:
+            return []
+        going = {s.dir_name for s in slots}
+        keep = set()
+        for name in os.listdir(self.folder):
+            path = self.slot_path(name)
+            if name.startswith(".") or name in going or not os.path.isdir(path) or \
+                    self.cold.info(name, path) is not None:
+                continue
+            manifest = slotstore.read_manifest(path)
+            if manifest:
+                keep.update(e["hash"] for e in manifest["files"].values())
+        with tracing.span("slots.freeze", slots=len(slots)) as sp:
+            _, pack = self.cold.freeze([(s.dir_name, s.path) for s in slots], keep, job, workers=workers)
+            mods_dir = utills.find_balatro_mods()
+            for slot in slots:
+                slot.cold = True
+                if mods_dir:
+                    activation.forget_materialized(mods_dir, slot.dir_name)
+            freed = self.store.collect_garbage()
+            if pack:
+                sp.set(raw_bytes=pack["raw_bytes"], packed_bytes=pack["packed_bytes"])
+            sp.set(freed_bytes=freed)
+        return slots
+
+    def freeze_idle(self, days, job=None, slots=None):
+        return self.freeze(self.idle_slots(days, slots), job)
+
+    def unpack_bytes(self, slot):
+        # What thaw() would unpack for this slot, worked out from its manifest
+        packed = self.cold.covered(slot.dir_name, slot.path)
+        if not packed:
+            return 0
+        return sum(e["size"] for e in slotstore.slot_entries(slot.path).values()
+                   if e["hash"] in packed and not self.store.has(e["hash"]))
+
+    def thaw(self, slot, job=None):
+        """
+        Unpacks an archived slot's blobs back into the store. Everything
+        that reads a slot's files calls this first; no-op for hot slots.
+        Returns bytes written to the store.
+        """
+        if slot.dir_name not in self.cold.slots:
+            return 0
+        with tracing.span("slots.thaw", slot=slot.dir_name) as sp:
+            written = self.cold.thaw(slot.dir_name, slot.path, job)
+            sp.set(written_bytes=written)
+        slot.cold = False
+        return written
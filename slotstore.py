@@ -0,0 +1,439 @@
+import os
+import json
+import hashlib
+import tempfile
+import threading
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+
+import utills
+
+# Shared object store lives inside the slots folder, every slot just keeps a
+# manifest.json that maps its relative paths to blobs in here. A blob is a
+# whole file: identical files are shared, a file with one changed byte is
+# a new blob (only save-data snapshots store changed blocks, snapshots.py).
+OBJECTS_DIRNAME = ".objects"
+MANIFEST_NAME = "manifest.json"
+METADATA_NAME = "metadata.json"
+HASH_CACHE_NAME = "hashcache.json"
+MANIFEST_VERSION = 1
+CHUNK_SIZE = 1024 * 1024
+# Verification reads big blocks into a reused buffer; hashlib drops the GIL
+# on them, so a few threads keep the disk busy instead of one core
+VERIFY_CHUNK = 8 * 1024 * 1024
+VERIFY_WORKERS = min(8, (os.cpu_count() or 1) * 2)
+
+# Files in a slot folder that belong to the tool, not to the mods
+SLOT_BOOKKEEPING = (METADATA_NAME, MANIFEST_NAME)
+
+
+def new_hasher():
+    return hashlib.sha256()
+
+def hash_file(path, buf=None):
+    # buf: a bytearray to read into, saves an allocation per chunk
+    h = new_hasher()
+    if buf is None:
+        with open(path, "rb") as f:
+            while True:
+                chunk = f.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                h.update(chunk)
+        return h.hexdigest()
+    view = memoryview(buf)
+    with open(path, "rb", buffering=0) as f:
+        while True:
+            n = f.readinto(buf)
+            if not n:
+                break
+            h.update(view[:n])
+    return h.hexdigest()
+
+def hash_stream(fileobj):
+    # (sha256, size) of a readable stream, without keeping its bytes
+    h = new_hasher()
+    size = 0
+    while True:
+        chunk = fileobj.read(CHUNK_SIZE)
+        if not chunk:
+            break
+        h.update(chunk)
+        size += len(chunk)
+    return h.hexdigest(), size
+
+
+class HashCache:
+    """
+    Remembers the hash of a file by (path, size, mtime) so saving the same
+    live files again does not have to read them.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._entries = None
+        self.dirty = False
+        self.lock = threading.RLock()
+
+    @property
+    def entries(self):
+        # Loaded on first use, startup doesn't need it
+        if self._entries is None:
+            with self.lock:
+                if self._entries is None:
+                    self._entries = self._load()
+        return self._entries
+
+    def _load(self):
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, "r") as f:
+                    return json.load(f)
+            except (OSError, ValueError):
+                pass
+        return {}
+
+    def lookup(self, path, st):
+        hit = self.entries.get(os.path.abspath(path))
+        if hit and hit[0] == st.st_size and hit[1] == st.st_mtime_ns:
+            return hit[2]
+        return None
+
+    def remember(self, path, st, digest):
+        key = os.path.abspath(path)
+        value = [st.st_size, st.st_mtime_ns, digest]
+        with self.lock:
+            if self.entries.get(key) != value:
+                self.entries[key] = value
+                self.dirty = True
+
+    def forget(self, digests):
+        # Drops entries for blobs garbage collection has deleted
+        with self.lock:
+            for key, value in list(self.entries.items()):
+                if value[2] in digests:
+                    del self.entries[key]
+                    self.dirty = True
+
+    def save(self):
+        with self.lock:
+            if not self.dirty or self._entries is None:
+                return
+            # Something changed, so files may also have gone: drop entries
+            # for paths that don't exist anymore
+            for key in [key for key in self._entries if not os.path.exists(key)]:
+                del self._entries[key]
+            utills.write_json_atomic(self.path, self.entries, indent=None)
+            self.dirty = False
+
+
+class BlobStore:
+    def __init__(self, slots_folder):
+        self.slots_folder = slots_folder
+        self.root = os.path.join(slots_folder, OBJECTS_DIRNAME)
+        self.tmp_dir = os.path.join(self.root, "tmp")
+        os.makedirs(self.tmp_dir, exist_ok=True)
+        self.hash_cache = HashCache(os.path.join(self.root, HASH_CACHE_NAME))
+        # Background jobs may be adding blobs that no manifest points at yet,
+        # garbage collection waits until they are all finished.
+        self._lock = threading.Lock()
+        self._writers = 0
+        self._gc_pending = False
+        self.cold = None  # coldstore.ColdStore once one is attached
+
+    def blob_path(self, digest):
+        return os.path.join(self.root, digest[:2], digest[2:])
+
+    def has(self, digest):
+        return os.path.exists(self.blob_path(digest))
+
+    def _publish(self, tmp_path, digest):
+        dest = self.blob_path(digest)
+        if os.path.exists(dest):
+            os.remove(tmp_path)
+            return False
+        os.makedirs(os.path.dirname(dest), exist_ok=True)
+        os.replace(tmp_path, dest)
+        # Hashed just now, so a quick verify can trust it while its stat holds
+        self.hash_cache.remember(dest, os.stat(dest), digest)
+        return True
+
+    def add_file(self, src):
+        """
+        Stores src if its content is not already in the store.
+        Returns (digest, size, mtime_ns, bytes_written).
+        """
+        st = os.stat(src)
+        digest = self.hash_cache.lookup(src, st)
+        if digest is None:
+            digest = hash_file(src)
+            self.hash_cache.remember(src, st, digest)
+        written = 0
+        if not self.has(digest):
+            fd, tmp = tempfile.mkstemp(dir=self.tmp_dir)
+            os.close(fd)
+            utills.fast_copy(src, tmp)
+            if self._publish(tmp, digest):
+                written = st.st_size
+        return digest, st.st_size, st.st_mtime_ns, written
+
+    def add_stream(self, fileobj):
+        """
+        Hashes and stores a readable stream in one pass.
+        Returns (digest, size, bytes_written).
+        """
+        h = new_hasher()
+        size = 0
+        fd, tmp = tempfile.mkstemp(dir=self.tmp_dir)
+        try:
+            with os.fdopen(fd, "wb") as out:
+                while True:
+                    chunk = fileobj.read(CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    h.update(chunk)
+                    out.write(chunk)
+                    size += len(chunk)
+        except BaseException:
+            os.remove(tmp)
+            raise
+        digest = h.hexdigest()
+        written = size if self._publish(tmp, digest) else 0
+        return digest, size, written
+
+    @contextmanager
+    def writing(self):
+        # Wrap any work that adds blobs before its manifest is written
+        with self._lock:
+            self._writers += 1
+        try:
+            yield self
+        finally:
+            with self._lock:
+                self._writers -= 1
+                run_gc = self._writers == 0 and self._gc_pending
+            if run_gc:
+                self.collect_garbage()
+
+    def collect_garbage(self):
+        """
+        Deletes blobs no slot manifest points at anymore.
+        Returns the number of bytes freed (0 if deferred because a writer
+        is still busy, it then runs when the last writer finishes).
+        """
+        with self._lock:
+            if self._writers:
+                self._gc_pending = True
+                return 0
+            self._gc_pending = False
+            return self._collect_garbage()
+
+    def _collect_garbage(self):
+        referenced = set()
+        for name in os.listdir(self.slots_folder):
+            slot_path = os.path.join(self.slots_folder, name)
+            if name.startswith(".") or not os.path.isdir(slot_path):
+                continue
+            manifest = read_manifest(slot_path)
+            if manifest:
+                # Blobs an archived slot has packed may go, it can unpack them again
+                covered = self.cold.covered(name, slot_path) if self.cold is not None else ()
+                referenced.update(e["hash"] for e in manifest["files"].values() if e["hash"] not in covered)
+        freed = 0
+        collected = set()
+        for prefix in os.listdir(self.root):
+            prefix_dir = os.path.join(self.root, prefix)
+            if len(prefix) != 2 or not os.path.isdir(prefix_dir):
+                continue
+            for rest in os.listdir(prefix_dir):
+                if prefix + rest not in referenced:
+                    blob = os.path.join(prefix_dir, rest)
+                    freed += os.path.getsize(blob)
+                    os.remove(blob)
+                    collected.add(prefix + rest)
+        if collected:
+            self.hash_cache.forget(collected)
+            self.hash_cache.save()
+        return freed
+
+
+def read_manifest(slot_path):
+    path = os.path.join(slot_path, MANIFEST_NAME)
+    if not os.path.exists(path):
+        return None
+    with open(path, "r") as f:
+        return json.load(f)
+
+def write_manifest(slot_path, files):
+    utills.write_json_atomic(
+        os.path.join(slot_path, MANIFEST_NAME),
+        {"version": MANIFEST_VERSION, "files": files},
+        indent=None,
+    )
+
+def slot_entries(slot_path):
+    """
+    Returns {relative path: entry} for a slot. Manifest slots point at blobs
+    by hash; older slots that still hold loose files get entries with
+    hash None that point at the file itself.
+    """
+    manifest = read_manifest(slot_path)
+    if manifest is not None:
+        return manifest["files"]
+    entries = {}
+    for root, _, files in os.walk(slot_path):
+        for name in files:
+            full = os.path.join(root, name)
+            rel = os.path.relpath(full, slot_path).replace(os.sep, "/")
+            if rel in SLOT_BOOKKEEPING:
+                continue
+            st = os.stat(full)
+            entries[rel] = {"hash": None, "size": st.st_size, "mtime_ns": st.st_mtime_ns}
+    return entries
+
+def entry_source(store, slot_path, rel, entry):
+    # Where the bytes for a slot entry actually live on disk
+    if entry.get("hash"):
+        return store.blob_path(entry["hash"])
+    return os.path.join(slot_path, *rel.split("/"))
+
+def save_slot(store, slot_path, sources):
+    """
+    Stores {relative path: source file} as the content of slot_path.
+    Only files whose content is not in the store yet get copied, each of
+    them in full.
+    Returns the number of bytes written to the store.
+    """
+    os.makedirs(slot_path, exist_ok=True)
+    files = {}
+    written = 0
+    with store.writing():
+        try:
+            for rel, src in sources.items():
+                digest, size, mtime_ns, n = store.add_file(src)
+                files[rel] = {"hash": digest, "size": size, "mtime_ns": mtime_ns}
+                written += n
+        finally:
+            store.hash_cache.save()
+        write_manifest(slot_path, files)
+    return written
+
+def update_slot(store, slot_path, sources, drop=None):
+    """
+    Adds or replaces {relative path: source file} in an existing slot.
+    Entries for which drop(rel) is true are removed. Loose-file slots get
+    their remaining files moved onto the blob store on the way.
+    Returns the number of bytes written to the store.
+    """
+    files = {}
+    written = 0
+    with store.writing():
+        try:
+            for rel, entry in slot_entries(slot_path).items():
+                if rel in sources or (drop and drop(rel)):
+                    continue
+                if entry.get("hash"):
+                    files[rel] = entry
+                    continue
+                digest, size, mtime_ns, n = store.add_file(entry_source(store, slot_path, rel, entry))
+                files[rel] = {"hash": digest, "size": size, "mtime_ns": mtime_ns}
+                written += n
+            for rel, src in sources.items():
+                digest, size, mtime_ns, n = store.add_file(src)
+                files[rel] = {"hash": digest, "size": size, "mtime_ns": mtime_ns}
+                written += n
+        finally:
+            store.hash_cache.save()
+        write_manifest(slot_path, files)
+    return written
+
+def verify_slots(store, slot_paths, deep=False, workers=None, job=None):
+    """
+    Checks slots against their manifests. Each blob is checked once even if
+    several slots share it; a blob whose size and mtime still match the
+    last time it was hashed is trusted unless deep is set.
+    Returns ({slot_path: {"missing", "modified", "extra"}}, stats) where
+    the lists hold slot paths (extra: stray files in the slot folder) and
+    stats counts the files and bytes actually hashed.
+    Loose-file slots have no recorded hashes, they only get "extra" empty
+    and "legacy": True.
+    """
+    reports = {}
+    blobs = {}  # digest -> (size, [(slot_path, rel)])
+    for slot_path in slot_paths:
+        report = reports[slot_path] = {"missing": [], "modified": [], "extra": []}
+        manifest = read_manifest(slot_path)
+        if manifest is None:
+            report["legacy"] = True
+            continue
+        for name in os.listdir(slot_path):
+            if name not in SLOT_BOOKKEEPING:
+                report["extra"].append(name)
+        for rel, entry in manifest["files"].items():
+            blobs.setdefault(entry["hash"], (entry["size"], []))[1].append((slot_path, rel))
+
+    stats = {"blobs": len(blobs), "hashed_files": 0, "hashed_bytes": 0, "trusted_files": 0}
+    to_hash = []
+    for digest, (size, users) in blobs.items():
+        path = store.blob_path(digest)
+        try:
+            st = os.stat(path)
+        except OSError:
+            for slot_path, rel in users:
+                reports[slot_path]["missing"].append(rel)
+            continue
+        if st.st_size != size:
+            for slot_path, rel in users:
+                reports[slot_path]["modified"].append(rel)
+        elif not deep and store.hash_cache.lookup(path, st) == digest:
+            stats["trusted_files"] += 1
+        else:
+            to_hash.append((digest, path, st, users))
+
+    # Biggest first so one huge blob doesn't end up last on a single thread
+    to_hash.sort(key=lambda item: item[2].st_size, reverse=True)
+    if job:
+        job.report(0, sum(st.st_size for _, _, st, _ in to_hash))
+    buffers = threading.local()
+    lock = threading.Lock()
+
+    def check(item):
+        digest, path, st, users = item
+        if job:
+            job.check_cancelled()
+        buf = getattr(buffers, "buf", None)
+        if buf is None:
+            buf = buffers.buf = bytearray(VERIFY_CHUNK)
+        try:
+            actual = hash_file(path, buf)
+        except OSError:
+            actual = None  # vanished or unreadable (quarantined) since the stat
+        with lock:
+            stats["hashed_files"] += 1
+            stats["hashed_bytes"] += st.st_size
+            if actual is None:
+                for slot_path, rel in users:
+                    reports[slot_path]["missing"].append(rel)
+            elif actual != digest:
+                for slot_path, rel in users:
+                    reports[slot_path]["modified"].append(rel)
+        if actual is not None:
+            store.hash_cache.remember(path, st, actual)
+        if job:
+            job.add_progress(st.st_size)
+
+    workers = max(1, min(workers or VERIFY_WORKERS, len(to_hash) or 1))
+    try:
+        if workers == 1:
+            for item in to_hash:
+                check(item)
+        else:
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="verify") as pool:
+                for future in [pool.submit(check, item) for item in to_hash]:
+                    future.result()
+    finally:
+        store.hash_cache.save()
+    for report in reports.values():
+        for key in ("missing", "modified", "extra"):
+            report[key].sort()
+    return reports, stats
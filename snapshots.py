@@ -0,0 +1,303 @@
+import os
+import json
+import time
+import zlib
+import hashlib
+import tempfile
+import threading
+
+import utills
+import activation
+
+# Snapshots of the Balatro appdata folder (save profiles, settings), kept
+# per slot. A snapshot is a recipe per file: a list of chunks in a shared
+# chunk store. New content is matched against the previous snapshot's
+# blocks with an rsync style rolling checksum, so only changed blocks are
+# stored and a snapshot costs about the size of what changed. Restoring
+# just concatenates chunks, there's no delta chain to replay.
+
+SNAPSHOTS_DIRNAME = ".snapshots"
+CHUNKS_DIRNAME = "chunks"
+BLOCK_SIZE = 4 * 1024
+DEFAULT_KEEP = 20
+# Top level appdata entries that are not save data: the mods themselves
+# (slots handle those), loader logs/dumps and our own link bookkeeping.
+EXCLUDE = {utills.MODS_DIRNAME.lower(), "lovely", activation.MATERIALIZED_DIRNAME,
+           activation.ORIGINAL_MODS_NAME.lower()}
+_ADLER_MOD = 65521
+
+
+class SnapshotError(Exception):
+    pass
+
+
+def scan_appdata(appdata):
+    """
+    Returns {relative path: os.stat_result} of the files a snapshot covers.
+    """
+    files = {}
+    for name in os.listdir(appdata):
+        if name.lower() in EXCLUDE or name.startswith("."):
+            continue
+        top = os.path.join(appdata, name)
+        if os.path.islink(top):
+            continue
+        if os.path.isfile(top):
+            files[name] = os.stat(top)
+            continue
+        for root, dirs, names in os.walk(top):
+            for fname in names:
+                full = os.path.join(root, fname)
+                rel = os.path.relpath(full, appdata).replace(os.sep, "/")
+                files[rel] = os.stat(full)
+    return files
+
+
+def delta_chunks(data, base_blocks):
+    """
+    Splits data into chunks, reusing blocks of the previous version where
+    they occur anywhere in data (not only at the same offset).
+    base_blocks: {adler32: {sha256: length}} of full size blocks.
+    Yields (sha256 or None, bytes or None, length, weak); bytes is only
+    set for new content that still has to be stored.
+    """
+    n = len(data)
+    pos = 0
+    literal_start = 0
+
+    def literal(end):
+        # New content, cut into BLOCK_SIZE chunks so the next snapshot can match them
+        for start in range(literal_start, end, BLOCK_SIZE):
+            piece = data[start:min(start + BLOCK_SIZE, end)]
+            yield None, piece, len(piece), zlib.adler32(piece)
+
+    if not base_blocks:
+        pos = n
+    weak = None
+    while pos + BLOCK_SIZE <= n:
+        if weak is None:
+            weak = zlib.adler32(data[pos:pos + BLOCK_SIZE])
+        candidates = base_blocks.get(weak)
+        if candidates:
+            digest = hashlib.sha256(data[pos:pos + BLOCK_SIZE]).hexdigest()
+            if digest in candidates:
+                yield from literal(pos)
+                yield digest, None, BLOCK_SIZE, weak
+                pos += BLOCK_SIZE
+                literal_start = pos
+                weak = None
+                continue
+        # Roll the window one byte: drop data[pos], take data[pos + BLOCK_SIZE]
+        if pos + BLOCK_SIZE < n:
+            out_byte = data[pos]
+            in_byte = data[pos + BLOCK_SIZE]
+            a = weak & 0xFFFF
+            b = weak >> 16
+            a = (a - out_byte + in_byte) % _ADLER_MOD
+            b = (b - BLOCK_SIZE * out_byte + a - 1) % _ADLER_MOD
+            weak = (b << 16) | a
+        pos += 1
+    yield from literal(n)
+
+
+class SnapshotStore:
+    def __init__(self, slots_folder):
+        self.root = os.path.join(slots_folder, SNAPSHOTS_DIRNAME)
+        self.chunks_dir = os.path.join(self.root, CHUNKS_DIRNAME)
+        os.makedirs(self.chunks_dir, exist_ok=True)
+        self.lock = threading.Lock()
+
+    # --- storage -----------------------------------------------------------
+
+    def chunk_path(self, digest):
+        return os.path.join(self.chunks_dir, digest[:2], digest[2:])
+
+    def _put_chunk(self, data):
+        digest = hashlib.sha256(data).hexdigest()
+        path = self.chunk_path(digest)
+        if os.path.exists(path):
+            return digest, 0
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=self.chunks_dir, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+        return digest, len(data)
+
+    def _slot_dir(self, slot_name):
+        return os.path.join(self.root, utills.safe_filename(slot_name or utills.NO_SLOT) or utills.NO_SLOT)
+
+    def list(self, slot_name=None):
+        """
+        Snapshot summaries, newest first. Without slot_name all slots.
+        """
+        result = []
+        for name in sorted(os.listdir(self.root)):
+            folder = os.path.join(self.root, name)
+            if name == CHUNKS_DIRNAME or not os.path.isdir(folder):
+                continue
+            if slot_name is not None and folder != self._slot_dir(slot_name):
+                continue
+            for fname in os.listdir(folder):
+                if fname.endswith(".json"):
+                    meta = self._read(os.path.join(folder, fname))
+                    if meta:
+                        meta.pop("files", None)
+                        result.append(meta)
+        result.sort(key=lambda m: m["created"], reverse=True)
+        return result
+
+    def _read(self, path):
+        try:
+            with open(path, "r") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def load(self, snapshot_id):
+        slot_key, _, stamp = snapshot_id.partition("/")
+        meta = None
+        if slot_key and stamp and ".." not in snapshot_id and "/" not in stamp and slot_key != CHUNKS_DIRNAME:
+            meta = self._read(os.path.join(self.root, slot_key, stamp + ".json"))
+        if meta is None:
+            raise SnapshotError(f"No snapshot '{snapshot_id}'")
+        return meta
+
+    def _latest(self, slot_name):
+        snaps = self.list(slot_name)
+        return self.load(snaps[0]["id"]) if snaps else None
+
+    # --- snapshot / restore ------------------------------------------------
+
+    def take(self, appdata, slot_name, reason, keep=DEFAULT_KEEP):
+        """
+        Snapshots appdata under slot_name. Files whose size and mtime match
+        the previous snapshot are not even read. Returns the snapshot meta
+        (stored_bytes = bytes that actually had to be written).
+        """
+        if not appdata or not os.path.isdir(appdata):
+            raise SnapshotError("Could not find the Balatro appdata folder.")
+        with self.lock:
+            # Every slot shares the one appdata folder, so the newest
+            # snapshot of any slot is the best base
+            previous = self._latest(None)
+            prev_files = previous["files"] if previous else {}
+            files = {}
+            stored = 0
+            read = 0
+            for rel, st in scan_appdata(appdata).items():
+                old = prev_files.get(rel)
+                if old and old["size"] == st.st_size and old["mtime_ns"] == st.st_mtime_ns:
+                    files[rel] = old
+                    continue
+                with open(os.path.join(appdata, *rel.split("/")), "rb") as f:
+                    data = f.read()
+                read += len(data)
+                base = {}
+                for digest, length, weak in (old or {}).get("chunks", []):
+                    if length == BLOCK_SIZE:
+                        base.setdefault(weak, {})[digest] = length
+                chunks = []
+                for digest, piece, length, weak in delta_chunks(data, base):
+                    if piece is not None:
+                        digest, written = self._put_chunk(piece)
+                        stored += written
+                    chunks.append([digest, length, weak])
+                files[rel] = {"size": len(data), "mtime_ns": st.st_mtime_ns, "chunks": chunks}
+
+            created = time.time()
+            stamp = time.strftime("%Y%m%d-%H%M%S", time.localtime(created)) + f"-{int(created * 1000) % 1000:03d}"
+            folder = self._slot_dir(slot_name)
+            os.makedirs(folder, exist_ok=True)
+            meta = {
+                "id": f"{os.path.basename(folder)}/{stamp}",
+                "slot": slot_name,
+                "reason": reason,
+                "created": created,
+                "file_count": len(files),
+                "total_bytes": sum(e["size"] for e in files.values()),
+                "read_bytes": read,
+                "stored_bytes": stored,
+                "files": files,
+            }
+            utills.write_json_atomic(os.path.join(folder, stamp + ".json"), meta, indent=None)
+            if keep:
+                self._prune(folder, keep)
+            return meta
+
+    def restore(self, snapshot_id, appdata):
+        """
+        Makes appdata match a snapshot: changed files are rewritten, files
+        the snapshot doesn't have are removed. Files that already match by
+        size and mtime are left alone. Returns (written, removed) counts.
+        """
+        meta = self.load(snapshot_id)
+        with self.lock:
+            current = scan_appdata(appdata)
+            written = 0
+            for rel, entry in meta["files"].items():
+                st = current.get(rel)
+                if st and st.st_size == entry["size"] and st.st_mtime_ns == entry["mtime_ns"]:
+                    continue
+                dest = os.path.join(appdata, *rel.split("/"))
+                os.makedirs(os.path.dirname(dest), exist_ok=True)
+                fd, tmp = tempfile.mkstemp(dir=os.path.dirname(dest), suffix=".bt-restore")
+                try:
+                    with os.fdopen(fd, "wb") as f:
+                        for digest, _, _ in entry["chunks"]:
+                            with open(self.chunk_path(digest), "rb") as chunk:
+                                f.write(chunk.read())
+                    os.utime(tmp, ns=(entry["mtime_ns"], entry["mtime_ns"]))
+                    os.replace(tmp, dest)
+                except BaseException:
+                    if os.path.exists(tmp):
+                        os.remove(tmp)
+                    raise
+                written += 1
+            removed = 0
+            for rel in current:
+                if rel not in meta["files"]:
+                    os.remove(os.path.join(appdata, *rel.split("/")))
+                    removed += 1
+        return written, removed
+
+    # --- cleanup -----------------------------------------------------------
+
+    def prune(self, slot_name, keep):
+        # Keeps the newest `keep` snapshots of a slot, frees unused chunks
+        with self.lock:
+            folder = self._slot_dir(slot_name)
+            if os.path.isdir(folder):
+                self._prune(folder, keep)
+
+    def _prune(self, folder, keep):
+        names = sorted(f for f in os.listdir(folder) if f.endswith(".json"))
+        if len(names) <= keep:
+            return
+        for fname in names[:-keep]:
+            os.remove(os.path.join(folder, fname))
+        self._collect_garbage()
+
+    def _collect_garbage(self):
+        # Drop chunks no remaining snapshot refers to
+        referenced = set()
+        for name in os.listdir(self.root):
+            folder = os.path.join(self.root, name)
+            if name == CHUNKS_DIRNAME or not os.path.isdir(folder):
+                continue
+            for fname in os.listdir(folder):
+                meta = self._read(os.path.join(folder, fname)) if fname.endswith(".json") else None
+                if meta:
+                    for entry in meta["files"].values():
+                        referenced.update(c[0] for c in entry["chunks"])
+        freed = 0
+        for prefix in os.listdir(self.chunks_dir):
+            prefix_dir = os.path.join(self.chunks_dir, prefix)
+            if len(prefix) != 2 or not os.path.isdir(prefix_dir):
+                continue
+            for rest in os.listdir(prefix_dir):
+                if prefix + rest not in referenced:
+                    path = os.path.join(prefix_dir, rest)
+                    freed += os.path.getsize(path)
+                    os.remove(path)
+        return freed
@@ -0,0 +1,102 @@
+import os
+
+import activation
+import slotstore
+
+
+def write(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(data)
+    return path
+
+
+def read(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def make_slot(store, tmp_path, name, files):
+    sources = {rel: write(str(tmp_path / "src" / name / rel), data) for rel, data in files.items()}
+    slot = str(tmp_path / "slots" / name)
+    slotstore.save_slot(store, slot, sources)
+    return slot
+
+
+def setup(tmp_path):
+    store = slotstore.BlobStore(str(tmp_path / "slots"))
+    mods_dir = str(tmp_path / "appdata" / "Mods")
+    game_dir = str(tmp_path / "game")
+    os.makedirs(mods_dir)
+    os.makedirs(game_dir)
+    return store, mods_dir, game_dir
+
+
+def test_activate_copies_slot_into_live_folders(tmp_path):
+    store, mods_dir, game_dir = setup(tmp_path)
+    slot = make_slot(store, tmp_path, "one", {"Mods/a/main.lua": b"a", "version.dll": b"dll"})
+
+    plan = activation.activate_slot(store, slot, "one", mods_dir, game_dir)
+
+    assert len(plan.copies) == 2
+    assert read(os.path.join(mods_dir, "a", "main.lua")) == b"a"
+    assert read(os.path.join(game_dir, "version.dll")) == b"dll"
+    assert activation.read_live_state(store.slots_folder)["slot"] == "one"
+
+
+def test_switch_only_touches_differences(tmp_path):
+    store, mods_dir, game_dir = setup(tmp_path)
+    one = make_slot(store, tmp_path, "one", {"Mods/a/main.lua": b"a", "Mods/shared/x.lua": b"x",
+                                             "version.dll": b"dll"})
+    two = make_slot(store, tmp_path, "two", {"Mods/b/main.lua": b"b", "Mods/shared/x.lua": b"x"})
+    activation.activate_slot(store, one, "one", mods_dir, game_dir)
+
+    plan = activation.activate_slot(store, two, "two", mods_dir, game_dir)
+
+    assert [rel for _, rel, _, _, _ in plan.copies] == ["Mods/b/main.lua"]
+    assert sorted(rel for rel, _ in plan.deletes) == ["Mods/a/main.lua", "version.dll"]
+    assert plan.unchanged == 1
+    assert not os.path.exists(os.path.join(mods_dir, "a"))
+    assert not os.path.exists(os.path.join(game_dir, "version.dll"))
+    assert read(os.path.join(mods_dir, "b", "main.lua")) == b"b"
+
+
+def test_activating_the_same_slot_again_copies_nothing(tmp_path):
+    store, mods_dir, game_dir = setup(tmp_path)
+    slot = make_slot(store, tmp_path, "one", {"Mods/a/main.lua": b"a" * 100})
+    activation.activate_slot(store, slot, "one", mods_dir, game_dir)
+
+    plan = activation.activate_slot(store, slot, "one", mods_dir, game_dir)
+    assert plan.copies == [] and plan.deletes == []
+    assert plan.bytes_to_copy == 0
+
+
+def test_edited_live_file_is_replaced(tmp_path):
+    store, mods_dir, game_dir = setup(tmp_path)
+    slot = make_slot(store, tmp_path, "one", {"Mods/a/main.lua": b"original"})
+    activation.activate_slot(store, slot, "one", mods_dir, game_dir)
+    live = os.path.join(mods_dir, "a", "main.lua")
+    write(live, b"modified")
+
+    plan = activation.activate_slot(store, slot, "one", mods_dir, game_dir)
+    assert [op for op, _, _, _, _ in plan.copies] == ["replace"]
+    assert read(live) == b"original"
+    # The store's copy is untouched by the live edit
+    assert read(store.blob_path(slotstore.hash_file(live))) == b"original"
+
+
+def test_dry_run_writes_nothing(tmp_path):
+    store, mods_dir, game_dir = setup(tmp_path)
+    slot = make_slot(store, tmp_path, "one", {"Mods/a/main.lua": b"a" * 10})
+
+    plan = activation.activate_slot(store, slot, "one", mods_dir, game_dir, dry_run=True)
+
+    assert plan.bytes_to_copy == 10
+    assert os.listdir(mods_dir) == []
+    assert not os.path.exists(os.path.join(store.slots_folder, activation.LIVE_STATE_NAME))
+
+
+def test_paths_outside_live_folders_are_skipped(tmp_path):
+    assert activation.live_path("Mods/../../evil.lua", "/mods", "/game") is None
+    assert activation.live_path("sub/evil.dll", "/mods", "/game") is None
+    assert activation.live_path("Mods/a/main.lua", "/mods", "/game") == os.path.join("/mods", "a", "main.lua")
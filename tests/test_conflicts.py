@@ -0,0 +1,67 @@
+import conflicts
+
+
+def mod(mod_id, version=None, **extra):
+    record = {"id": mod_id, "name": mod_id, "version": version, "folder": extra.pop("folder", mod_id)}
+    record.update(extra)
+    return record
+
+
+def kinds(problems):
+    return sorted(p["kind"] for p in problems)
+
+
+def test_parse_dependency():
+    assert conflicts.parse_dependency("Talisman (>=2.0) | Cryptid") == [
+        ("Talisman", [(">=", "2.0")]), ("Cryptid", [])]
+    assert conflicts.parse_dependency("Steamodded>=1.0.0~ALPHA") == [("Steamodded", [(">=", "1.0.0~ALPHA")])]
+    assert conflicts.parse_dependency("Foo (>=1.0) (<<2.0)") == [("Foo", [(">=", "1.0"), ("<<", "2.0")])]
+
+
+def test_satisfies():
+    assert conflicts.satisfies("1.2.0", [(">=", "1.0")])
+    assert not conflicts.satisfies("0.9", [(">=", "1.0")])
+    assert conflicts.satisfies("v1.0.0~ALPHA-0812d", [(">=", "1.0.0~BETA")])
+    assert not conflicts.satisfies("2.0", [(">=", "1.0"), ("<<", "2.0")])
+    # Nothing to compare against: don't report a problem
+    assert conflicts.satisfies(None, [(">=", "1.0")])
+
+
+def test_clean_slot_has_no_problems():
+    mods = [mod("Steamodded", "1.0.0"), mod("Talisman", "2.1", dependencies=["Steamodded (>=1.0)"])]
+    assert conflicts.check_mods(mods) == []
+
+
+def test_missing_and_mismatched_dependencies():
+    mods = [mod("Steamodded", "0.9"),
+            mod("A", dependencies=["Steamodded (>=1.0)"]),
+            mod("B", dependencies=["Nope"]),
+            mod("C", dependencies=["Nope | Steamodded"])]
+    assert kinds(conflicts.check_mods(mods)) == ["missing_dependency", "version_mismatch"]
+
+
+def test_lovely_dependency_is_implicit():
+    assert conflicts.check_mods([mod("A", dependencies=["lovely"])]) == []
+
+
+def test_provides_satisfies_dependency():
+    mods = [mod("Fork", "1.0", provides=["Talisman (2.0)"]), mod("A", dependencies=["Talisman"])]
+    assert conflicts.check_mods(mods) == []
+
+
+def test_duplicates_conflicts_and_cycles():
+    mods = [mod("A", folder="A1", prefix="x", dependencies=["B"]),
+            mod("A", folder="A2"),
+            mod("B", prefix="X", dependencies=["A"]),
+            mod("C", conflicts=["B"])]
+    found = kinds(conflicts.check_mods(mods))
+    assert found == ["declared_conflict", "dependency_cycle", "duplicate_id", "duplicate_prefix"]
+    assert all(p["severity"] == conflicts.ERROR for p in conflicts.check_mods(mods))
+
+
+def test_lovely_patch_overlap_is_a_warning():
+    hook = ("pattern", "game.lua", "self.foo = 1")
+    mods = [mod("A", lovely_hooks=[hook]), mod("B", lovely_hooks=[hook])]
+    problems = conflicts.check_mods(mods)
+    assert kinds(problems) == ["patch_overlap"]
+    assert not conflicts.has_errors(problems)
@@ -0,0 +1,78 @@
+import os
+
+import slotstore
+
+
+def write(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(data)
+    return path
+
+
+def test_identical_files_are_stored_once(tmp_path):
+    store = slotstore.BlobStore(str(tmp_path / "slots"))
+    a = write(str(tmp_path / "src" / "a.lua"), b"same" * 100)
+    b = write(str(tmp_path / "src" / "b.lua"), b"same" * 100)
+
+    first = slotstore.save_slot(store, str(tmp_path / "slots" / "one"), {"Mods/a.lua": a})
+    second = slotstore.save_slot(store, str(tmp_path / "slots" / "two"), {"Mods/b.lua": b, "Mods/a.lua": a})
+
+    assert first == 400
+    assert second == 0
+    one = slotstore.read_manifest(str(tmp_path / "slots" / "one"))["files"]
+    two = slotstore.read_manifest(str(tmp_path / "slots" / "two"))["files"]
+    assert one["Mods/a.lua"]["hash"] == two["Mods/b.lua"]["hash"]
+    with open(store.blob_path(one["Mods/a.lua"]["hash"]), "rb") as f:
+        assert f.read() == b"same" * 100
+
+
+def test_resave_writes_only_changed_files(tmp_path):
+    store = slotstore.BlobStore(str(tmp_path / "slots"))
+    slot = str(tmp_path / "slots" / "one")
+    sources = {f"Mods/{i}.lua": write(str(tmp_path / "src" / f"{i}.lua"), bytes([i]) * 1000) for i in range(10)}
+    slotstore.save_slot(store, slot, sources)
+
+    write(sources["Mods/3.lua"], b"changed")
+    assert slotstore.save_slot(store, slot, sources) == len(b"changed")
+
+
+def test_garbage_collection_keeps_referenced_blobs(tmp_path):
+    store = slotstore.BlobStore(str(tmp_path / "slots"))
+    keep = write(str(tmp_path / "src" / "keep.lua"), b"keep")
+    drop = write(str(tmp_path / "src" / "drop.lua"), b"drop")
+    slotstore.save_slot(store, str(tmp_path / "slots" / "one"), {"Mods/keep.lua": keep})
+    digest, _, _, _ = store.add_file(drop)
+    store.hash_cache.save()
+
+    assert store.collect_garbage() == len(b"drop")
+    assert not store.has(digest)
+    assert store.has(slotstore.hash_file(keep))
+    assert all(value[2] != digest for value in store.hash_cache.entries.values())
+
+
+def test_garbage_collection_waits_for_writers(tmp_path):
+    store = slotstore.BlobStore(str(tmp_path / "slots"))
+    src = write(str(tmp_path / "src" / "new.lua"), b"not in a manifest yet")
+    with store.writing():
+        digest, _, _, _ = store.add_file(src)
+        assert store.collect_garbage() == 0
+        assert store.has(digest)
+    # Runs once the last writer is done
+    assert not store.has(digest)
+
+
+def test_verify_finds_missing_and_modified_blobs(tmp_path):
+    store = slotstore.BlobStore(str(tmp_path / "slots"))
+    slot = str(tmp_path / "slots" / "one")
+    a = write(str(tmp_path / "src" / "a.lua"), b"a" * 10)
+    b = write(str(tmp_path / "src" / "b.lua"), b"b" * 10)
+    slotstore.save_slot(store, slot, {"Mods/a.lua": a, "Mods/b.lua": b})
+    os.remove(store.blob_path(slotstore.hash_file(a)))
+    blob = store.blob_path(slotstore.hash_file(b))
+    os.chmod(blob, 0o644)
+    write(blob, b"x" * 10)
+
+    reports, _ = slotstore.verify_slots(store, [slot], deep=True)
+    assert reports[slot]["missing"] == ["Mods/a.lua"]
+    assert reports[slot]["modified"] == ["Mods/b.lua"]
@@ -0,0 +1,71 @@
+import hashlib
+import random
+import zlib
+
+import snapshots
+
+BLOCK = snapshots.BLOCK_SIZE
+
+
+def blocks_of(data):
+    # base_blocks the way a snapshot records its full size chunks
+    base = {}
+    chunks = {}
+    for start in range(0, len(data) - BLOCK + 1, BLOCK):
+        piece = data[start:start + BLOCK]
+        digest = hashlib.sha256(piece).hexdigest()
+        base.setdefault(zlib.adler32(piece), {})[digest] = BLOCK
+        chunks[digest] = piece
+    return base, chunks
+
+
+def rebuild(data, base_data):
+    base, chunks = blocks_of(base_data)
+    out = []
+    new_bytes = 0
+    for digest, piece, length, weak in snapshots.delta_chunks(data, base):
+        if piece is None:
+            piece = chunks[digest]
+        else:
+            new_bytes += length
+        assert len(piece) == length
+        assert zlib.adler32(piece) == weak
+        out.append(piece)
+    return b"".join(out), new_bytes
+
+
+def random_bytes(n, seed):
+    return random.Random(seed).randbytes(n)
+
+
+def test_round_trip_without_base():
+    data = random_bytes(3 * BLOCK + 17, 1)
+    assert rebuild(data, b"") == (data, len(data))
+
+
+def test_unchanged_data_reuses_every_block():
+    data = random_bytes(8 * BLOCK, 2)
+    assert rebuild(data, data) == (data, 0)
+
+
+def test_insert_shifts_blocks_but_still_matches_them():
+    base = random_bytes(8 * BLOCK, 3)
+    data = base[:100] + b"inserted" + base[100:]
+    out, new_bytes = rebuild(data, base)
+    assert out == data
+    # Only the block around the insert is new, the shifted ones are found anyway
+    assert new_bytes <= BLOCK + len(b"inserted")
+
+
+def test_changed_byte_costs_one_block():
+    base = random_bytes(8 * BLOCK, 4)
+    data = bytearray(base)
+    data[5 * BLOCK + 7] ^= 0xFF
+    out, new_bytes = rebuild(bytes(data), base)
+    assert out == bytes(data)
+    assert new_bytes == BLOCK
+
+
+def test_short_and_empty_data():
+    assert rebuild(b"", random_bytes(BLOCK, 5)) == (b"", 0)
+    assert rebuild(b"tiny", random_bytes(BLOCK, 5)) == (b"tiny", 4)
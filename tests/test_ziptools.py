@@ -0,0 +1,142 @@
+import zipfile
+import zlib
+
+import pytest
+
+import slotstore
+import ziptools
+
+_CRC_TABLE = []
+for _i in range(256):
+    _c = _i
+    for _ in range(8):
+        _c = (_c >> 1) ^ 0xEDB88320 if _c & 1 else _c >> 1
+    _CRC_TABLE.append(_c)
+_CRC_BY_TOP = {c >> 24: i for i, c in enumerate(_CRC_TABLE)}
+
+
+def forge_crc(data, target):
+    """
+    Rewrites the first 4 bytes of data so its CRC32 is target, keeping the
+    length: a different file that a (size, crc32) check can't tell apart
+    (as long as data differs from the real file after those 4 bytes).
+    """
+    data = bytearray(data)
+    # Walk the CRC register back from the target over everything after the 4 bytes
+    c = target ^ 0xFFFFFFFF
+    for byte in reversed(data[4:]):
+        i = _CRC_BY_TOP[c >> 24]
+        c = ((c ^ _CRC_TABLE[i]) << 8 | (i ^ byte)) & 0xFFFFFFFF
+    indexes = []
+    for _ in range(4):
+        i = _CRC_BY_TOP[c >> 24]
+        indexes.append(i)
+        c = ((c ^ _CRC_TABLE[i]) << 8) & 0xFFFFFFFF
+    state = 0xFFFFFFFF
+    for k, i in enumerate(reversed(indexes)):
+        data[k] = (state ^ i) & 0xFF
+        state = (state >> 8) ^ _CRC_TABLE[i]
+    assert zlib.crc32(bytes(data)) == target
+    return bytes(data)
+
+
+def make_zip(path, members):
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as zf:
+        for name, data in members.items():
+            zf.writestr(name, data)
+    return str(path)
+
+
+def blob_bytes(store, slot_path, rel):
+    digest = slotstore.read_manifest(slot_path)["files"][rel]["hash"]
+    with open(store.blob_path(digest), "rb") as f:
+        return f.read()
+
+
+def test_import_and_reimport(tmp_path):
+    store = slotstore.BlobStore(str(tmp_path / "slots"))
+    zip_path = make_zip(tmp_path / "a.zip", {"Mods/a/main.lua": b"a" * 500, "Balatro.exe": b"exe"})
+
+    first = ziptools.import_zip_slot(store, zip_path, str(tmp_path / "slots" / "one"))
+    again = ziptools.import_zip_slot(store, zip_path, str(tmp_path / "slots" / "two"))
+
+    assert first.file_count == 1  # the exe isn't counted as a mod file
+    assert first.written_bytes == 503
+    assert again.written_bytes == 0
+    assert again.skipped_bytes == 503
+    assert blob_bytes(store, str(tmp_path / "slots" / "two"), "Mods/a/main.lua") == b"a" * 500
+
+
+def test_member_with_forged_crc_is_imported_as_itself(tmp_path):
+    store = slotstore.BlobStore(str(tmp_path / "slots"))
+    original = b"original asset content " * 20
+    forged = forge_crc(b"FORGED!!" + original[8:], zlib.crc32(original))
+    assert forged != original and len(forged) == len(original)
+    ziptools.import_zip_slot(store, make_zip(tmp_path / "a.zip", {"Mods/x.lua": original}),
+                             str(tmp_path / "slots" / "one"))
+
+    result = ziptools.import_zip_slot(store, make_zip(tmp_path / "b.zip", {"Mods/x.lua": forged}),
+                                      str(tmp_path / "slots" / "two"))
+
+    assert result.skipped_bytes == 0
+    assert result.written_bytes == len(forged)
+    assert blob_bytes(store, str(tmp_path / "slots" / "two"), "Mods/x.lua") == forged
+    assert blob_bytes(store, str(tmp_path / "slots" / "one"), "Mods/x.lua") == original
+
+
+def test_forged_crc_does_not_fool_patch_check(tmp_path):
+    store = slotstore.BlobStore(str(tmp_path / "slots"))
+    base = str(tmp_path / "slots" / "base")
+    target = str(tmp_path / "slots" / "target")
+    new = b"new version of the file " * 20
+    ziptools.import_zip_slot(store, make_zip(tmp_path / "base.zip", {"Mods/x.lua": b"old"}), base)
+    ziptools.import_zip_slot(store, make_zip(tmp_path / "target.zip", {"Mods/x.lua": new}), target)
+    patch = str(tmp_path / "patch.zip")
+    ziptools.export_patch_zip(store, base, target, patch)
+
+    # Same name, size and CRC32 as the real member, different bytes
+    with zipfile.ZipFile(patch) as zf:
+        manifest = zf.read(ziptools.PATCH_MANIFEST_NAME)
+    tampered = make_zip(tmp_path / "tampered.zip", {
+        ziptools.PATCH_MANIFEST_NAME: manifest,
+        "Mods/x.lua": forge_crc(b"EVILEVIL" + new[8:], zlib.crc32(new)),
+    })
+    with pytest.raises(ziptools.PatchError):
+        ziptools.apply_patch_zip(store, tampered, base)
+    assert blob_bytes(store, base, "Mods/x.lua") == b"old"
+
+    ziptools.apply_patch_zip(store, patch, base)
+    assert blob_bytes(store, base, "Mods/x.lua") == new
+
+
+@pytest.mark.parametrize("name", ["../evil.lua", "Mods/../../evil.lua", "/etc/evil", "C:/evil.lua"])
+def test_unsafe_member_names_are_rejected(tmp_path, name):
+    store = slotstore.BlobStore(str(tmp_path / "slots"))
+    zip_path = make_zip(tmp_path / "bad.zip", {name: b"x"})
+    with pytest.raises(ziptools.UnsafeZipError):
+        ziptools.import_zip_slot(store, zip_path, str(tmp_path / "slots" / "bad"))
+    assert not (tmp_path / "slots" / "bad").exists()
+
+
+def test_case_insensitive_duplicates_are_rejected(tmp_path):
+    store = slotstore.BlobStore(str(tmp_path / "slots"))
+    zip_path = make_zip(tmp_path / "dup.zip", {"Mods/Foo.lua": b"a", "Mods/foo.lua": b"b"})
+    with pytest.raises(ziptools.UnsafeZipError):
+        ziptools.import_zip_slot(store, zip_path, str(tmp_path / "slots" / "dup"))
+
+
+def test_zip_bomb_ratio_is_rejected(tmp_path):
+    store = slotstore.BlobStore(str(tmp_path / "slots"))
+    zip_path = make_zip(tmp_path / "bomb.zip", {"Mods/zeros.bin": b"\0" * (8 * 1024 * 1024)})
+    with pytest.raises(ziptools.UnsafeZipError):
+        ziptools.import_zip_slot(store, zip_path, str(tmp_path / "slots" / "bomb"))
+
+
+def test_failed_import_keeps_existing_slot(tmp_path):
+    store = slotstore.BlobStore(str(tmp_path / "slots"))
+    slot = str(tmp_path / "slots" / "one")
+    ziptools.import_zip_slot(store, make_zip(tmp_path / "good.zip", {"Mods/a.lua": b"good"}), slot)
+
+    with pytest.raises(ziptools.UnsafeZipError):
+        ziptools.import_zip_slot(store, make_zip(tmp_path / "bad.zip", {"../a.lua": b"bad"}), slot)
+    assert blob_bytes(store, slot, "Mods/a.lua") == b"good"
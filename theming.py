@@ -0,0 +1,95 @@
+from tkinter import ttk
+
+# Colors live in ttk styles; only raw tk widgets that can't use a style are
+# registered here and get reconfigured on a theme change.
+
+dark_colors = {
+    "bg": "#2e2e2e",
+    "fg": "#dcdcdc",
+    "entry_bg": "#3e3e3e",
+    "button_bg": "#444444",
+    "highlight": "#57a0ff"
+}
+light_colors = {
+    "bg": "#f0f0f0",
+    "fg": "#000000",
+    "entry_bg": "#ffffff",
+    "button_bg": "#e0e0e0",
+    "highlight": "#1a73e8"
+}
+
+# role -> how a raw tk widget of that kind is colored
+ROLE_OPTIONS = {
+    "bg": lambda c: {"bg": c["bg"]},
+    "label": lambda c: {"bg": c["bg"], "fg": c["fg"]},
+    "button": lambda c: {"bg": c["button_bg"], "fg": c["fg"], "activebackground": c["highlight"]},
+    "entry": lambda c: {"bg": c["entry_bg"], "fg": c["fg"], "insertbackground": c["fg"]},
+    "text": lambda c: {"bg": c["entry_bg"], "fg": c["fg"], "insertbackground": c["fg"]},
+}
+
+
+class ThemeManager:
+    def __init__(self, root, dark_mode=True):
+        self.root = root
+        self.style = ttk.Style(root)
+        self.style.theme_use('default')
+        self.colors = dark_colors if dark_mode else light_colors
+        self.widgets = {}  # widget path -> (widget, role)
+        self.apply_styles()
+
+    def set_dark_mode(self, dark_mode):
+        self.colors = dark_colors if dark_mode else light_colors
+        self.apply_styles()
+        for widget, role in list(self.widgets.values()):
+            self._paint(widget, role)
+
+    def apply_styles(self):
+        # One pass over the ttk styles, every ttk widget picks it up by itself
+        colors = self.colors
+        style = self.style
+        style.configure(".", background=colors["bg"], foreground=colors["fg"])
+        style.configure("TFrame", background=colors["bg"])
+        style.configure("TLabel", background=colors["bg"], foreground=colors["fg"])
+        style.configure("TButton",
+                        background=colors["button_bg"],
+                        foreground=colors["fg"],
+                        borderwidth=0)
+        style.map("TButton",
+                  background=[('active', colors["highlight"])],
+                  foreground=[('active', colors["fg"])])
+        style.configure("TEntry",
+                        fieldbackground=colors["entry_bg"],
+                        foreground=colors["fg"])
+        style.configure("TCheckbutton", background=colors["bg"], foreground=colors["fg"])
+        style.map("TCheckbutton", background=[('active', colors["bg"])])
+        style.configure("TCombobox", fieldbackground=colors["entry_bg"], foreground=colors["fg"])
+        style.map("TCombobox", fieldbackground=[('readonly', colors["entry_bg"])])
+        style.configure("TScrollbar", background=colors["button_bg"], troughcolor=colors["bg"])
+        style.configure("Treeview", background=colors["entry_bg"], fieldbackground=colors["entry_bg"],
+                        foreground=colors["fg"])
+        style.configure("Treeview.Heading", background=colors["button_bg"], foreground=colors["fg"])
+        style.map("Treeview", background=[('selected', colors["highlight"])])
+
+    def register(self, widget, role):
+        """
+        Keeps a raw tk widget in step with the theme. role is one of
+        ROLE_OPTIONS or a callable(colors) for custom widgets. The widget
+        is themed right away and dropped from the registry when destroyed.
+        """
+        key = str(widget)
+        if key not in self.widgets:
+            widget.bind("<Destroy>", lambda e, k=key: self._forget(e, k), add="+")
+        self.widgets[key] = (widget, role)
+        self._paint(widget, role)
+        return widget
+
+    def _forget(self, event, key):
+        # <Destroy> also fires for children, only drop the widget itself
+        if str(event.widget) == key:
+            self.widgets.pop(key, None)
+
+    def _paint(self, widget, role):
+        if callable(role):
+            role(self.colors)
+        else:
+            widget.configure(**ROLE_OPTIONS[role](self.colors))
@@ -0,0 +1,186 @@
+import os
+import json
+import time
+import itertools
+import threading
+import collections
+
+# Timed spans around slot operations. Off by default; while off span()
+# hands back one shared do-nothing object, so instrumented code pays a
+# function call and an attribute check.
+
+DEFAULT_TRACE_DIR = os.path.join(os.getcwd(), "logs")
+TRACE_LOG_NAME = "trace.jsonl"
+PROFILES_DIRNAME = "profiles"
+MAX_LOG_BYTES = 2 * 1024 * 1024
+LOG_BACKUPS = 3
+RECENT_LIMIT = 100
+
+_enabled = False
+_profile = False
+_trace_dir = DEFAULT_TRACE_DIR
+_logger = None
+_local = threading.local()
+_ids = itertools.count(1)
+_recent = collections.deque(maxlen=RECENT_LIMIT)
+_recent_lock = threading.Lock()
+_logger_lock = threading.Lock()
+# Only one cProfile can run at a time, concurrent spans just skip it
+_profile_lock = threading.Lock()
+
+
+class _NullSpan:
+    def set(self, **attrs):
+        pass
+
+    def add(self, key, amount=1):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+_NULL_SPAN = _NullSpan()
+
+
+class Span:
+    def __init__(self, name, attrs):
+        self.name = name
+        self.attrs = attrs
+        self.id = next(_ids)
+        self.parent = None
+        self.profiler = None
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def add(self, key, amount=1):
+        self.attrs[key] = self.attrs.get(key, 0) + amount
+
+    def __enter__(self):
+        stack = getattr(_local, "stack", None)
+        if stack is None:
+            stack = _local.stack = []
+        self.parent = stack[-1].id if stack else None
+        stack.append(self)
+        # Only top level spans get profiled, children are inside anyway
+        if _profile and self.parent is None and _profile_lock.acquire(blocking=False):
+            import cProfile
+            self.profiler = cProfile.Profile()
+            self.profiler.enable()
+        self.wall_start = time.time()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        duration = time.perf_counter() - self.start
+        if self.profiler is not None:
+            self.profiler.disable()
+            self.attrs["profile"] = self._dump_profile()
+            _profile_lock.release()
+        _local.stack.pop()
+        record = {
+            "span": self.name,
+            "id": self.id,
+            "parent": self.parent,
+            "start": round(self.wall_start, 3),
+            "ms": round(duration * 1000, 3),
+            "thread": threading.current_thread().name,
+            "status": "ok" if exc_type is None else "error",
+        }
+        if exc is not None:
+            record["error"] = f"{exc_type.__name__}: {exc}"
+        record["attrs"] = self.attrs
+        _emit(record)
+        return False
+
+    def _dump_profile(self):
+        folder = os.path.join(_trace_dir, PROFILES_DIRNAME)
+        path = os.path.join(folder, f"{time.strftime('%Y%m%d-%H%M%S')}-{self.id}-{self.name}.prof")
+        try:
+            os.makedirs(folder, exist_ok=True)
+            self.profiler.dump_stats(path)
+            return path
+        except OSError:
+            return None
+
+
+def configure(enabled=False, profile=False, trace_dir=None):
+    """
+    Turns tracing (and cProfile capture of top level spans) on or off.
+    Spans go to <trace_dir>/trace.jsonl, rotated at MAX_LOG_BYTES.
+    """
+    global _enabled, _profile, _trace_dir
+    if trace_dir and trace_dir != _trace_dir:
+        _trace_dir = trace_dir
+        _close_logger()
+    _enabled = bool(enabled)
+    _profile = _enabled and bool(profile)
+    if not _enabled:
+        _close_logger()
+
+def enabled():
+    return _enabled
+
+def span(name, **attrs):
+    """
+    with tracing.span("slots.save", slot=name) as sp:
+        ...
+        sp.set(files=n)
+    """
+    if not _enabled:
+        return _NULL_SPAN
+    return Span(name, attrs)
+
+def event(name, **attrs):
+    # A point-in-time record for things measured elsewhere (startup etc.)
+    if _enabled:
+        with Span(name, attrs):
+            pass
+
+def recent_spans():
+    # Newest first, for the "last operations" panel
+    with _recent_lock:
+        return list(reversed(_recent))
+
+
+def _get_logger():
+    global _logger
+    with _logger_lock:
+        if _logger is None:
+            _logger = _open_logger()
+        return _logger
+
+def _open_logger():
+    # logging is only imported once tracing is actually on
+    import logging
+    import logging.handlers
+    os.makedirs(_trace_dir, exist_ok=True)
+    logger = logging.getLogger("balatrotool.trace")
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+    handler = logging.handlers.RotatingFileHandler(
+        os.path.join(_trace_dir, TRACE_LOG_NAME),
+        maxBytes=MAX_LOG_BYTES, backupCount=LOG_BACKUPS, encoding="utf-8")
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    logger.addHandler(handler)
+    return logger
+
+def _close_logger():
+    global _logger
+    with _logger_lock:
+        if _logger is not None:
+            for handler in list(_logger.handlers):
+                _logger.removeHandler(handler)
+                handler.close()
+            _logger = None
+
+def _emit(record):
+    with _recent_lock:
+        _recent.append(record)
+    try:
+        _get_logger().info(json.dumps(record, default=str))
+    except OSError:
+        pass  # a trace log we can't write must never break the operation
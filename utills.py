@@ -1,6 +1,30 @@
 import os
+import json
+import errno
 import shutil
 import sys
+import tempfile
+import threading
+
+import tracing
+
+MODS_DIRNAME = "Mods"
+# Older versions kept a linked slot folder's state inside it (so inside the
+# live Mods folder); never saved or deployed as a mod file
+LEGACY_LINK_STATE_NAME = ".bt-state.json"
+# Stands in for a slot name when nothing was deployed from a slot
+NO_SLOT = "_no-slot"
+
+# Copy backends, fastest first. Which ones work is found out per pair of
+# filesystems (st_dev of source and destination folder) and cached.
+COPY_BACKENDS = ("reflink", "copy_file_range", "sendfile", "copy2")
+FICLONE = 0x40049409  # linux ioctl, btrfs/xfs/bcachefs reflink
+_UNSUPPORTED_ERRNOS = {
+    errno.EXDEV, errno.EOPNOTSUPP, errno.ENOTSUP, errno.EINVAL, errno.ENOSYS,
+    errno.EPERM, errno.ENOTTY, errno.EBADF,
+}
+_backend_cache = {}
+_backend_lock = threading.Lock()
 
 def safe_filename(name):
     # Remove characters invalid in filenames, keep alphanumerics and _-.
@@ -28,26 +52,170 @@ def find_balatro_appdata():
                 return p
     return None
 
-def copy_mods_and_exe(src, dst):
+def find_balatro_mods():
+    # Lovely/Steamodded load mods from <appdata>/Balatro/Mods
+    appdata = find_balatro_appdata()
+    if not appdata:
+        return None
+    return os.path.join(appdata, MODS_DIRNAME)
+
+def collect_live_files(exe_path=None):
+    """
+    Returns {relative slot path: absolute live path} for the current setup.
+    The game exe (and loader dll next to it) go in the slot root, the
+    appdata Mods folder goes under Mods/.
+    """
+    with tracing.span("utills.collect_live_files") as sp:
+        files = _collect_live_files(exe_path)
+        sp.set(files=len(files))
+    return files
+
+def _collect_live_files(exe_path):
+    files = {}
+    if exe_path and os.path.isfile(exe_path):
+        files[os.path.basename(exe_path)] = exe_path
+        dll = os.path.join(os.path.dirname(exe_path), "version.dll")
+        if os.path.isfile(dll):
+            files["version.dll"] = dll
+    mods_dir = find_balatro_mods()
+    if mods_dir and os.path.isdir(mods_dir):
+        for root, _, names in os.walk(mods_dir):
+            for name in names:
+                full = os.path.join(root, name)
+                rel = os.path.relpath(full, mods_dir).replace(os.sep, "/")
+                if rel == LEGACY_LINK_STATE_NAME:
+                    continue
+                files[f"{MODS_DIRNAME}/{rel}"] = full
+    return files
+
+def write_json_atomic(path, data, indent=2):
+    # Write to a temp file next to the target and rename over it so a crash
+    # never leaves a half-written json behind
+    folder = os.path.dirname(os.path.abspath(path))
+    fd, tmp = tempfile.mkstemp(prefix=".tmp-", suffix=".json", dir=folder)
+    try:
+        with os.fdopen(fd, "w") as f:
+            json.dump(data, f, indent=indent)
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+def _copy_reflink(src, dst):
+    if sys.platform == "darwin":
+        import ctypes
+        libc = ctypes.CDLL(None, use_errno=True)
+        if libc.clonefile(os.fsencode(src), os.fsencode(dst), 0) != 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err), src)
+        return
+    if not sys.platform.startswith("linux"):
+        raise OSError(errno.ENOTSUP, "reflink not supported on this platform")
+    import fcntl
+    with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+        fcntl.ioctl(fdst.fileno(), FICLONE, fsrc.fileno())
+
+def _copy_file_range(src, dst):
+    if not hasattr(os, "copy_file_range"):
+        raise OSError(errno.ENOSYS, "copy_file_range not available")
+    with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+        left = os.fstat(fsrc.fileno()).st_size
+        while left > 0:
+            n = os.copy_file_range(fsrc.fileno(), fdst.fileno(), min(left, 1 << 30))
+            if n == 0:
+                break
+            left -= n
+
+def _copy_sendfile(src, dst):
+    if not sys.platform.startswith("linux"):
+        raise OSError(errno.ENOSYS, "sendfile to files only works on linux")
+    with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+        left = os.fstat(fsrc.fileno()).st_size
+        offset = 0
+        while left > 0:
+            n = os.sendfile(fdst.fileno(), fsrc.fileno(), offset, min(left, 1 << 30))
+            if n == 0:
+                break
+            offset += n
+            left -= n
+
+_COPY_FUNCS = {
+    "reflink": _copy_reflink,
+    "copy_file_range": _copy_file_range,
+    "sendfile": _copy_sendfile,
+}
+
+def _fs_key(src, dst):
+    try:
+        return (os.stat(src).st_dev, os.stat(os.path.dirname(os.path.abspath(dst))).st_dev)
+    except OSError:
+        return None
+
+def fast_copy(src, dst):
+    """
+    Copies src to dst (overwriting it) with the fastest backend that works
+    for these two filesystems and keeps mtime like copy2.
+    Returns the name of the backend that did the copy.
+    """
+    key = _fs_key(src, dst)
+    with _backend_lock:
+        broken = _backend_cache.setdefault(key, set())
+    for backend in COPY_BACKENDS[:-1]:
+        if backend in broken:
+            continue
+        if os.path.lexists(dst):
+            os.remove(dst)
+        try:
+            _COPY_FUNCS[backend](src, dst)
+        except OSError as e:
+            if os.path.lexists(dst):
+                os.remove(dst)
+            if e.errno in _UNSUPPORTED_ERRNOS:
+                with _backend_lock:
+                    broken.add(backend)
+            continue
+        shutil.copystat(src, dst)
+        return backend
+    shutil.copy2(src, dst)
+    return "copy2"
+
+def copy_mods_and_exe(src, dst, report=None):
     """
     Copies all files and folders from src to dst.
     Overwrites existing files.
+    If report is a dict it gets {backend name: file count} for the copy.
     Returns True on success, False on failure.
     """
-    try:
-        if not os.path.exists(dst):
-            os.makedirs(dst)
-
-        for item in os.listdir(src):
-            s = os.path.join(src, item)
-            d = os.path.join(dst, item)
-            if os.path.isdir(s):
-                if os.path.exists(d):
-                    shutil.rmtree(d)
-                shutil.copytree(s, d)
-            else:
-                shutil.copy2(s, d)
-        return True
-    except Exception as e:
-        print(f"Error copying mods: {e}")
-        return False
+    backends = report if report is not None else {}
+    sp = tracing.span("utills.copy_mods_and_exe", src=src, dst=dst)
+    measure = tracing.enabled()
+
+    def copy_file(s, d):
+        backend = fast_copy(s, d)
+        backends[backend] = backends.get(backend, 0) + 1
+        if measure:
+            sp.add("bytes", os.path.getsize(d))
+        return d
+
+    with sp:
+        try:
+            if not os.path.exists(dst):
+                os.makedirs(dst)
+
+            for item in os.listdir(src):
+                s = os.path.join(src, item)
+                d = os.path.join(dst, item)
+                if os.path.isdir(s):
+                    if os.path.exists(d):
+                        shutil.rmtree(d)
+                    shutil.copytree(s, d, copy_function=copy_file)
+                else:
+                    copy_file(s, d)
+            return True
+        except Exception as e:
+            sp.set(error=str(e))
+            print(f"Error copying mods: {e}")
+            return False
+        finally:
+            sp.set(files=sum(backends.values()), backends=dict(backends))
@@ -0,0 +1,544 @@
+import os
+import re
+import json
+import hashlib
+import time
+import threading
+import zlib
+import shutil
+import zipfile
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import slotstore
+
+# Zip import/export for slots. Both take an optional jobs.Job so they can
+# report byte progress and stop between chunks when cancelled.
+
+CHUNK_SIZE = slotstore.CHUNK_SIZE
+
+# Export presets: zip method + deflate level. "store" never compresses.
+EXPORT_PRESETS = {
+    "fast": (zipfile.ZIP_DEFLATED, 1),
+    "balanced": (zipfile.ZIP_DEFLATED, 6),
+    "max": (zipfile.ZIP_DEFLATED, 9),
+    "store": (zipfile.ZIP_STORED, 0),
+}
+DEFAULT_PRESET = "balanced"
+
+# Already compressed formats, deflating them again only burns CPU
+INCOMPRESSIBLE_EXTS = {
+    ".png", ".jpg", ".jpeg", ".webp", ".gif", ".ogg", ".mp3", ".flac", ".opus",
+    ".zip", ".7z", ".rar", ".gz", ".xz", ".bz2", ".zst", ".love", ".jkr",
+}
+SAMPLE_SIZE = 64 * 1024
+SAMPLE_MIN_SAVING = 0.05  # store if a quick deflate of the sample saves less than this
+DEFLATE_WINDOW = 32 * 1024
+
+# Import safety limits, override per call with import_zip_slot(limits=...)
+IMPORT_LIMITS = {
+    "max_entries": 200000,
+    "max_total_bytes": 32 * 1024 ** 3,
+    "max_ratio": 200,               # uncompressed / compressed
+    "ratio_min_size": 1024 * 1024,  # tiny files may legitimately compress a lot
+}
+PARALLEL_MIN_SIZE = 4 * 1024 * 1024  # members this big get their own worker
+# Patch zips carry only what changed between two slots plus this file
+PATCH_MANIFEST_NAME = "balatrotool-patch.json"
+PATCH_VERSION = 1
+
+
+class ImportResult:
+    def __init__(self):
+        self.files = {}
+        self.file_count = 0  # without the exe
+        self.written_bytes = 0
+        self.skipped_bytes = 0
+
+
+class _ProgressReader:
+    # File wrapper that feeds bytes read into job progress
+    def __init__(self, fileobj, job):
+        self.fileobj = fileobj
+        self.job = job
+
+    def read(self, n=-1):
+        data = self.fileobj.read(n)
+        if self.job and data:
+            self.job.add_progress(len(data))
+        return data
+
+
+def looks_incompressible(path, rel):
+    if os.path.splitext(rel)[1].lower() in INCOMPRESSIBLE_EXTS:
+        return True
+    with open(path, "rb") as f:
+        sample = f.read(SAMPLE_SIZE)
+    if len(sample) < 512:
+        return False
+    return len(zlib.compress(sample, 1)) > len(sample) * (1 - SAMPLE_MIN_SAVING)
+
+def _deflate_chunk(data, level, zdict, last):
+    # Raw deflate of one chunk. Chunks of a file are compressed independently
+    # (primed with the previous 32 KB) and simply concatenated; only the last
+    # one finishes the stream. zlib drops the GIL so threads run in parallel.
+    if zdict:
+        comp = zlib.compressobj(level, zlib.DEFLATED, -15, zdict=zdict)
+    else:
+        comp = zlib.compressobj(level, zlib.DEFLATED, -15)
+    return comp.compress(data) + comp.flush(zlib.Z_FINISH if last else zlib.Z_SYNC_FLUSH)
+
+def _zip_date_time(mtime_ns):
+    t = time.localtime(mtime_ns / 1e9)
+    if t.tm_year < 1980:
+        return (1980, 1, 1, 0, 0, 0)
+    return t[:6]
+
+def _read_chunks(path, method, level, pool):
+    """
+    Yields (payload, raw_len) for one file in order. payload is bytes for
+    stored files or a future for deflated chunks. Also returns the CRC once
+    the generator is exhausted (via StopIteration.value).
+    """
+    crc = 0
+    with open(path, "rb") as f:
+        chunk = f.read(CHUNK_SIZE)
+        prev = None
+        while True:
+            nxt = f.read(CHUNK_SIZE) if chunk else b""
+            last = not nxt
+            crc = zlib.crc32(chunk, crc)
+            if method == zipfile.ZIP_STORED:
+                yield chunk, len(chunk)
+            else:
+                zdict = prev[-DEFLATE_WINDOW:] if prev else None
+                yield pool.submit(_deflate_chunk, chunk, level, zdict, last), len(chunk)
+            if last:
+                break
+            prev, chunk = chunk, nxt
+    return crc
+
+
+class _RawZipWriter:
+    """
+    Writes already-compressed entries into a zipfile.ZipFile. Mirrors what
+    ZipFile.open(..., "w") does (placeholder local header, data, then seek
+    back and rewrite the header) so ZipFile.close() can write the central
+    directory as usual.
+    """
+
+    def __init__(self, zipf):
+        self.zipf = zipf
+        self.fp = zipf.fp
+        self.info = None
+        self.zip64 = False
+
+    def begin(self, info):
+        info.header_offset = self.fp.tell()
+        info.CRC = 0
+        info.compress_size = 0
+        self.zip64 = info.file_size * 1.05 > zipfile.ZIP64_LIMIT
+        self.fp.write(info.FileHeader(self.zip64))
+        self.info = info
+
+    def write(self, data):
+        self.fp.write(data)
+        self.info.compress_size += len(data)
+
+    def end(self, crc):
+        info = self.info
+        info.CRC = crc
+        end_pos = self.fp.tell()
+        self.fp.seek(info.header_offset)
+        self.fp.write(info.FileHeader(self.zip64))
+        self.fp.seek(end_pos)
+        self.zipf.filelist.append(info)
+        self.zipf.NameToInfo[info.filename] = info
+        self.zipf.start_dir = end_pos
+        self.zipf._didModify = True
+        self.info = None
+
+
+def export_slot_zip(store, slot_path, export_path, job=None, preset=DEFAULT_PRESET, workers=None):
+    """
+    Writes every file of a slot into export_path. Files are split into
+    chunks that are deflated in parallel and written back in order;
+    already compressed files are stored as-is. The archive is built as
+    export_path + ".part" and only renamed into place once complete.
+    Returns the number of files written.
+    """
+    entries = slotstore.slot_entries(slot_path)
+    _write_zip(store, slot_path, entries, export_path, job, preset, workers)
+    return len(entries)
+
+def pack_blobs(store, blobs, pack_path, job=None, preset=DEFAULT_PRESET, workers=None):
+    """
+    Writes store blobs {digest: entry} into pack_path, one member per blob
+    named by its digest, compressed like an export (see coldstore).
+    """
+    _write_zip(store, None, blobs, pack_path, job, preset, workers)
+
+def _write_zip(store, slot_path, entries, export_path, job, preset, workers, extra=None):
+    # entries: {arcname: slot entry} to write; extra: {arcname: bytes}
+    method, level = EXPORT_PRESETS[preset]
+    workers = workers or os.cpu_count() or 1
+    max_inflight = workers * 4
+    if job:
+        job.report(0, sum(e["size"] for e in entries.values()))
+    part_path = export_path + ".part"
+    pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="balatrotool-zip")
+    pending = deque()
+    try:
+        with zipfile.ZipFile(part_path, 'w') as zipf:
+            writer = _RawZipWriter(zipf)
+
+            def drain(keep):
+                while len(pending) > keep:
+                    kind, value, raw_len = pending.popleft()
+                    if kind == "begin":
+                        writer.begin(value)
+                    elif kind == "data":
+                        writer.write(value if isinstance(value, bytes) else value.result())
+                        if job:
+                            job.add_progress(raw_len)
+                    else:
+                        writer.end(value)
+
+            for arcname, entry in entries.items():
+                file_path = slotstore.entry_source(store, slot_path, arcname, entry)
+                file_method = method
+                if method != zipfile.ZIP_STORED and looks_incompressible(file_path, arcname):
+                    file_method = zipfile.ZIP_STORED
+                info = zipfile.ZipInfo(arcname, _zip_date_time(entry["mtime_ns"]))
+                info.compress_type = file_method
+                info.file_size = entry["size"]
+                info.external_attr = 0o644 << 16
+                pending.append(("begin", info, 0))
+                chunks = _read_chunks(file_path, file_method, level, pool)
+                while True:
+                    try:
+                        payload, raw_len = next(chunks)
+                    except StopIteration as done:
+                        pending.append(("end", done.value, 0))
+                        break
+                    pending.append(("data", payload, raw_len))
+                    drain(max_inflight)
+            drain(0)
+            for arcname, data in (extra or {}).items():
+                zipf.writestr(arcname, data, compress_type=zipfile.ZIP_DEFLATED)
+        os.replace(part_path, export_path)
+    except BaseException:
+        for kind, value, _ in pending:
+            if kind == "data" and not isinstance(value, bytes):
+                value.cancel()
+        if os.path.exists(part_path):
+            os.remove(part_path)
+        raise
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+class UnsafeZipError(ValueError):
+    pass
+
+
+class PatchError(ValueError):
+    pass
+
+
+def safe_member_name(name):
+    """
+    Normalizes a zip member name to a relative slot path. Raises
+    UnsafeZipError for anything that could land outside the slot.
+    """
+    rel = name.replace("\\", "/")
+    if "\x00" in rel or rel.startswith("/") or re.match(r"^[A-Za-z]:", rel):
+        raise UnsafeZipError(f"Unsafe path in ZIP: {name!r}")
+    parts = [p for p in rel.split("/") if p not in ("", ".")]
+    if not parts or ".." in parts:
+        raise UnsafeZipError(f"Unsafe path in ZIP: {name!r}")
+    return "/".join(parts)
+
+def validate_members(zip_ref, limits=None):
+    """
+    Checks the central directory before anything is written: paths, entry
+    count, declared total size and per-entry compression ratio (zip bombs).
+    Returns [(relative path, ZipInfo)] for the files to import.
+    """
+    limits = dict(IMPORT_LIMITS, **(limits or {}))
+    infos = zip_ref.infolist()
+    if len(infos) > limits["max_entries"]:
+        raise UnsafeZipError(f"ZIP has too many entries ({len(infos)})")
+    members = []
+    seen = set()
+    total = 0
+    for info in infos:
+        if info.is_dir() or info.filename in slotstore.SLOT_BOOKKEEPING or info.filename == PATCH_MANIFEST_NAME:
+            continue
+        if info.flag_bits & 0x1:
+            raise UnsafeZipError(f"Encrypted ZIP entries are not supported: {info.filename!r}")
+        rel = safe_member_name(info.filename)
+        # Windows folders are case-insensitive, so Foo.lua and foo.lua would clash
+        if rel.lower() in seen:
+            raise UnsafeZipError(f"Duplicate path in ZIP: {rel!r}")
+        seen.add(rel.lower())
+        if (info.file_size > limits["ratio_min_size"]
+                and info.file_size > info.compress_size * limits["max_ratio"]):
+            raise UnsafeZipError(f"Suspicious compression ratio for {rel!r}")
+        total += info.file_size
+        if total > limits["max_total_bytes"]:
+            raise UnsafeZipError("ZIP expands to more than the allowed size")
+        members.append((rel, info))
+    return members
+
+def known_crc_index(store):
+    # (size, crc32) -> {blob hash} for every imported file we still have. Only
+    # a hint: a match is still hashed, but needn't be written to the store.
+    index = {}
+    for name in os.listdir(store.slots_folder):
+        slot_path = os.path.join(store.slots_folder, name)
+        if name.startswith(".") or not os.path.isdir(slot_path):
+            continue
+        try:
+            manifest = slotstore.read_manifest(slot_path)
+        except (OSError, ValueError):
+            continue
+        if not manifest:
+            continue
+        for entry in manifest["files"].values():
+            if "crc" in entry:
+                index.setdefault((entry["size"], entry["crc"]), set()).add(entry["hash"])
+    return index
+
+
+class _LimitedReader(_ProgressReader):
+    # Refuses to produce more bytes than the central directory promised
+    def __init__(self, fileobj, job, limit, name):
+        super().__init__(fileobj, job)
+        self.left = limit
+        self.name = name
+
+    def read(self, n=-1):
+        data = super().read(n)
+        self.left -= len(data)
+        if self.left < 0:
+            raise UnsafeZipError(f"{self.name!r} is larger than declared")
+        return data
+
+
+def _store_members(store, zip_path, members, result, job, pool):
+    """
+    Streams zip members into the blob store, large ones on the pool. Every
+    member is hashed; one whose (size, crc32) we already have is only read
+    through sha256 and not written again once that matches the stored blob.
+    Returns [(rel, ZipInfo, digest, size, bytes written)].
+    """
+    local = threading.local()
+    opened = []
+
+    def extract(rel, info, known):
+        # Each thread gets its own ZipFile handle
+        if not hasattr(local, "zip_ref"):
+            local.zip_ref = zipfile.ZipFile(zip_path, 'r')
+            opened.append(local.zip_ref)
+        if known:
+            with local.zip_ref.open(info) as member:
+                digest, size = slotstore.hash_stream(_LimitedReader(member, job, info.file_size, rel))
+            if digest in known and store.has(digest):
+                return rel, info, digest, size, None
+        # New content, or a crc match that isn't what we have (progress for
+        # the latter was counted while hashing)
+        with local.zip_ref.open(info) as member:
+            reader = _LimitedReader(member, None if known else job, info.file_size, rel)
+            digest, size, written = store.add_stream(reader)
+        return rel, info, digest, size, written
+
+    futures = []
+    try:
+        index = known_crc_index(store)
+        done = []
+        for rel, info in members:
+            known = index.get((info.file_size, info.CRC))
+            if info.file_size >= PARALLEL_MIN_SIZE:
+                futures.append(pool.submit(extract, rel, info, known))
+            else:
+                done.append(extract(rel, info, known))
+        done.extend(f.result() for f in futures)
+        for i, (rel, info, digest, size, written) in enumerate(done):
+            if written is None:
+                result.skipped_bytes += size
+                done[i] = (rel, info, digest, size, 0)
+    finally:
+        for future in futures:
+            future.cancel()
+        # Workers still holding a handle have to finish before it's closed
+        pool.shutdown(wait=True)
+        for zip_ref in opened:
+            zip_ref.close()
+    return done
+
+def _manifest_entry(info, digest, size):
+    mtime_ns = int(datetime(*info.date_time).timestamp()) * 10**9
+    return {"hash": digest, "size": size, "mtime_ns": mtime_ns, "crc": info.CRC}
+
+def import_zip_slot(store, zip_path, slot_path, job=None, limits=None, workers=None, gc_on_error=True):
+    """
+    Streams the members of a zip into the blob store and writes a manifest
+    for slot_path. Members are validated up front, hashed while they are
+    written, large ones are extracted in parallel and ones whose content
+    we already have are only hashed.
+    The slot is assembled in a hidden staging folder and swapped in at the
+    end, so a failed or cancelled import leaves an existing slot of the
+    same name untouched. Pass gc_on_error=False when other processes may
+    be adding blobs to the same store at the same time.
+    Returns an ImportResult.
+    """
+    slots_folder = os.path.dirname(slot_path)
+    staging = os.path.join(slots_folder, f".import-{os.path.basename(slot_path)}")
+    if os.path.exists(staging):
+        shutil.rmtree(staging)
+    os.makedirs(staging)
+    result = ImportResult()
+    pool = ThreadPoolExecutor(max_workers=workers or os.cpu_count() or 1,
+                              thread_name_prefix="balatrotool-unzip")
+    try:
+        with store.writing():
+            with zipfile.ZipFile(zip_path, 'r') as zip_ref:
+                if PATCH_MANIFEST_NAME in zip_ref.NameToInfo:
+                    raise PatchError("This ZIP is a patch, apply it to an existing slot instead")
+                members = validate_members(zip_ref, limits)
+            if job:
+                job.report(0, sum(info.file_size for _, info in members))
+            files = {}
+            for rel, info, digest, size, written in _store_members(store, zip_path, members, result, job, pool):
+                files[rel] = _manifest_entry(info, digest, size)
+                result.written_bytes += written
+                if not rel.lower().endswith(".exe"):
+                    result.file_count += 1
+            result.files = files
+            slotstore.write_manifest(staging, files)
+            if os.path.exists(slot_path):
+                shutil.rmtree(slot_path)
+            os.replace(staging, slot_path)
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        if gc_on_error:
+            store.collect_garbage()
+        raise
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+        store.hash_cache.save()
+    return result
+
+
+# --- patches -----------------------------------------------------------------
+
+def entry_hashes(store, slot_path):
+    # (slot_entries, {rel: sha256}); files of loose-file slots get hashed
+    entries = slotstore.slot_entries(slot_path)
+    hashes = {}
+    for rel, entry in entries.items():
+        digest = entry.get("hash")
+        if not digest:
+            src = slotstore.entry_source(store, slot_path, rel, entry)
+            digest = store.hash_cache.lookup(src, os.stat(src)) or slotstore.hash_file(src)
+        hashes[rel] = digest
+    return entries, hashes
+
+def content_digest(hashes):
+    # One hash for "exactly these files with exactly this content"
+    h = hashlib.sha256()
+    for rel in sorted(hashes):
+        h.update(f"{rel}\0{hashes[rel]}\n".encode())
+    return h.hexdigest()
+
+def read_patch_info(zip_path):
+    # The patch manifest of a zip, or None for a full slot zip
+    with zipfile.ZipFile(zip_path, 'r') as zip_ref:
+        if PATCH_MANIFEST_NAME not in zip_ref.NameToInfo:
+            return None
+        info = zip_ref.getinfo(PATCH_MANIFEST_NAME)
+        if info.file_size > IMPORT_LIMITS["max_entries"] * 1024:
+            raise UnsafeZipError("Patch manifest is too large")
+        try:
+            patch = json.loads(zip_ref.read(info))
+        except ValueError:
+            raise PatchError("Patch manifest is damaged")
+    if not isinstance(patch, dict) or patch.get("version") != PATCH_VERSION:
+        raise PatchError("Unsupported patch version")
+    return patch
+
+def export_patch_zip(store, base_path, target_path, export_path, job=None, preset=DEFAULT_PRESET, workers=None):
+    """
+    Writes a zip that turns the base slot into the target slot: only files
+    that are new or changed, plus a manifest with the files to delete, the
+    base's content digest and the base hashes of every file it touches.
+    Returns (files written, files deleted).
+    """
+    _, base = entry_hashes(store, base_path)
+    target_entries, target = entry_hashes(store, target_path)
+    changed = {rel: entry for rel, entry in target_entries.items() if base.get(rel) != target[rel]}
+    deleted = sorted(rel for rel in base if rel not in target)
+    patch = {
+        "version": PATCH_VERSION,
+        "base_digest": content_digest(base),
+        "target_digest": content_digest(target),
+        # Lets a mismatching slot be told which touched files differ
+        "base_files": {rel: base[rel] for rel in sorted(set(changed) | set(deleted)) if rel in base},
+        "files": {rel: {"hash": target[rel], "size": e["size"]} for rel, e in sorted(changed.items())},
+        "deleted": deleted,
+    }
+    _write_zip(store, target_path, changed, export_path, job, preset, workers,
+               extra={PATCH_MANIFEST_NAME: json.dumps(patch, indent=None).encode()})
+    return len(changed), len(deleted)
+
+def apply_patch_zip(store, zip_path, slot_path, job=None, limits=None, workers=None, gc_on_error=True):
+    """
+    Applies a patch zip to an existing slot after checking that the slot
+    is exactly the patch's base. New blobs are checked against the hashes
+    in the patch; the slot's manifest is only replaced once all of them
+    are in. Returns an ImportResult (files = the new manifest).
+    """
+    patch = read_patch_info(zip_path)
+    if patch is None:
+        raise PatchError("This ZIP is not a patch")
+    _, current = entry_hashes(store, slot_path)
+    if content_digest(current) != patch["base_digest"]:
+        differ = sorted(rel for rel, digest in patch["base_files"].items() if current.get(rel) != digest)
+        detail = f" ({', '.join(differ[:5])}{', ...' if len(differ) > 5 else ''})" if differ else ""
+        raise PatchError(f"This slot is not the version the patch was made for{detail}")
+
+    result = ImportResult()
+    pool = ThreadPoolExecutor(max_workers=workers or os.cpu_count() or 1,
+                              thread_name_prefix="balatrotool-unzip")
+    try:
+        with store.writing():
+            with zipfile.ZipFile(zip_path, 'r') as zip_ref:
+                members = validate_members(zip_ref, limits)
+            if {rel for rel, _ in members} != set(patch["files"]):
+                raise PatchError("Patch contents don't match its manifest")
+            if job:
+                job.report(0, sum(info.file_size for _, info in members))
+            if slotstore.read_manifest(slot_path) is None:
+                # Loose-file slot, move it onto the blob store first
+                slotstore.update_slot(store, slot_path, {})
+            deleted = set(patch["deleted"])
+            files = {rel: entry for rel, entry in slotstore.slot_entries(slot_path).items() if rel not in deleted}
+            for rel, info, digest, size, written in _store_members(store, zip_path, members, result, job, pool):
+                if digest != patch["files"][rel]["hash"]:
+                    raise PatchError(f"Patch file is damaged: {rel}")
+                files[rel] = _manifest_entry(info, digest, size)
+                result.written_bytes += written
+            if content_digest({rel: e["hash"] for rel, e in files.items()}) != patch["target_digest"]:
+                raise PatchError("Patched slot doesn't match the patch target")
+            result.files = files
+            result.file_count = sum(1 for rel in files if not rel.lower().endswith(".exe"))
+            slotstore.write_manifest(slot_path, files)
+    except BaseException:
+        if gc_on_error:
+            store.collect_garbage()
+        raise
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+        store.hash_cache.save()
+    return result